@@ -0,0 +1,125 @@
+"""
+Agenda de turnos: cupos por tipo y control de sobreturnos
+
+La tabla turnos_cupos define, para cada tipo de turno, día de la semana y
+hora, cuántos turnos entran en ese horario (capacidad; 0 = no se atiende).
+Empieza vacía y se edita desde /api/turnos/cupos. Un horario sin cupo
+definido admite CAPACIDAD_SIN_CUPO turnos por tipo: sin agenda cargada
+solo se evitan los sobreturnos. Los turnos no cancelados de esa fecha,
+hora y tipo se cuentan con el índice (fecha, hora) de turnos, una lectura
+acotada sin importar cuántos turnos haya en total.
+
+Para que dos pedidos simultáneos no tomen el último lugar del mismo
+horario, antes de contar se toma un bloqueo hasta el commit
+(pg_advisory_xact_lock por fecha, hora y tipo en PostgreSQL; en SQLite,
+un UPDATE que toma el bloqueo de escritura de la base).
+
+Los horarios libres de un rango de fechas se calculan en una sola consulta
+(consultas.CONSULTAS['turnos_disponibles']) y solo incluyen los cupos
+definidos: con la agenda vacía la lista sale vacía aunque se pueda agendar
+en cualquier horario (/api/turnos/disponibles lo indica con sin_agenda).
+Reactivar un turno cancelado vuelve a pasar por verificar_cupo. Las horas se guardan como texto 'HH:MM', así ordenan y
+comparan bien en los dos motores.
+"""
+from datetime import date, datetime, timedelta
+
+# Tipos del formulario de turnos (templates/index.html)
+TIPOS = ('Castración', 'Retiro de puntos', 'Control', 'Consulta', 'Vacunación')
+DIAS_SEMANA = ('lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábados', 'domingos')
+
+# Turnos por tipo en un horario que no tiene cupo definido
+CAPACIDAD_SIN_CUPO = 1
+
+DIAS_MAXIMOS = 62  # rango máximo de /api/turnos/disponibles
+
+
+def crear_tabla_cupos(cursor, placeholder):
+    """Crea turnos_cupos y normaliza las horas cargadas"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS turnos_cupos (
+            tipo TEXT NOT NULL,
+            dia_semana INTEGER NOT NULL,
+            hora TEXT NOT NULL,
+            capacidad INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (tipo, dia_semana, hora)
+        )
+    ''')
+
+    # '9:00' -> '09:00' (el input type="time" ya manda HH:MM; esto cubre cargas anteriores)
+    cursor.execute("UPDATE turnos SET hora = '0' || hora WHERE hora LIKE '_:__'")
+
+
+def horarios(hora_inicio, hora_fin, intervalo_minutos):
+    """['08:00', '08:30', ...] desde hora_inicio hasta antes de hora_fin"""
+    minutos = range(hora_inicio * 60, hora_fin * 60, intervalo_minutos)
+    return [f'{m // 60:02d}:{m % 60:02d}' for m in minutos]
+
+
+def normalizar_hora(hora):
+    """'9:5', '09:05', '09:05:00' -> '09:05'; ValueError si no es una hora"""
+    texto = str(hora).strip()
+    for formato in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(texto, formato).strftime('%H:%M')
+        except ValueError:
+            continue
+    raise ValueError(f'Hora inválida: {hora}')
+
+
+def rango_fechas(desde=None, hasta=None, dias=14):
+    """(desde, hasta) como date; por defecto desde hoy y `dias` días. ValueError si es inválido"""
+    desde = date.fromisoformat(desde) if desde else date.today()
+    hasta = date.fromisoformat(hasta) if hasta else desde + timedelta(days=dias - 1)
+    if hasta < desde:
+        raise ValueError('hasta es anterior a desde')
+    if (hasta - desde).days >= DIAS_MAXIMOS:
+        raise ValueError(f'El rango no puede superar {DIAS_MAXIMOS} días')
+    return desde, hasta
+
+
+def validar_cupo(datos):
+    """(tipo, dia_semana, hora, capacidad) a partir del JSON de un cupo; ValueError si es inválido"""
+    tipo = datos.get('tipo')
+    if tipo not in TIPOS:
+        raise ValueError(f'Tipo inválido: {tipo}')
+    try:
+        dia_semana = int(datos.get('dia_semana'))
+        capacidad = int(datos.get('capacidad', CAPACIDAD_SIN_CUPO))
+    except (TypeError, ValueError):
+        raise ValueError('dia_semana y capacidad deben ser números enteros')
+    if not 0 <= dia_semana < len(DIAS_SEMANA):
+        raise ValueError('dia_semana va de 0 (lunes) a 6 (domingo)')
+    if capacidad < 0:
+        raise ValueError('La capacidad no puede ser negativa')
+    return tipo, dia_semana, normalizar_hora(datos.get('hora')), capacidad
+
+
+def _bloquear_horario(cursor, db_type, placeholder, fecha, hora, tipo, dia_semana):
+    """Capacidad del horario, con el horario bloqueado hasta el commit"""
+    condicion = f'tipo = {placeholder} AND dia_semana = {placeholder} AND hora = {placeholder}'
+    params = (tipo, dia_semana, hora)
+    if db_type == 'postgresql':
+        # El bloqueo cubre también los horarios sin fila en turnos_cupos
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', (f'turno|{fecha}|{hora}|{tipo}',))
+    else:
+        # Toma el bloqueo de escritura aunque no haya ninguna fila que actualizar
+        cursor.execute(f'UPDATE turnos_cupos SET capacidad = capacidad WHERE {condicion}', params)
+    cursor.execute(f'SELECT capacidad FROM turnos_cupos WHERE {condicion}', params)
+    fila = cursor.fetchone()
+    return fila[0] if fila else CAPACIDAD_SIN_CUPO
+
+
+def verificar_cupo(cursor, db_type, placeholder, fecha, hora, tipo):
+    """None si el turno entra en la agenda; si no, el motivo (bloquea el horario hasta el commit)"""
+    dia_semana = date.fromisoformat(fecha).weekday()
+    capacidad = _bloquear_horario(cursor, db_type, placeholder, fecha, hora, tipo, dia_semana)
+    if capacidad == 0:
+        return f'No hay turnos de {tipo} los {DIAS_SEMANA[dia_semana]} a las {hora}'
+
+    cursor.execute(f'''
+        SELECT COUNT(*) FROM turnos
+        WHERE fecha = {placeholder} AND hora = {placeholder} AND tipo = {placeholder} AND estado <> 'cancelado'
+    ''', (fecha, hora, tipo))
+    if cursor.fetchone()[0] >= capacidad:
+        return f'El horario de las {hora} del {fecha} para {tipo} ya está completo'
+    return None
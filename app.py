@@ -1,8 +1,14 @@
-from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for, Response, stream_with_context
 from functools import wraps
 from database import Database
-from datetime import datetime
+from exportacion import MIMETYPE_CSV, MIMETYPE_XLSX
+from importacion import FORMATOS as FORMATOS_IMPORTACION, detectar_formato, leer_filas
+from auditoria import FILTROS as FILTROS_AUDITORIA
+from agenda import CAPACIDAD_SIN_CUPO, rango_fechas, validar_cupo
+from config import config
+from datetime import date, datetime
 import os
+import tempfile
 
 app = Flask(__name__)
 app.secret_key = 'mateca_gualeguaychu_2025_secret_key_mari'
@@ -17,26 +23,6 @@ app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hora
 database_url = os.environ.get('DATABASE_URL')
 db = Database(db_url=database_url) if database_url else Database(db_url='sqlite:///mari.db')
 
-# EJECUTAR MIGRACIÓN: Eliminar constraint UNIQUE de DNI (solo una vez al inicio)
-if database_url and 'postgresql' in database_url:
-    try:
-        print("🔧 Eliminando constraint UNIQUE de DNI en PostgreSQL...")
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Intentar eliminar el constraint
-        try:
-            cursor.execute("ALTER TABLE tutores DROP CONSTRAINT IF EXISTS tutores_dni_key;")
-            print("  ✓ Constraint tutores_dni_key eliminado")
-        except Exception as e:
-            print(f"  - Error al eliminar constraint: {e}")
-        
-        conn.commit()
-        conn.close()
-        print("✅ Migración completada")
-    except Exception as e:
-        print(f"❌ Error en migración: {e}")
-
 # Credenciales de login
 USUARIO = 'mariateresa'
 PASSWORD = 'mateca'
@@ -80,17 +66,29 @@ def index():
 @app.route('/api/exportar', methods=['GET'])
 @login_required
 def exportar_excel():
-    """Endpoint para exportar datos a Excel"""
+    """Endpoint para exportar datos a Excel (o CSV con ?formato=csv), con los filtros de la búsqueda"""
     try:
-        filename = f'atenciones_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        exito, mensaje = db.exportar_a_excel(filename)
+        filtros = filtros_atenciones(request.args)
+        nombre = f'atenciones_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+        
+        if request.args.get('formato') == 'csv':
+            # CSV: se envía a medida que se leen los lotes
+            return Response(stream_with_context(db.exportar_csv(filtros)),
+                            mimetype=MIMETYPE_CSV,
+                            headers={'Content-Disposition': f'attachment; filename={nombre}.csv'})
+        
+        # XLSX: archivo temporal anónimo (se borra solo al cerrarse)
+        archivo = tempfile.TemporaryFile()
+        exito, mensaje = db.exportar_a_excel(archivo, filtros)
         
         if exito:
-            return send_file(filename, 
+            archivo.seek(0)
+            return send_file(archivo,
                            as_attachment=True,
-                           download_name=filename,
-                           mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                           download_name=f'{nombre}.xlsx',
+                           mimetype=MIMETYPE_XLSX)
         else:
+            archivo.close()
             return jsonify({'success': False, 'message': mensaje}), 500
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -135,53 +133,133 @@ def agregar_atencion():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
-@app.route('/api/atenciones', methods=['GET'])
+@app.route('/api/atenciones/bulk', methods=['POST'])
 @login_required
-def buscar_atenciones():
-    """Endpoint para buscar atenciones"""
+def importar_atenciones():
+    """Endpoint de carga masiva (JSON Lines, JSON, CSV o XLSX); ?desde=N retoma una carga"""
+    archivo = request.files.get('archivo')
+    if archivo:
+        nombre, mimetype, stream = archivo.filename, archivo.mimetype, archivo.stream
+    else:
+        nombre, mimetype, stream = None, request.mimetype, request.stream
+    
+    formato = request.args.get('formato') or detectar_formato(nombre, mimetype)
+    if formato not in FORMATOS_IMPORTACION:
+        return jsonify({'success': False, 'message': 'Formato no soportado (usar jsonl, json, csv o xlsx)'}), 400
+    
+    try:
+        desde = int(request.args.get('desde', 0))
+        limite = request.args.get('limite', type=int)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parámetro desde inválido'}), 400
+    
+    try:
+        resultado = db.importar_atenciones(leer_filas(stream, formato), desde=desde, limite=limite)
+        return jsonify({'success': True, **resultado})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Archivo inválido: {e}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+# Paginación de /api/atenciones
+LIMITE_PAGINA = 50
+LIMITE_PAGINA_MAXIMO = 500
+LIMITE_BUSQUEDA = 10
+LIMITE_BUSQUEDA_MAXIMO = 50
+
+def fila_a_atencion(row):
+    """Convierte una fila de buscar_atenciones en el diccionario de la API"""
+    return {
+        'id': row[0],
+        'numero': row[1],
+        'fecha': row[2],
+        'tipo_atencion': row[3],
+        'nombre_animal': row[4],
+        'especie': row[5],
+        'sexo': row[6],
+        'edad': row[7],
+        'tutor': {
+            'nombre_apellido': row[8],
+            'dni': row[9],
+            'direccion': row[10],
+            'barrio': row[11],
+            'telefono': row[12]
+        },
+        'motivo': row[13],
+        'diagnostico': row[14],
+        'tratamiento': row[15],
+        'derivacion': row[16],
+        'observaciones': row[17]
+    }
+
+def filtros_atenciones(args):
+    """Lee de la query string los filtros de búsqueda de atenciones"""
     filtros = {
-        'numero': request.args.get('numero'),
-        'tipo_atencion': request.args.get('tipo_atencion'),
-        'especie': request.args.get('especie'),
-        'dni': request.args.get('dni'),
-        'barrio': request.args.get('barrio'),
-        'nombre_animal': request.args.get('nombre_animal'),
-        'fecha_desde': request.args.get('fecha_desde'),
-        'fecha_hasta': request.args.get('fecha_hasta')
+        'numero': args.get('numero'),
+        'tipo_atencion': args.get('tipo_atencion'),
+        'especie': args.get('especie'),
+        'dni': args.get('dni'),
+        'barrio': args.get('barrio'),
+        'nombre_animal': args.get('nombre_animal'),
+        'fecha_desde': args.get('fecha_desde'),
+        'fecha_hasta': args.get('fecha_hasta')
     }
     
     # Remover filtros vacíos
-    filtros = {k: v for k, v in filtros.items() if v}
+    return {k: v for k, v in filtros.items() if v}
+
+@app.route('/api/atenciones', methods=['GET'])
+@login_required
+def buscar_atenciones():
+    """Endpoint para buscar atenciones (paginado con after_numero/limit)"""
+    filtros = filtros_atenciones(request.args)
     
-    resultados = db.buscar_atenciones(filtros)
+    try:
+        after_numero = request.args.get('after_numero', type=int)
+        limite = int(request.args.get('limit', LIMITE_PAGINA))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parámetros de paginación inválidos'}), 400
+    limite = max(1, min(limite, LIMITE_PAGINA_MAXIMO))
     
-    # Convertir resultados a lista de diccionarios
-    atenciones = []
-    for row in resultados:
-        atenciones.append({
-            'id': row[0],
-            'numero': row[1],
-            'fecha': row[2],
-            'tipo_atencion': row[3],
-            'nombre_animal': row[4],
-            'especie': row[5],
-            'sexo': row[6],
-            'edad': row[7],
-            'tutor': {
-                'nombre_apellido': row[8],
-                'dni': row[9],
-                'direccion': row[10],
-                'barrio': row[11],
-                'telefono': row[12]
-            },
-            'motivo': row[13],
-            'diagnostico': row[14],
-            'tratamiento': row[15],
-            'derivacion': row[16],
-            'observaciones': row[17]
-        })
+    # Se pide una fila extra para saber si hay otra página
+    resultados = db.buscar_atenciones(filtros, after_numero=after_numero, limite=limite + 1)
+    hay_mas = len(resultados) > limite
+    resultados = resultados[:limite]
+    
+    respuesta = {
+        'atenciones': [fila_a_atencion(row) for row in resultados],
+        'next_cursor': resultados[-1][1] if hay_mas else None
+    }
     
-    return jsonify(atenciones)
+    # El total es opcional: COUNT(*) solo si el cliente lo pide
+    if request.args.get('incluir_total') in ('1', 'true'):
+        respuesta['total'] = db.contar_atenciones(filtros)
+    
+    return jsonify(respuesta)
+
+@app.route('/api/buscar', methods=['GET'])
+@login_required
+def busqueda_rapida():
+    """Búsqueda rápida por animal, tutor, DNI, teléfono o barrio (resultados rankeados)"""
+    q = request.args.get('q', '').strip()
+    try:
+        limite = int(request.args.get('limit', LIMITE_BUSQUEDA))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parámetro limit inválido'}), 400
+    limite = max(1, min(limite, LIMITE_BUSQUEDA_MAXIMO))
+    
+    if not q:
+        return jsonify({'resultados': []})
+    return jsonify({'resultados': db.buscar_rapido(q, limite)})
+
+@app.route('/api/tutores/<dni>/historial', methods=['GET'])
+@login_required
+def historial_tutor(dni):
+    """Endpoint con las versiones de datos y las atenciones de un tutor"""
+    historial = db.historial_tutor(dni)
+    if historial is None:
+        return jsonify({'success': False, 'message': 'Tutor no encontrado'}), 404
+    return jsonify(historial)
 
 @app.route('/api/castraciones', methods=['POST'])
 def agregar_castracion():
@@ -276,60 +354,8 @@ def obtener_estadisticas():
 def obtener_estadisticas_barrios():
     """Endpoint para obtener estadísticas de castraciones por barrio para el mapa"""
     try:
-        import unicodedata
-        import re
-        
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        query = db.convert_query('''
-            SELECT t.barrio, COUNT(a.id) as total
-            FROM atenciones a
-            JOIN tutores t ON a.tutor_id = t.id
-            WHERE a.tipo_atencion = %s AND t.barrio IS NOT NULL AND t.barrio != ''
-            GROUP BY t.barrio
-            ORDER BY total DESC
-        ''')
-        
-        cursor.execute(query, ('castracion',))
-        resultados = cursor.fetchall()
-        conn.close()
-        
-        # Función para normalizar nombres de barrios
-        def normalizar_barrio(nombre):
-            if not nombre:
-                return ""
-            # Remover tildes
-            nombre = ''.join(c for c in unicodedata.normalize('NFD', nombre) 
-                           if unicodedata.category(c) != 'Mn')
-            # Convertir a minúsculas y remover espacios extras
-            nombre = re.sub(r'\s+', ' ', nombre.lower().strip())
-            # Remover palabras comunes
-            nombre = re.sub(r'\b(barrio|sum|b°|bº)\b', '', nombre).strip()
-            return nombre
-        
-        # Agrupar barrios por nombre normalizado
-        barrios_agrupados = {}
-        for barrio, total in resultados:
-            barrio_normalizado = normalizar_barrio(barrio)
-            if barrio_normalizado:
-                if barrio_normalizado not in barrios_agrupados:
-                    barrios_agrupados[barrio_normalizado] = {
-                        'nombre_original': barrio,
-                        'total': 0,
-                        'variantes': []
-                    }
-                barrios_agrupados[barrio_normalizado]['total'] += total
-                barrios_agrupados[barrio_normalizado]['variantes'].append(barrio)
-        
-        # Convertir a diccionario con el nombre original más común
-        barrios_stats = {}
-        for datos in barrios_agrupados.values():
-            # Usar el nombre original más frecuente o el primero
-            nombre = datos['nombre_original']
-            barrios_stats[nombre] = datos['total']
-        
-        return jsonify(barrios_stats)
+        # Variantes del mismo barrio agrupadas por tutores.barrio_norm
+        return jsonify(db.obtener_estadisticas_barrios())
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -338,61 +364,7 @@ def obtener_estadisticas_barrios():
 def obtener_lista_barrios():
     """Endpoint para obtener lista de todos los barrios registrados con conteo"""
     try:
-        import unicodedata
-        import re
-        
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        query = db.convert_query('''
-            SELECT barrio, COUNT(*) as registros
-            FROM tutores
-            WHERE barrio IS NOT NULL AND barrio != ''
-            GROUP BY barrio
-            ORDER BY registros DESC
-        ''')
-        
-        cursor.execute(query)
-        resultados = cursor.fetchall()
-        conn.close()
-        
-        # Función para normalizar nombres
-        def normalizar_barrio(nombre):
-            if not nombre:
-                return ""
-            nombre = ''.join(c for c in unicodedata.normalize('NFD', nombre) 
-                           if unicodedata.category(c) != 'Mn')
-            nombre = re.sub(r'\s+', ' ', nombre.lower().strip())
-            nombre = re.sub(r'\b(barrio|sum|b°|bº)\b', '', nombre).strip()
-            return nombre
-        
-        # Agrupar barrios similares
-        barrios_agrupados = {}
-        for barrio, registros in resultados:
-            barrio_normalizado = normalizar_barrio(barrio)
-            if barrio_normalizado:
-                if barrio_normalizado not in barrios_agrupados:
-                    barrios_agrupados[barrio_normalizado] = {
-                        'nombre': barrio,
-                        'registros': 0,
-                        'variantes': []
-                    }
-                barrios_agrupados[barrio_normalizado]['registros'] += registros
-                if barrio not in barrios_agrupados[barrio_normalizado]['variantes']:
-                    barrios_agrupados[barrio_normalizado]['variantes'].append(barrio)
-        
-        # Convertir a lista ordenada
-        barrios_lista = []
-        for datos in barrios_agrupados.values():
-            barrios_lista.append({
-                'nombre': datos['nombre'],
-                'registros': datos['registros'],
-                'variantes': datos['variantes']
-            })
-        
-        barrios_lista.sort(key=lambda x: x['registros'], reverse=True)
-        
-        return jsonify(barrios_lista)
+        return jsonify(db.obtener_lista_barrios())
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -401,24 +373,20 @@ def obtener_lista_barrios():
 def obtener_barrios_mapa():
     """Obtener todos los barrios marcados en el mapa"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        query = db.convert_query('SELECT id, nombre, latitud, longitud, color FROM barrios_mapa ORDER BY nombre')
-        cursor.execute(query)
-        
-        barrios = []
-        for row in cursor.fetchall():
-            barrios.append({
-                'id': row[0],
-                'nombre': row[1],
-                'latitud': row[2],
-                'longitud': row[3],
-                'color': row[4]
-            })
-        
-        conn.close()
-        return jsonify({'success': True, 'barrios': barrios})
+        with db.conexion() as conn:
+            cursor = db.ejecutar(conn.cursor(), 'barrios_mapa_listar')
+        
+            barrios = []
+            for row in cursor.fetchall():
+                barrios.append({
+                    'id': row[0],
+                    'nombre': row[1],
+                    'latitud': row[2],
+                    'longitud': row[3],
+                    'color': row[4]
+                })
+        
+            return jsonify({'success': True, 'barrios': barrios})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -436,27 +404,12 @@ def agregar_barrio_mapa():
         if not nombre or latitud is None or longitud is None:
             return jsonify({'success': False, 'message': 'Datos incompletos'}), 400
         
-        conn = db.get_connection()
-        cursor = conn.cursor()
+        with db.conexion() as conn:
+            nuevo_id = db.insertar(conn.cursor(), 'barrios_mapa_insertar', (nombre, latitud, longitud, color))
         
-        if db.db_type == 'postgresql':
-            cursor.execute('''
-                INSERT INTO barrios_mapa (nombre, latitud, longitud, color)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-            ''', (nombre, latitud, longitud, color))
-            nuevo_id = cursor.fetchone()[0]
-        else:
-            cursor.execute('''
-                INSERT INTO barrios_mapa (nombre, latitud, longitud, color)
-                VALUES (?, ?, ?, ?)
-            ''', (nombre, latitud, longitud, color))
-            nuevo_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
+            conn.commit()
         
-        return jsonify({'success': True, 'id': nuevo_id, 'message': 'Barrio agregado al mapa'})
+            return jsonify({'success': True, 'id': nuevo_id, 'message': 'Barrio agregado al mapa'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -474,26 +427,12 @@ def actualizar_barrio_mapa(barrio_id):
         if not nombre or latitud is None or longitud is None:
             return jsonify({'success': False, 'message': 'Datos incompletos'}), 400
         
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        if db.db_type == 'postgresql':
-            cursor.execute('''
-                UPDATE barrios_mapa
-                SET nombre = %s, latitud = %s, longitud = %s, color = %s
-                WHERE id = %s
-            ''', (nombre, latitud, longitud, color, barrio_id))
-        else:
-            cursor.execute('''
-                UPDATE barrios_mapa
-                SET nombre = ?, latitud = ?, longitud = ?, color = ?
-                WHERE id = ?
-            ''', (nombre, latitud, longitud, color, barrio_id))
+        with db.conexion() as conn:
+            db.ejecutar(conn.cursor(), 'barrios_mapa_actualizar', (nombre, latitud, longitud, color, barrio_id))
         
-        conn.commit()
-        conn.close()
+            conn.commit()
         
-        return jsonify({'success': True, 'message': 'Barrio actualizado'})
+            return jsonify({'success': True, 'message': 'Barrio actualizado'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -502,18 +441,12 @@ def actualizar_barrio_mapa(barrio_id):
 def eliminar_barrio_mapa(barrio_id):
     """Eliminar un barrio del mapa"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
+        with db.conexion() as conn:
+            db.ejecutar(conn.cursor(), 'barrios_mapa_eliminar', (barrio_id,))
         
-        if db.db_type == 'postgresql':
-            cursor.execute('DELETE FROM barrios_mapa WHERE id = %s', (barrio_id,))
-        else:
-            cursor.execute('DELETE FROM barrios_mapa WHERE id = ?', (barrio_id,))
-        
-        conn.commit()
-        conn.close()
+            conn.commit()
         
-        return jsonify({'success': True, 'message': 'Barrio eliminado del mapa'})
+            return jsonify({'success': True, 'message': 'Barrio eliminado del mapa'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -603,11 +536,22 @@ def eliminar_atencion(numero):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/siguiente-numero', methods=['GET'])
+@login_required
 def siguiente_numero():
-    """Endpoint para obtener el siguiente número de registro"""
+    """Endpoint para consultar el siguiente número de registro (no lo reserva)"""
     numero = db.obtener_siguiente_numero()
     return jsonify({'numero': numero})
 
+@app.route('/api/numeros/reservar', methods=['POST'])
+@login_required
+def reservar_numero():
+    """Endpoint que reserva un número para el formulario de alta"""
+    try:
+        numero, vence = db.reservar_numero(session.get('usuario', 'mariateresa'))
+        return jsonify({'numero': numero, 'vence': vence, 'minutos': config.NUMERO_RESERVA_MINUTOS})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/castraciones/<int:numero>', methods=['GET'])
 def obtener_castracion(numero):
     """Endpoint para obtener una castración específica"""
@@ -657,16 +601,26 @@ def eliminar_castracion(numero):
 @app.route('/api/dashboard', methods=['GET'])
 @login_required
 def obtener_dashboard():
-    """Endpoint para obtener datos del dashboard"""
+    """Endpoint para obtener datos del dashboard (304 si no cambió desde el ETag del cliente)"""
     try:
         stats = db.obtener_dashboard_stats()
-        return jsonify(stats)
+        respuesta = jsonify(stats)
+        respuesta.add_etag()
+        # El navegador revalida en cada pedido con If-None-Match y reutiliza su copia si recibe 304
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+        return respuesta.make_conditional(request)
     except Exception as e:
         print(f"Error en dashboard: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cache', methods=['GET'])
+@login_required
+def obtener_estado_cache():
+    """Endpoint con contadores de aciertos/fallos de la caché de dashboard y estadísticas"""
+    return jsonify(db.cache.estadisticas())
+
 @app.route('/api/turnos', methods=['POST'])
 def agregar_turno():
     """Endpoint para agregar un turno"""
@@ -687,6 +641,110 @@ def agregar_turno():
     else:
         return jsonify({'success': False, 'message': mensaje}), 400
 
+@app.route('/api/turnos', methods=['GET'])
+@login_required
+def buscar_turnos():
+    """Endpoint con los turnos desde/hasta una fecha, filtrados por estado y tipo
+    (paginado con after=fecha,hora,id y limit)"""
+    try:
+        desde = date.fromisoformat(request.args.get('desde') or date.today().isoformat()).isoformat()
+        hasta = request.args.get('hasta')
+        hasta = date.fromisoformat(hasta).isoformat() if hasta else None
+        after = None
+        if request.args.get('after'):
+            fecha, hora, turno_id = request.args['after'].split(',')
+            after = (date.fromisoformat(fecha).isoformat(), hora, int(turno_id))
+        limite = int(request.args.get('limit', LIMITE_PAGINA))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parámetros de fecha o paginación inválidos'}), 400
+    limite = max(1, min(limite, LIMITE_PAGINA_MAXIMO))
+    
+    # Se pide una fila extra para saber si hay otra página
+    filas = db.buscar_turnos(desde, hasta, request.args.get('estado'), request.args.get('tipo'),
+                             after=after, limite=limite + 1)
+    hay_mas = len(filas) > limite
+    turnos = [{
+        'id': fila[0],
+        'fecha': str(fila[1])[:10],
+        'hora': fila[2],
+        'nombre_animal': fila[3],
+        'tutor_nombre': fila[4],
+        'telefono': fila[5],
+        'tipo': fila[6],
+        'estado': fila[7],
+        'observaciones': fila[8]
+    } for fila in filas[:limite]]
+    
+    return jsonify({
+        'turnos': turnos,
+        'next_cursor': f"{turnos[-1]['fecha']},{turnos[-1]['hora']},{turnos[-1]['id']}" if hay_mas else None
+    })
+
+@app.route('/api/turnos/resumen', methods=['GET'])
+@login_required
+def resumen_turnos():
+    """Endpoint con la cantidad de turnos por día y estado (vista de calendario); ?tipo= filtra"""
+    try:
+        desde, hasta = rango_fechas(request.args.get('desde'), request.args.get('hasta'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Rango inválido: {e}'}), 400
+    
+    return jsonify({'desde': desde.isoformat(), 'hasta': hasta.isoformat(),
+                    'dias': db.resumen_turnos(desde.isoformat(), hasta.isoformat(), request.args.get('tipo') or None)})
+
+@app.route('/api/turnos/disponibles', methods=['GET'])
+@login_required
+def turnos_disponibles():
+    """Endpoint con los horarios libres entre desde y hasta (por defecto, los próximos 14 días); ?tipo= filtra
+
+    Solo lista los horarios con cupo definido. sin_agenda indica que no hay ninguno (para
+    ese tipo): la lista vacía no dice nada de la disponibilidad, y cada horario admite
+    capacidad_sin_cupo turnos.
+    """
+    try:
+        desde, hasta = rango_fechas(request.args.get('desde'), request.args.get('hasta'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Rango inválido: {e}'}), 400
+    
+    tipo = request.args.get('tipo') or None
+    disponibles = db.turnos_disponibles(desde.isoformat(), hasta.isoformat(), tipo)
+    sin_agenda = not any(tipo in (None, cupo['tipo']) for cupo in db.listar_cupos())
+    return jsonify({'desde': desde.isoformat(), 'hasta': hasta.isoformat(), 'disponibles': disponibles,
+                    'sin_agenda': sin_agenda, 'capacidad_sin_cupo': CAPACIDAD_SIN_CUPO})
+
+@app.route('/api/turnos/cupos', methods=['GET'])
+@login_required
+def listar_cupos():
+    """Endpoint con los cupos de la agenda"""
+    return jsonify({'success': True, 'cupos': db.listar_cupos()})
+
+@app.route('/api/turnos/cupos', methods=['PUT'])
+@login_required
+def guardar_cupo():
+    """Endpoint para crear o cambiar un cupo: {tipo, dia_semana (0 = lunes), hora, capacidad}"""
+    try:
+        tipo, dia_semana, hora, capacidad = validar_cupo(request.get_json() or {})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    exito, mensaje = db.guardar_cupo(tipo, dia_semana, hora, capacidad)
+    return jsonify({'success': exito, 'message': mensaje})
+
+@app.route('/api/turnos/cupos', methods=['DELETE'])
+@login_required
+def eliminar_cupo():
+    """Endpoint para quitar un cupo: {tipo, dia_semana, hora}"""
+    try:
+        tipo, dia_semana, hora, _ = validar_cupo(request.get_json() or {})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    exito, mensaje = db.eliminar_cupo(tipo, dia_semana, hora)
+    if exito:
+        return jsonify({'success': True, 'message': mensaje})
+    else:
+        return jsonify({'success': False, 'message': mensaje}), 404
+
 @app.route('/api/turnos/<int:turno_id>', methods=['PUT'])
 def actualizar_turno(turno_id):
     """Endpoint para actualizar estado de turno"""
@@ -711,40 +769,45 @@ def eliminar_turno(turno_id):
 @app.route('/api/auditoria', methods=['GET'])
 @login_required
 def obtener_auditoria():
-    """Endpoint para obtener logs de auditoría"""
+    """Endpoint de auditoría (filtros por tabla, registro_id, tipo_operacion, usuario,
+    desde/hasta; paginado con after_id/limit)"""
+    filtros = {campo: request.args.get(campo) for campo in FILTROS_AUDITORIA + ('desde', 'hasta')}
+    filtros = {k: v for k, v in filtros.items() if v}
+    
     try:
-        logs = db.obtener_auditoria(100)  # Últimos 100 registros
-        
-        # Convertir a formato JSON
-        resultado = []
-        for log in logs:
-            # Convertir fecha_hora a string ISO si es necesario
-            fecha_hora = log[1]
-            if isinstance(fecha_hora, datetime):
-                fecha_hora = fecha_hora.isoformat()
-            elif isinstance(fecha_hora, str):
-                # Si ya es string, asegurarse que esté en formato ISO
-                try:
-                    dt = datetime.fromisoformat(fecha_hora.replace(' ', 'T'))
-                    fecha_hora = dt.isoformat()
-                except:
-                    pass  # Si falla, usar el valor original
-            
-            resultado.append({
-                'id': log[0],
-                'fecha_hora': fecha_hora,
-                'tipo_operacion': log[2],
-                'tabla': log[3],
-                'registro_id': log[4],
-                'usuario': log[5],
-                'datos_anteriores': log[6],
-                'datos_nuevos': log[7],
-                'descripcion': log[8]
-            })
-        
-        return jsonify(resultado)
+        if 'registro_id' in filtros:
+            filtros['registro_id'] = int(filtros['registro_id'])
+        after_id = request.args.get('after_id', type=int)
+        limite = int(request.args.get('limit', LIMITE_PAGINA))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parámetros de paginación inválidos'}), 400
+    limite = max(1, min(limite, LIMITE_PAGINA_MAXIMO))
+    
+    try:
+        for campo in ('desde', 'hasta'):
+            if campo in filtros:
+                datetime.fromisoformat(filtros[campo].strip())
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parámetros desde/hasta inválidos (fecha u hora ISO)'}), 400
+    
+    try:
+        # Se pide una fila extra para saber si hay otra página
+        registros = db.obtener_auditoria(limite + 1, filtros, after_id)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
+    
+    hay_mas = len(registros) > limite
+    registros = registros[:limite]
+    return jsonify({
+        'registros': registros,
+        'next_cursor': registros[-1]['id'] if hay_mas else None
+    })
+
+@app.route('/api/auditoria/<tabla>/<int:registro_id>', methods=['GET'])
+@login_required
+def historial_registro(tabla, registro_id):
+    """Endpoint con todos los cambios de un registro, en orden cronológico"""
+    return jsonify(db.historial_registro(tabla, registro_id))
 
 if __name__ == '__main__':
     print("=" * 60)
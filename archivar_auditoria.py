@@ -0,0 +1,48 @@
+"""
+Script de retención de la auditoría: mueve los meses cerrados a sus tablas
+mensuales (SQLite; en PostgreSQL crea las particiones que falten) y
+comprime los meses más viejos que la retención a archivos JSON Lines con
+gzip, que /api/auditoria sigue leyendo.
+
+Uso:
+    python archivar_auditoria.py
+    python archivar_auditoria.py --meses 6 --directorio /var/data/auditoria
+
+Ejecutar una vez por mes donde esté el directorio de archivos (el mismo
+que usa la aplicación, AUDITORIA_DIRECTORIO_ARCHIVO).
+"""
+import argparse
+import os
+
+from config import config
+from database import Database
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Retención y archivo de la auditoría')
+    parser.add_argument('--meses', type=int, default=config.AUDITORIA_MESES_RETENCION,
+                        help='meses que quedan en la base')
+    parser.add_argument('--directorio', default=config.AUDITORIA_DIRECTORIO_ARCHIVO,
+                        help='carpeta de los archivos .jsonl.gz')
+    args = parser.parse_args()
+
+    database_url = os.environ.get('DATABASE_URL')
+    db = Database(db_url=database_url) if database_url else Database(db_url='sqlite:///mari.db')
+
+    def progreso(archivo, filas):
+        print(f"  📦 {archivo}: {filas} registros")
+
+    try:
+        print(f"🔧 Archivando auditoría anterior a los últimos {args.meses} meses...")
+        resultado = db.archivar_auditoria(meses=args.meses, directorio=args.directorio, progreso=progreso)
+        if resultado['fragmentadas']:
+            print(f"✅ {resultado['fragmentadas']} registros movidos a tablas mensuales")
+        print(f"✅ Archivados: {resultado['filas_archivadas']} registros en "
+              f"{len(resultado['archivos'])} archivos ({args.directorio})")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,558 @@
+"""
+Auditoría de cambios (tabla auditoria)
+
+Las entradas se escriben con el cursor de quien hace el cambio, dentro de
+su misma transacción: la edición y su registro se confirman (o deshacen)
+juntos, con una sola conexión y un solo commit.
+
+datos_anteriores y datos_nuevos guardan JSON: en una edición solo los
+campos que cambiaron ({campo: valor anterior} / {campo: valor nuevo}), en
+una baja el registro completo. Las entradas viejas tienen texto libre;
+leer_datos() devuelve el texto tal cual cuando no es JSON.
+
+Consultas: paginación por clave (id descendente, `after_id`) con filtros
+por tabla, registro_id, tipo_operacion, usuario y rango de fecha_hora, y
+el historial de un registro, todo sobre índices compuestos que terminan
+en id para que el orden salga del índice.
+
+Particiones por mes, para que la tabla caliente y sus índices sigan chicos:
+- PostgreSQL: auditoria es una tabla particionada por rango de fecha_hora
+  (auditoria_AAAA_MM, más auditoria_default para lo que no tenga mes).
+- SQLite: auditoria guarda el mes en curso y archivar() mueve cada mes
+  cerrado a su propia tabla auditoria_AAAA_MM (mismos ids e índices).
+
+Retención: archivar() comprime los meses anteriores a AUDITORIA_MESES_RETENCION
+a archivos JSON Lines con gzip (auditoria_AAAA_MM.jsonl.gz, registrados en
+auditoria_archivos) y borra la partición. Las consultas leen primero las
+tablas vivas y, si la página no se completa, siguen por los archivos, así
+que la paginación recorre todo el historial sin cambios en la API.
+
+Cada archivo tiene en la base un índice chico que evita abrir los que no
+pueden tener resultados: un resumen con las tablas, operaciones y usuarios
+que contiene (auditoria_archivos.resumen) y sus pares (tabla, registro_id)
+(auditoria_archivos_registros), guardado en la misma transacción que
+registra el archivo.
+"""
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+COLUMNAS = ('tipo_operacion', 'tabla', 'registro_id', 'usuario', 'datos_anteriores', 'datos_nuevos', 'descripcion')
+COLUMNAS_CONSULTA = ('id', 'fecha_hora') + COLUMNAS
+FILTROS = ('tabla', 'registro_id', 'tipo_operacion', 'usuario')
+RESUMEN = ('tabla', 'tipo_operacion', 'usuario')  # valores distintos de cada archivo (pocos)
+USUARIO_SISTEMA = 'sistema'
+
+PATRON_MES = re.compile(r'^auditoria_(\d{4})_(\d{2})$')
+TAMANIO_LOTE = 5000
+
+_COLUMNAS_DDL = '''
+    tipo_operacion TEXT NOT NULL,
+    tabla TEXT NOT NULL,
+    registro_id INTEGER,
+    usuario TEXT,
+    datos_anteriores TEXT,
+    datos_nuevos TEXT,
+    descripcion TEXT
+'''
+
+
+def crear_tabla_auditoria(cursor, db_type, pk):
+    """Crea auditoria (particionada por mes en PostgreSQL) y las tablas de archivos"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS auditoria_archivos (
+            id {pk},
+            mes TEXT NOT NULL,
+            archivo TEXT NOT NULL UNIQUE,
+            id_min INTEGER,
+            id_max INTEGER,
+            filas INTEGER,
+            resumen TEXT,
+            fecha_archivo TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Pares (tabla, registro_id) de cada archivo, para no abrir archivos de más
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS auditoria_archivos_registros (
+            archivo_id INTEGER NOT NULL REFERENCES auditoria_archivos(id),
+            tabla TEXT NOT NULL,
+            registro_id INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auditoria_archivos_registros '
+                   'ON auditoria_archivos_registros(registro_id, tabla, archivo_id)')
+
+    if db_type != 'postgresql':
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS auditoria (
+                id {pk},
+                fecha_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                {_COLUMNAS_DDL}
+            )
+        ''')
+        return
+
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('auditoria')")
+    fila = cursor.fetchone()
+    tipo = fila[0] if fila else None
+    if tipo != 'p':
+        if tipo == 'r':
+            # Tabla sin particionar de versiones anteriores: se copia a la nueva
+            cursor.execute('ALTER TABLE auditoria RENAME TO auditoria_anterior')
+            cursor.execute('ALTER INDEX IF EXISTS auditoria_pkey RENAME TO auditoria_anterior_pkey')
+            cursor.execute('ALTER SEQUENCE IF EXISTS auditoria_id_seq OWNED BY NONE')
+        cursor.execute('CREATE SEQUENCE IF NOT EXISTS auditoria_id_seq')
+        cursor.execute(f'''
+            CREATE TABLE auditoria (
+                id INTEGER NOT NULL DEFAULT nextval('auditoria_id_seq'),
+                fecha_hora TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                {_COLUMNAS_DDL},
+                PRIMARY KEY (id, fecha_hora)
+            ) PARTITION BY RANGE (fecha_hora)
+        ''')
+        cursor.execute('CREATE TABLE auditoria_default PARTITION OF auditoria DEFAULT')
+        if tipo == 'r':
+            cursor.execute('SELECT MIN(fecha_hora), MAX(fecha_hora) FROM auditoria_anterior')
+            minimo, maximo = cursor.fetchone()
+            if minimo:
+                for anio, mes in _meses(_mes_de(minimo), _mes_siguiente(*_mes_de(maximo))):
+                    _crear_particion(cursor, anio, mes)
+            cursor.execute(f'''
+                INSERT INTO auditoria (id, fecha_hora, {', '.join(COLUMNAS)})
+                SELECT id, COALESCE(fecha_hora, CURRENT_TIMESTAMP), {', '.join(COLUMNAS)}
+                FROM auditoria_anterior
+            ''')
+            cursor.execute('DROP TABLE auditoria_anterior')
+            cursor.execute("SELECT setval('auditoria_id_seq', GREATEST((SELECT MAX(id) FROM auditoria), 1))")
+        cursor.execute('ALTER SEQUENCE auditoria_id_seq OWNED BY auditoria.id')
+    asegurar_particiones(cursor)
+
+
+def crear_indices_auditoria(cursor, tabla='auditoria'):
+    """Índices compuestos para los filtros y el historial de un registro"""
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{tabla}_fecha ON {tabla}(fecha_hora)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{tabla}_registro ON {tabla}(tabla, registro_id, id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{tabla}_tabla_tipo ON {tabla}(tabla, tipo_operacion, id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{tabla}_usuario ON {tabla}(usuario, id)')
+
+
+def _mes_de(valor):
+    """(año, mes) de una fecha, datetime o texto ISO"""
+    if isinstance(valor, (date, datetime)):
+        return valor.year, valor.month
+    return int(str(valor)[:4]), int(str(valor)[5:7])
+
+
+def _mes_siguiente(anio, mes):
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def _meses(desde, hasta):
+    """Meses (año, mes) desde `desde` inclusive hasta `hasta` exclusive"""
+    while desde < hasta:
+        yield desde
+        desde = _mes_siguiente(*desde)
+
+
+def _limites_mes(anio, mes):
+    siguiente = _mes_siguiente(anio, mes)
+    return f'{anio:04d}-{mes:02d}-01', f'{siguiente[0]:04d}-{siguiente[1]:02d}-01'
+
+
+def _nombre_mes(anio, mes):
+    return f'auditoria_{anio:04d}_{mes:02d}'
+
+
+def _crear_particion(cursor, anio, mes):
+    """Crea la partición de un mes (PostgreSQL), sacando antes sus filas de auditoria_default"""
+    nombre = _nombre_mes(anio, mes)
+    cursor.execute('SELECT to_regclass(%s)', (nombre,))
+    if cursor.fetchone()[0]:
+        return
+    inicio, fin = _limites_mes(anio, mes)
+    rango = 'fecha_hora >= %s AND fecha_hora < %s'
+    cursor.execute(f'SELECT 1 FROM auditoria_default WHERE {rango} LIMIT 1', (inicio, fin))
+    mover = cursor.fetchone() is not None
+    if mover:
+        cursor.execute(f'CREATE TEMP TABLE auditoria_mover AS SELECT * FROM auditoria_default WHERE {rango}',
+                       (inicio, fin))
+        cursor.execute(f'DELETE FROM auditoria_default WHERE {rango}', (inicio, fin))
+    cursor.execute(f"CREATE TABLE {nombre} PARTITION OF auditoria FOR VALUES FROM ('{inicio}') TO ('{fin}')")
+    if mover:
+        cursor.execute('INSERT INTO auditoria SELECT * FROM auditoria_mover')
+        cursor.execute('DROP TABLE auditoria_mover')
+
+
+def asegurar_particiones(cursor, meses_adelante=2):
+    """Particiones del mes en curso y los siguientes (PostgreSQL)"""
+    mes = _mes_de(date.today())
+    for _ in range(meses_adelante + 1):
+        _crear_particion(cursor, *mes)
+        mes = _mes_siguiente(*mes)
+
+
+def _fragmentos(cursor):
+    """Tablas mensuales de SQLite, de la más nueva a la más vieja"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'auditoria_%'")
+    return sorted((nombre for (nombre,) in cursor.fetchall() if PATRON_MES.match(nombre)), reverse=True)
+
+
+def _solapa(anio, mes, desde=None, hasta=None):
+    """¿El mes se superpone con el rango [desde, hasta)?"""
+    inicio, fin = _limites_mes(anio, mes)
+    return (not hasta or inicio < hasta) and (not desde or fin > desde)
+
+
+def _tablas(cursor, db_type, desde=None, hasta=None):
+    """Tablas vivas a consultar para un rango de fecha_hora"""
+    if db_type == 'postgresql':
+        return ['auditoria']  # la tabla particionada ya poda por rango
+    return ['auditoria'] + [
+        nombre for nombre in _fragmentos(cursor)
+        if _solapa(*map(int, PATRON_MES.match(nombre).groups()), desde, hasta)
+    ]
+
+
+def fragmentar(conn):
+    """SQLite: mueve cada mes cerrado de auditoria a su tabla mensual; devuelve las filas movidas"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT MIN(fecha_hora) FROM auditoria')
+    minimo = cursor.fetchone()[0]
+    if not minimo:
+        return 0
+    movidas = 0
+    for anio, mes in _meses(_mes_de(minimo), _mes_de(date.today())):
+        inicio, fin = _limites_mes(anio, mes)
+        cursor.execute('SELECT 1 FROM auditoria WHERE fecha_hora >= ? AND fecha_hora < ? LIMIT 1', (inicio, fin))
+        if cursor.fetchone() is None:
+            continue
+        nombre = _nombre_mes(anio, mes)
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {nombre} (
+                id INTEGER PRIMARY KEY,
+                fecha_hora TIMESTAMP,
+                {_COLUMNAS_DDL}
+            )
+        ''')
+        crear_indices_auditoria(cursor, nombre)
+        cursor.execute(f'''
+            INSERT INTO {nombre} ({', '.join(COLUMNAS_CONSULTA)})
+            SELECT {', '.join(COLUMNAS_CONSULTA)} FROM auditoria
+            WHERE fecha_hora >= ? AND fecha_hora < ?
+        ''', (inicio, fin))
+        movidas += cursor.rowcount
+        cursor.execute('DELETE FROM auditoria WHERE fecha_hora >= ? AND fecha_hora < ?', (inicio, fin))
+        conn.commit()
+    return movidas
+
+
+def _a_json(datos):
+    if datos is None or isinstance(datos, str):
+        return datos
+    return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def entrada(tipo_operacion, tabla, registro_id, usuario, datos_anteriores=None, datos_nuevos=None, descripcion=''):
+    """Fila de auditoría lista para insertar (los diccionarios se guardan como JSON)"""
+    return (tipo_operacion, tabla, registro_id, usuario,
+            _a_json(datos_anteriores), _a_json(datos_nuevos), descripcion)
+
+
+def _normalizar(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def diferencias(anterior, nuevo):
+    """({campo: antes}, {campo: después}) solo con los campos de `nuevo` que cambiaron"""
+    antes = {}
+    despues = {}
+    for campo, valor in nuevo.items():
+        if _normalizar(anterior.get(campo)) != _normalizar(valor):
+            antes[campo] = _normalizar(anterior.get(campo))
+            despues[campo] = _normalizar(valor)
+    return antes, despues
+
+
+def insertar(cursor, placeholder, entradas):
+    """Inserta entradas de auditoría con el cursor (y la transacción) de quien llama"""
+    if not entradas:
+        return
+    marcas = ', '.join([placeholder] * len(COLUMNAS))
+    cursor.executemany(f'INSERT INTO auditoria ({", ".join(COLUMNAS)}) VALUES ({marcas})', entradas)
+
+
+def _limite_fecha(valor, fin=False):
+    """Fecha u hora ISO como límite de un rango semiabierto [desde, hasta); ValueError si es inválida"""
+    valor = valor.strip()
+    if len(valor) == 10:
+        dia = date.fromisoformat(valor)
+        # Una fecha sola como "hasta" incluye todo ese día
+        return (dia + timedelta(days=1) if fin else dia).isoformat()
+    return datetime.fromisoformat(valor).isoformat(sep=' ')
+
+
+def condicion(placeholder, filtros=None, after_id=None):
+    """WHERE de la consulta de auditoría y sus parámetros"""
+    condiciones = []
+    params = []
+    filtros = filtros or {}
+    for campo in FILTROS:
+        if filtros.get(campo) not in (None, ''):
+            condiciones.append(f'{campo} = {placeholder}')
+            params.append(filtros[campo])
+    if filtros.get('desde'):
+        condiciones.append(f'fecha_hora >= {placeholder}')
+        params.append(_limite_fecha(filtros['desde']))
+    if filtros.get('hasta'):
+        condiciones.append(f'fecha_hora < {placeholder}')
+        params.append(_limite_fecha(filtros['hasta'], fin=True))
+    if after_id is not None:
+        condiciones.append(f'id < {placeholder}')
+        params.append(after_id)
+    return ('WHERE ' + ' AND '.join(condiciones)) if condiciones else '', params
+
+
+def fila_a_dict(fila):
+    """Fila de auditoría como diccionario para la API"""
+    registro = dict(zip(COLUMNAS_CONSULTA, fila))
+    fecha_hora = registro['fecha_hora']
+    if isinstance(fecha_hora, datetime):
+        registro['fecha_hora'] = fecha_hora.isoformat()
+    elif isinstance(fecha_hora, str):
+        registro['fecha_hora'] = fecha_hora.replace(' ', 'T')
+    registro['datos_anteriores'] = leer_datos(registro['datos_anteriores'])
+    registro['datos_nuevos'] = leer_datos(registro['datos_nuevos'])
+    return registro
+
+
+def _seleccionar(cursor, tablas, where, params, descendente=True, limite=None):
+    """Ejecuta la consulta sobre una o varias tablas vivas, ordenada por id"""
+    orden = 'DESC' if descendente else 'ASC'
+    tope = f'LIMIT {int(limite)}' if limite else ''
+    columnas = ', '.join(COLUMNAS_CONSULTA)
+    if len(tablas) == 1:
+        cursor.execute(f'SELECT {columnas} FROM {tablas[0]} {where} ORDER BY id {orden} {tope}', params)
+    else:
+        # Cada tabla aporta como mucho `limite` filas, ya ordenadas por su índice
+        partes = ' UNION ALL '.join(
+            f'SELECT * FROM (SELECT {columnas} FROM {tabla} {where} ORDER BY id {orden} {tope})'
+            for tabla in tablas
+        )
+        cursor.execute(f'SELECT * FROM ({partes}) ORDER BY id {orden} {tope}', list(params) * len(tablas))
+
+
+def _rango(filtros):
+    filtros = filtros or {}
+    desde = _limite_fecha(filtros['desde']) if filtros.get('desde') else None
+    hasta = _limite_fecha(filtros['hasta'], fin=True) if filtros.get('hasta') else None
+    return desde, hasta
+
+
+def consultar(cursor, db_type, placeholder, filtros=None, after_id=None, limite=100, directorio=None):
+    """Entradas más recientes primero (tablas vivas y luego archivos); la página siguiente se pide con after_id"""
+    where, params = condicion(placeholder, filtros, after_id)
+    _seleccionar(cursor, _tablas(cursor, db_type, *_rango(filtros)), where, params, limite=limite)
+    registros = [fila_a_dict(fila) for fila in cursor.fetchall()]
+
+    if len(registros) < limite and directorio:
+        # Los meses archivados tienen ids menores que todo lo vivo
+        desde_id = registros[-1]['id'] if registros else after_id
+        registros += leer_archivos(cursor, placeholder, directorio, filtros, desde_id, limite - len(registros))
+    return registros
+
+
+def historial_registro(cursor, db_type, placeholder, tabla, registro_id, directorio=None):
+    """Todas las entradas de un registro, en orden cronológico (idx_auditoria_registro)"""
+    filtros = {'tabla': tabla, 'registro_id': registro_id}
+    where, params = condicion(placeholder, filtros)
+    _seleccionar(cursor, _tablas(cursor, db_type), where, params, descendente=False)
+    vivas = [fila_a_dict(fila) for fila in cursor.fetchall()]
+    archivadas = leer_archivos(cursor, placeholder, directorio, filtros, ascendente=True) if directorio else []
+    return archivadas + vivas
+
+
+def _coincide(registro, filtros, desde, hasta, after_id):
+    for campo in FILTROS:
+        if filtros.get(campo) not in (None, '') and str(registro[campo]) != str(filtros[campo]):
+            return False
+    fecha_hora = str(registro['fecha_hora']).replace('T', ' ')
+    if (desde and fecha_hora < desde) or (hasta and fecha_hora >= hasta):
+        return False
+    return after_id is None or registro['id'] < after_id
+
+
+def _archivos_con_registro(cursor, placeholder, filtros):
+    """ids de los archivos que tienen entradas del registro_id (y tabla) pedidos"""
+    condicion = f'registro_id = {placeholder}'
+    params = [filtros['registro_id']]
+    if filtros.get('tabla'):
+        condicion += f' AND tabla = {placeholder}'
+        params.append(filtros['tabla'])
+    cursor.execute(f'SELECT DISTINCT archivo_id FROM auditoria_archivos_registros WHERE {condicion}', params)
+    return {fila[0] for fila in cursor.fetchall()}
+
+
+def _puede_tener(resumen, filtros, con_registro, archivo_id):
+    """¿El índice del archivo admite entradas con estos filtros?"""
+    resumen = json.loads(resumen)
+    for campo in RESUMEN:
+        if filtros.get(campo) not in (None, '') and str(filtros[campo]) not in resumen[campo]:
+            return False
+    return con_registro is None or archivo_id in con_registro
+
+
+def leer_archivos(cursor, placeholder, directorio, filtros=None, after_id=None, limite=None, ascendente=False):
+    """Entradas archivadas que cumplen los filtros (abre solo los archivos que pueden tenerlas)"""
+    filtros = filtros or {}
+    desde, hasta = _rango(filtros)
+    con_registro = None
+    if filtros.get('registro_id') not in (None, ''):
+        con_registro = _archivos_con_registro(cursor, placeholder, filtros)
+    cursor.execute('SELECT id, mes, archivo, id_min, id_max, resumen FROM auditoria_archivos ORDER BY id_max DESC')
+    archivos = [
+        (archivo, id_max) for archivo_id, mes, archivo, id_min, id_max, resumen in cursor.fetchall()
+        if (after_id is None or id_min < after_id) and _solapa(*_mes_de(mes), desde, hasta)
+        and _puede_tener(resumen, filtros, con_registro, archivo_id)
+    ]
+
+    registros = []
+    for archivo, id_max in archivos:
+        # Los archivos están ordenados por id: si ya hay `limite` filas más nuevas, no hace falta seguir
+        if limite and len(registros) >= limite and id_max < registros[limite - 1]['id']:
+            break
+        ruta = os.path.join(directorio, archivo)
+        if not os.path.exists(ruta):
+            print(f"⚠️ Archivo de auditoría no encontrado: {ruta}")
+            continue
+        with gzip.open(ruta, 'rt', encoding='utf-8') as entrada_archivo:
+            for linea in entrada_archivo:
+                registro = json.loads(linea)
+                if _coincide(registro, filtros, desde, hasta, after_id):
+                    registros.append(registro)
+        registros.sort(key=lambda r: r['id'], reverse=True)
+
+    registros = registros[:limite] if limite else registros
+    if ascendente:
+        registros.reverse()
+    return [fila_a_dict(tuple(r[c] for c in COLUMNAS_CONSULTA)) for r in registros]
+
+
+def _indexar(resumen, pares, registro):
+    """Suma una entrada al índice de su archivo"""
+    for campo in RESUMEN:
+        if registro[campo] is not None:
+            resumen[campo].add(str(registro[campo]))
+    if registro['tabla'] is not None and registro['registro_id'] is not None:
+        pares.add((registro['tabla'], int(registro['registro_id'])))
+
+
+def _guardar_indice(cursor, placeholder, archivo, resumen, pares):
+    cursor.execute(f'SELECT id FROM auditoria_archivos WHERE archivo = {placeholder}', (archivo,))
+    archivo_id = cursor.fetchone()[0]
+    cursor.execute(f'UPDATE auditoria_archivos SET resumen = {placeholder} WHERE id = {placeholder}',
+                   (json.dumps({campo: sorted(valores) for campo, valores in resumen.items()}), archivo_id))
+    cursor.executemany(f'INSERT INTO auditoria_archivos_registros (archivo_id, tabla, registro_id) '
+                       f'VALUES ({placeholder}, {placeholder}, {placeholder})',
+                       [(archivo_id, tabla, registro_id) for tabla, registro_id in sorted(pares)])
+
+
+def _ruta_libre(directorio, nombre):
+    """Nombre de archivo que no pisa uno existente (un mes puede archivarse en varias tandas)"""
+    archivo = f'{nombre}.jsonl.gz'
+    tanda = 1
+    while os.path.exists(os.path.join(directorio, archivo)):
+        tanda += 1
+        archivo = f'{nombre}.{tanda}.jsonl.gz'
+    return archivo
+
+
+def archivar(conn, db_type, placeholder, meses, directorio, progreso=None):
+    """Comprime a JSONL+gzip los meses anteriores a los últimos `meses` y los borra de la base"""
+    cursor = conn.cursor()
+    resultado = {'fragmentadas': 0, 'archivos': [], 'filas_archivadas': 0}
+    if db_type == 'postgresql':
+        asegurar_particiones(cursor)
+        conn.commit()
+    else:
+        resultado['fragmentadas'] = fragmentar(conn)
+
+    corte = _mes_de(date.today())
+    for _ in range(meses):
+        corte = (corte[0] - 1, 12) if corte[1] == 1 else (corte[0], corte[1] - 1)
+
+    tablas = _tablas(cursor, db_type)
+    minimos = []
+    for tabla in tablas:
+        cursor.execute(f'SELECT MIN(fecha_hora) FROM {tabla}')
+        minimos.append(cursor.fetchone()[0])
+    minimos = [_mes_de(m) for m in minimos if m]
+    if not minimos:
+        return resultado
+
+    os.makedirs(directorio, exist_ok=True)
+    for anio, mes in _meses(min(minimos), corte):
+        inicio, fin = _limites_mes(anio, mes)
+        nombre = _nombre_mes(anio, mes)
+        _seleccionar(cursor, _tablas(cursor, db_type, inicio, fin),
+                     f'WHERE fecha_hora >= {placeholder} AND fecha_hora < {placeholder}',
+                     (inicio, fin), descendente=False)
+
+        archivo = _ruta_libre(directorio, nombre)
+        ruta = os.path.join(directorio, archivo)
+        filas, id_min, id_max = 0, None, None
+        resumen, pares = {campo: set() for campo in RESUMEN}, set()
+        with gzip.open(ruta + '.tmp', 'wt', encoding='utf-8') as salida:
+            while True:
+                lote = cursor.fetchmany(TAMANIO_LOTE)
+                if not lote:
+                    break
+                for fila in lote:
+                    registro = dict(zip(COLUMNAS_CONSULTA, fila))
+                    _indexar(resumen, pares, registro)
+                    salida.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+                filas += len(lote)
+                id_min = lote[0][0] if id_min is None else id_min
+                id_max = lote[-1][0]
+        if not filas:
+            os.remove(ruta + '.tmp')
+            continue
+        os.replace(ruta + '.tmp', ruta)
+
+        cursor.execute(f'''
+            INSERT INTO auditoria_archivos (mes, archivo, id_min, id_max, filas)
+            VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
+        ''', (f'{anio:04d}-{mes:02d}', archivo, id_min, id_max, filas))
+        _guardar_indice(cursor, placeholder, archivo, resumen, pares)
+        if db_type == 'postgresql':
+            cursor.execute('SELECT to_regclass(%s)', (nombre,))
+            existe = cursor.fetchone()[0] is not None
+        else:
+            existe = nombre in _fragmentos(cursor)
+        if existe:
+            cursor.execute(f'DROP TABLE {nombre}')
+        # Lo que haya quedado del mes en auditoria (SQLite) o en auditoria_default (PostgreSQL)
+        cursor.execute(f'DELETE FROM auditoria WHERE fecha_hora >= {placeholder} AND fecha_hora < {placeholder}',
+                       (inicio, fin))
+        conn.commit()
+
+        resultado['archivos'].append(archivo)
+        resultado['filas_archivadas'] += filas
+        if progreso:
+            progreso(archivo, filas)
+    return resultado
+
+
+def leer_datos(texto):
+    """datos_anteriores / datos_nuevos como diccionario (o el texto de entradas viejas)"""
+    if not texto or not texto.startswith('{'):
+        return texto
+    try:
+        return json.loads(texto)
+    except ValueError:
+        return texto
@@ -0,0 +1,117 @@
+"""
+Barrios canónicos: agrupación de variantes ("B° Centro", "centro", "Centro ")
+
+La tabla barrio_canonico guarda, para cada variante escrita, su nombre
+normalizado (normalizacion.normalizar_barrio). tutores.barrio_norm (con
+índice) se completa al escribir, así los listados agrupan en SQL por
+barrio_norm y no normalizan nada por request.
+
+El nombre mostrado de cada barrio es su variante más frecuente, elegida en
+la misma consulta con una función de ventana. Las castraciones por barrio
+se cuentan sobre estadisticas_diarias, que ya tiene el total por barrio.
+"""
+from normalizacion import normalizar_barrio
+
+# Separador de variantes al agregarlas en SQL (no aparece en nombres reales)
+SEPARADOR = '\x1f'
+
+
+def crear_tablas_barrios(cursor, db_type):
+    """Crea barrio_canonico y la columna indexada tutores.barrio_norm"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS barrio_canonico (
+            barrio TEXT PRIMARY KEY,
+            barrio_norm TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_barrio_canonico_norm ON barrio_canonico(barrio_norm)')
+
+    if db_type == 'postgresql':
+        cursor.execute('ALTER TABLE tutores ADD COLUMN IF NOT EXISTS barrio_norm TEXT')
+    else:
+        cursor.execute('PRAGMA table_info(tutores)')
+        if 'barrio_norm' not in [columna[1] for columna in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE tutores ADD COLUMN barrio_norm TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tutores_barrio_norm ON tutores(barrio_norm, barrio)')
+
+
+def canonizar_barrio(cursor, placeholder, barrio):
+    """Devuelve el barrio normalizado y registra la variante si es nueva"""
+    if not barrio:
+        return ''
+    cursor.execute(f'SELECT barrio_norm FROM barrio_canonico WHERE barrio = {placeholder}', (barrio,))
+    fila = cursor.fetchone()
+    if fila:
+        return fila[0]
+    barrio_norm = normalizar_barrio(barrio)
+    cursor.execute(f'''
+        INSERT INTO barrio_canonico (barrio, barrio_norm) VALUES ({placeholder}, {placeholder})
+        ON CONFLICT (barrio) DO NOTHING
+    ''', (barrio, barrio_norm))
+    return barrio_norm
+
+
+def completar_barrios(cursor, placeholder):
+    """Completa barrio_norm en los tutores que no lo tienen; devuelve cuántos"""
+    cursor.execute('''
+        SELECT DISTINCT barrio FROM tutores
+        WHERE barrio_norm IS NULL AND barrio IS NOT NULL AND barrio != ''
+    ''')
+    variantes = [fila[0] for fila in cursor.fetchall()]
+    cursor.executemany(f'''
+        INSERT INTO barrio_canonico (barrio, barrio_norm) VALUES ({placeholder}, {placeholder})
+        ON CONFLICT (barrio) DO NOTHING
+    ''', [(barrio, normalizar_barrio(barrio)) for barrio in variantes])
+
+    cursor.execute('''
+        UPDATE tutores
+        SET barrio_norm = COALESCE(
+            (SELECT c.barrio_norm FROM barrio_canonico c WHERE c.barrio = tutores.barrio), '')
+        WHERE barrio_norm IS NULL
+    ''')
+    return cursor.rowcount
+
+
+def _agrupar(db_type, desde, condicion, norm='t.barrio_norm', barrio='t.barrio', cantidad='COUNT(*)'):
+    """Consulta (nombre, cantidad, variantes) por barrio_norm, de mayor a menor"""
+    if db_type == 'postgresql':
+        variantes = "STRING_AGG(barrio, CHR(31) ORDER BY cantidad DESC, barrio)"
+    else:
+        # group_concat respeta el orden de la subconsulta
+        variantes = "GROUP_CONCAT(barrio, CHAR(31))"
+    return f'''
+        SELECT MAX(CASE WHEN orden = 1 THEN barrio END) AS nombre,
+               SUM(cantidad) AS total,
+               {variantes} AS variantes
+        FROM (
+            SELECT barrio_norm, barrio, cantidad,
+                   ROW_NUMBER() OVER (PARTITION BY barrio_norm ORDER BY cantidad DESC, barrio) AS orden
+            FROM (
+                SELECT {norm} AS barrio_norm, {barrio} AS barrio, {cantidad} AS cantidad
+                FROM {desde}
+                WHERE {norm} != '' AND {condicion}
+                GROUP BY {norm}, {barrio}
+                HAVING {cantidad} > 0
+            ) por_variante
+            ORDER BY barrio_norm, orden
+        ) variantes
+        GROUP BY barrio_norm
+        ORDER BY total DESC, nombre
+    '''
+
+
+def estadisticas_barrios(cursor, db_type, placeholder):
+    """Castraciones por barrio: {nombre: total}"""
+    # Se cuenta sobre el resumen diario (ya agrupado por barrio) en vez de atenciones
+    cursor.execute(_agrupar(db_type, 'estadisticas_diarias r JOIN barrio_canonico c ON c.barrio = r.barrio',
+                            f'r.tipo_atencion = {placeholder}',
+                            norm='c.barrio_norm', barrio='r.barrio', cantidad='SUM(r.cantidad)'),
+                   ('castracion',))
+    return {nombre: total for nombre, total, _ in cursor.fetchall()}
+
+
+def lista_barrios(cursor, db_type):
+    """Barrios registrados: [{nombre, registros, variantes}]"""
+    cursor.execute(_agrupar(db_type, 'tutores t', '1=1'))
+    return [{'nombre': nombre, 'registros': total, 'variantes': variantes.split(SEPARADOR)}
+            for nombre, total, variantes in cursor.fetchall()]
@@ -0,0 +1,824 @@
+"""
+Benchmarks de rendimiento para MARI/MATECA
+
+Uso:
+    python benchmark.py estadisticas --registros 100000
+    python benchmark.py suite --tamanios 10000 100000 1000000 --salida benchmark.json
+    python benchmark.py suite --postgres postgresql://localhost/mari_bench
+    python benchmark.py arranque --maximo-ms 400 --maximo-mb 45
+    python benchmark.py carga --workers 1 2 4 --threads 4
+    python benchmark.py sqlite --registros 100000 --lectores 4
+
+La suite genera datos sintéticos (atenciones, tutores, turnos y auditoría)
+de cada tamaño y mide todos los métodos públicos de Database y todas las
+rutas /api/*; el JSON incluye el commit para comparar entre versiones.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+
+import agenda
+import auditoria
+import numeracion
+import tutores
+from config import config
+from database import Database
+
+BARRIOS = [
+    "Centro", "Pueblo Nuevo", "Barrio Parque", "Pueblo Belgrano", "Villa Elisa",
+    "Larralde", "San José", "Villa Zorraquín", "Rocamora", "Arroyo de la China",
+    "Parque San Martín", "Los Médanos", "Pueblo Liebig", "Villa Mariano Moreno",
+    "Barrio Ayuí", "barrio centro", "B° Parque", "",
+]
+ESPECIES = ["Canino", "Canino", "Canino", "Felino", "Felino", "Otro"]
+SEXOS = ["Macho", "Hembra"]
+TIPOS = ["castracion", "castracion", "castracion", "atencion_primaria"]
+ESTADOS_TURNO = ["pendiente", "pendiente", "completado", "cancelado"]
+# Agenda de prueba: lunes a viernes de 8 a 12, cada 30 minutos, dos turnos por tipo y horario
+HORARIOS_TURNO = agenda.horarios(8, 12, 30)
+CUPOS = [(tipo, dia, hora, 2) for tipo in agenda.TIPOS for dia in range(5) for hora in HORARIOS_TURNO]
+
+# Tablas con datos (vaciar_base); las de configuración y schema_version quedan
+TABLAS_DATOS = ('atenciones', 'tutores', 'tutor_identidades', 'turnos', 'turnos_cupos', 'auditoria',
+                'estadisticas_diarias', 'busqueda_indice', 'barrio_canonico', 'barrios_mapa', 'numeros_reservados')
+
+
+def _ponderada(valores):
+    """'Canino=3,Felino=2' -> lista con cada valor repetido según su peso (para random.choice)"""
+    lista = []
+    for item in valores.split(','):
+        valor, _, peso = item.partition('=')
+        lista.extend([valor.strip()] * int(peso or 1))
+    return lista
+
+
+def _insertar_lotes(db, cursor, tabla, columnas, filas, lote=10000):
+    """Inserta un generador de filas por lotes (execute_values en PostgreSQL)"""
+    if db.db_type == 'postgresql':
+        from psycopg2.extras import execute_values
+        filas = iter(filas)
+        while True:
+            bloque = list(itertools.islice(filas, lote))
+            if not bloque:
+                break
+            execute_values(cursor, f'INSERT INTO {tabla} ({", ".join(columnas)}) VALUES %s', bloque,
+                           page_size=lote)
+    else:
+        marcas = ', '.join('?' * len(columnas))
+        cursor.executemany(f'INSERT INTO {tabla} ({", ".join(columnas)}) VALUES ({marcas})', filas)
+
+
+def generar_base(registros, dias=3 * 365, semilla=42, db_url=None, barrios=BARRIOS, especies=ESPECIES,
+                 tipos=TIPOS, tutores_por_atencion=0.7, turnos_por_atencion=0.1, auditoria_por_atencion=0.5):
+    """Crea una base con `registros` atenciones sintéticas y sus tutores, turnos y auditoría.
+
+    Sin db_url usa una base SQLite temporal; con db_url (PostgreSQL de pruebas) la base debe estar vacía.
+    """
+    random.seed(semilla)
+    if not db_url:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='mari_bench_'), 'bench.db')}"
+    db = Database(db_url=db_url)
+    db.cache.ttl = 0  # medir siempre contra la base, no contra la caché
+    inicio = date.today() - timedelta(days=dias)
+    cantidad_tutores = max(1, int(registros * tutores_por_atencion))
+
+    with db.conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM atenciones')
+        if cursor.fetchone()[0]:
+            raise ValueError('La base de pruebas debe estar vacía')
+
+        _insertar_lotes(db, cursor, 'tutores', ('id', 'nombre_apellido', 'dni', 'direccion', 'barrio', 'telefono'),
+                        ((i, f"Tutor {i}", str(20000000 + i), f"Calle {i % 500} {i % 3000}",
+                          random.choice(barrios), f"3446-{i % 999999:06d}")
+                         for i in range(1, cantidad_tutores + 1)))
+        _insertar_lotes(db, cursor, 'atenciones',
+                        ('numero', 'fecha', 'tipo_atencion', 'nombre_animal', 'especie', 'sexo', 'edad', 'tutor_id'),
+                        ((i, (inicio + timedelta(days=random.randint(0, dias))).isoformat(), random.choice(tipos),
+                          f"Animal {i}", random.choice(especies), random.choice(SEXOS), "2 años",
+                          random.randint(1, cantidad_tutores))
+                         for i in range(1, registros + 1)))
+        _insertar_lotes(db, cursor, 'turnos_cupos', ('tipo', 'dia_semana', 'hora', 'capacidad'), CUPOS)
+        # Turnos desde el inicio del período hasta un mes adelante
+        _insertar_lotes(db, cursor, 'turnos', ('fecha', 'hora', 'nombre_animal', 'tutor_nombre', 'telefono', 'tipo', 'estado'),
+                        (((inicio + timedelta(days=random.randint(0, dias + 30))).isoformat(),
+                          random.choice(HORARIOS_TURNO), f"Animal {i}", f"Tutor {i}", '',
+                          random.choice(agenda.TIPOS), random.choice(ESTADOS_TURNO))
+                         for i in range(1, int(registros * turnos_por_atencion) + 1)))
+        _insertar_lotes(db, cursor, 'auditoria', ('fecha_hora',) + auditoria.COLUMNAS,
+                        (((datetime.combine(inicio, datetime.min.time()) +
+                           timedelta(seconds=random.randint(0, dias * 86400))).isoformat(sep=' '),) +
+                         auditoria.entrada('UPDATE', 'atenciones', random.randint(1, registros), 'mariateresa',
+                                           {'nombre_animal': f"Animal {i}"}, {'nombre_animal': f"Animal {i}b"},
+                                           f"Edición de atención #{i}")
+                         for i in range(1, int(registros * auditoria_por_atencion) + 1)))
+        if db.db_type == 'postgresql':
+            cursor.execute("SELECT setval(pg_get_serial_sequence('tutores', 'id'), %s)", (cantidad_tutores,))
+        tutores.asignar_identidades(cursor)
+        numeracion.avanzar(cursor, db.db_type, registros)
+        conn.commit()
+    db.actualizar_barrios()
+    db.reconstruir_estadisticas()
+    db.reconstruir_busqueda()
+    return db
+
+
+def vaciar_base(db):
+    """Borra los datos de una base PostgreSQL de pruebas (para generar otro tamaño)"""
+    with db.conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"TRUNCATE {', '.join(TABLAS_DATOS)} RESTART IDENTITY")
+        cursor.execute(f"SELECT setval('{numeracion.SECUENCIA}', 1, false)")
+        conn.commit()
+    db.cache.invalidar()
+
+
+def estadisticas_por_consultas(db, fecha_desde=None, fecha_hasta=None):
+    """Implementación anterior (diez consultas separadas), usada como referencia"""
+    ph = db.get_placeholder()
+    condicion = "1=1"
+    params = []
+    if fecha_desde:
+        condicion += f" AND fecha >= {ph}"
+        params.append(fecha_desde)
+    if fecha_hasta:
+        condicion += f" AND fecha <= {ph}"
+        params.append(fecha_hasta)
+
+    if db.db_type == 'postgresql':
+        dia, semana, mes, anio = ("fecha::date", "TO_CHAR(fecha, 'IYYY-IW')",
+                                  "TO_CHAR(fecha, 'YYYY-MM')", "EXTRACT(YEAR FROM fecha)::text")
+    else:
+        dia, semana, mes, anio = ("DATE(fecha)", "strftime('%Y-W%W', fecha)",
+                                  "strftime('%Y-%m', fecha)", "strftime('%Y', fecha)")
+
+    consultas = {
+        'por_tipo': f"SELECT tipo_atencion, COUNT(*) c FROM atenciones WHERE {condicion} GROUP BY tipo_atencion ORDER BY c DESC",
+        'por_especie': f"SELECT especie, COUNT(*) c FROM atenciones WHERE {condicion} GROUP BY especie ORDER BY c DESC",
+        'por_sexo': f"SELECT sexo, COUNT(*) FROM atenciones WHERE {condicion} GROUP BY sexo",
+        'por_dia': f"SELECT {dia} d, COUNT(*) FROM atenciones WHERE {condicion} GROUP BY d ORDER BY d ASC",
+        'por_semana': f"SELECT {semana} s, COUNT(*) FROM atenciones WHERE {condicion} GROUP BY s ORDER BY s ASC",
+        'por_mes': f"SELECT {mes} m, COUNT(*) FROM atenciones WHERE {condicion} GROUP BY m ORDER BY m ASC",
+        'por_barrio': f'''SELECT t.barrio, COUNT(*) c FROM atenciones a JOIN tutores t ON a.tutor_id = t.id
+                          WHERE t.barrio IS NOT NULL AND t.barrio != '' AND {condicion}
+                          GROUP BY t.barrio ORDER BY c DESC LIMIT 15''',
+        'por_anio': f"SELECT {anio} y, COUNT(*) FROM atenciones WHERE {condicion} GROUP BY y ORDER BY y DESC",
+        'especie_sexo': f"SELECT especie, sexo, COUNT(*) FROM atenciones WHERE {condicion} GROUP BY especie, sexo ORDER BY especie, sexo",
+    }
+
+    stats = {}
+    with db.conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM atenciones WHERE {condicion}", params)
+        stats['total'] = cursor.fetchone()[0]
+        for clave, sql in consultas.items():
+            cursor.execute(sql, params)
+            stats[clave] = cursor.fetchall()
+    return stats
+
+
+def medir(funcion, repeticiones=5):
+    """Devuelve (mejor tiempo en ms, último resultado)"""
+    mejor = None
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        transcurrido = (time.perf_counter() - inicio) * 1000
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor, resultado
+
+
+def _normalizar(stats):
+    """Ordena empates para comparar resultados independientemente del motor"""
+    return {k: sorted(map(tuple, v), key=repr) if isinstance(v, list) else v for k, v in stats.items()}
+
+
+def bench_estadisticas(args):
+    print(f"📦 Generando {args.registros} atenciones sintéticas...")
+    db = generar_base(args.registros, dias=args.dias)
+
+    t_antes, antes = medir(lambda: estadisticas_por_consultas(db), args.repeticiones)
+    t_ahora, ahora = medir(lambda: db.obtener_estadisticas(), args.repeticiones)
+
+    claves_sin_top = [k for k in antes if k != 'por_barrio']
+    iguales = all(_normalizar(antes)[k] == _normalizar(ahora)[k] for k in claves_sin_top)
+    iguales = iguales and dict(antes['por_barrio']) == dict(ahora['por_barrio'])
+
+    print(f"\n⏱️  Diez consultas:  {t_antes:9.1f} ms")
+    print(f"⏱️  Resumen diario:  {t_ahora:9.1f} ms")
+    print(f"🚀 Aceleración:     {t_antes / t_ahora:9.2f}x")
+    print(f"{'✅' if iguales else '❌'} Resultados {'idénticos' if iguales else 'DISTINTOS'}")
+    return 0 if iguales else 1
+
+
+# ---------------------------------------------------------------------------
+# Suite completa: todos los métodos públicos de Database y todas las rutas /api
+# ---------------------------------------------------------------------------
+
+# Métodos de infraestructura (se usan dentro de los demás; no tienen caso propio)
+AUXILIARES = ('get_connection', 'conexion', 'get_placeholder', 'get_autoincrement', 'ejecutar',
+              'get_integrity_error', 'insertar', 'registrar_auditoria')
+
+
+class Contexto:
+    """Números e ids que los casos de escritura crean y los de edición/borrado consumen"""
+
+    def __init__(self, db, registros, turnos):
+        self.registros = registros
+        self.numeros = itertools.count(registros + 1)
+        self.creados = []
+        self.turnos = list(range(turnos, 0, -1))
+        self.barrios_mapa = []
+        self.cupos = []
+        self.minutos_cupo = itertools.count()
+        # Horarios libres después del último turno generado (los generados llegan a un mes adelante)
+        desde = date.today() + timedelta(days=31)
+        self.horarios_libres = db.turnos_disponibles(desde.isoformat(), (desde + timedelta(days=61)).isoformat())
+        with db.conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT numero FROM atenciones WHERE tipo_atencion = 'castracion' LIMIT 1000")
+            self.castraciones = [fila[0] for fila in cursor.fetchall()]
+
+    def numero_existente(self):
+        return random.randint(1, self.registros)
+
+    def castracion_existente(self):
+        return random.choice(self.castraciones)
+
+    def turno(self):
+        libre = self.horarios_libres.pop()
+        return dict(fecha=libre['fecha'], hora=libre['hora'], nombre_animal='Bench', tutor_nombre='Tutor Bench',
+                    telefono='', tipo=libre['tipo'])
+
+    def cupo(self):
+        """Cupo nuevo de fin de semana (fuera de CUPOS); eliminar_cupo lo consume"""
+        minutos = next(self.minutos_cupo)
+        cupo = dict(tipo='Control', dia_semana=5 + minutos // 1440 % 2,
+                    hora=f'{minutos // 60 % 24:02d}:{minutos % 60:02d}', capacidad=1)
+        self.cupos.append(cupo)
+        return cupo
+
+    def cupo_creado(self):
+        cupo = self.cupos.pop()
+        return dict(tipo=cupo['tipo'], dia_semana=cupo['dia_semana'], hora=cupo['hora'])
+
+    def datos(self, numero, **extra):
+        return dict(numero=numero, fecha=date.today().isoformat(), nombre_animal=f"Bench {numero}",
+                    especie='Canino', sexo='Macho', edad='1 año', nombre_apellido='Tutor Bench',
+                    dni=str(30000000 + numero % 1000), direccion='Calle 1', barrio='Centro',
+                    telefono='3446-000000', **extra)
+
+    def atencion(self, **extra):
+        numero = next(self.numeros)
+        self.creados.append(numero)
+        return self.datos(numero, **extra)
+
+
+def _casos_metodos(db, ctx, directorio):
+    """[(método, función, una_sola_vez)] en orden de ejecución (el mantenimiento al final)"""
+    hoy = date.today()
+    hace_un_mes = (hoy - timedelta(days=30)).isoformat()
+    return [
+        ('init_db', lambda: db.init_db(), False),
+        ('agregar_atencion', lambda: db.agregar_atencion(**ctx.atencion(tipo_atencion='atencion_primaria')), False),
+        ('agregar_castracion', lambda: db.agregar_castracion(**ctx.atencion()), False),
+        ('editar_atencion', lambda: _editar_atencion(db, ctx), False),
+        ('actualizar_castracion', lambda: _actualizar_castracion(db, ctx), False),
+        ('eliminar_atencion', lambda: db.eliminar_atencion(ctx.creados.pop()), False),
+        ('eliminar_castracion', lambda: db.eliminar_castracion(ctx.creados.pop()), False),
+        ('obtener_castracion_por_id', lambda: db.obtener_castracion_por_id(ctx.castracion_existente()), False),
+        ('buscar_atenciones', lambda: db.buscar_atenciones({'especie': 'Felino', 'fecha_desde': hace_un_mes},
+                                                          limite=51), False),
+        ('contar_atenciones', lambda: db.contar_atenciones({'tipo_atencion': 'castracion'}), False),
+        ('buscar_rapido', lambda: db.buscar_rapido('animal 12'), False),
+        ('obtener_estadisticas', lambda: db.obtener_estadisticas(), False),
+        ('obtener_estadisticas_barrios', lambda: db.obtener_estadisticas_barrios(), False),
+        ('obtener_lista_barrios', lambda: db.obtener_lista_barrios(), False),
+        ('obtener_dashboard_stats', lambda: db.obtener_dashboard_stats(), False),
+        ('obtener_auditoria', lambda: db.obtener_auditoria(101, {'tabla': 'atenciones'}), False),
+        ('historial_registro', lambda: db.historial_registro('atenciones', ctx.numero_existente()), False),
+        ('historial_tutor', lambda: db.historial_tutor(str(20000000 + ctx.numero_existente() % 1000)), False),
+        ('obtener_siguiente_numero', lambda: db.obtener_siguiente_numero(), False),
+        ('reservar_numero', lambda: db.reservar_numero('bench'), False),
+        ('agregar_turno', lambda: db.agregar_turno(**ctx.turno()), False),
+        ('turnos_disponibles', lambda: db.turnos_disponibles(hoy.isoformat(), (hoy + timedelta(days=13)).isoformat()),
+         False),
+        ('buscar_turnos', lambda: db.buscar_turnos(hoy.isoformat(), estado='pendiente', limite=51), False),
+        ('resumen_turnos', lambda: db.resumen_turnos(hoy.isoformat(), (hoy + timedelta(days=41)).isoformat()), False),
+        ('listar_cupos', lambda: db.listar_cupos(), False),
+        ('guardar_cupo', lambda: db.guardar_cupo(**ctx.cupo()), False),
+        ('eliminar_cupo', lambda: db.eliminar_cupo(**ctx.cupo_creado()), False),
+        ('actualizar_estado_turno', lambda: db.actualizar_estado_turno(ctx.turnos[-1], 'completado'), False),
+        ('eliminar_turno', lambda: db.eliminar_turno(ctx.turnos.pop()), False),
+        ('importar_atenciones', lambda: db.importar_atenciones([ctx.atencion() for _ in range(100)]), False),
+        ('exportar_csv', lambda: sum(1 for _ in db.exportar_csv({'fecha_desde': hace_un_mes})), False),
+        ('buscar_castraciones', lambda: db.buscar_castraciones({'especie': 'Felino'}), True),
+        ('exportar_a_excel', lambda: db.exportar_a_excel(io.BytesIO()), True),
+        ('actualizar_barrios', lambda: db.actualizar_barrios(), True),
+        ('reconstruir_estadisticas', lambda: db.reconstruir_estadisticas(), True),
+        ('reconstruir_busqueda', lambda: db.reconstruir_busqueda(), True),
+        ('compactar_tutores', lambda: db.compactar_tutores(), True),
+        ('depurar_tutores', lambda: db.depurar_tutores(vacuum=False), True),
+        ('archivar_auditoria', lambda: db.archivar_auditoria(directorio=directorio), True),
+    ]
+
+
+def _editar_atencion(db, ctx):
+    numero = ctx.numero_existente()
+    return db.editar_atencion(numero, ctx.datos(numero, observaciones='bench'))
+
+
+def _actualizar_castracion(db, ctx):
+    numero = ctx.castracion_existente()
+    return db.actualizar_castracion(numero, **ctx.datos(numero))
+
+
+def _casos_rutas(ctx):
+    """{'MÉTODO /regla': función(cliente) -> respuesta}"""
+    hace_un_mes = (date.today() - timedelta(days=30)).isoformat()
+
+    def alta_barrio(cliente):
+        respuesta = cliente.post('/api/barrios/mapa', json={'nombre': 'Bench', 'latitud': -33.0, 'longitud': -58.5})
+        ctx.barrios_mapa.append(respuesta.get_json()['id'])
+        return respuesta
+
+    def carga_masiva(cliente):
+        lineas = '\n'.join(json.dumps(ctx.atencion()) for _ in range(100))
+        return cliente.post('/api/atenciones/bulk', data=lineas, content_type='application/x-ndjson')
+
+    return {
+        'GET /api/exportar': lambda c: c.get(f'/api/exportar?formato=csv&fecha_desde={hace_un_mes}'),
+        'POST /api/atenciones': lambda c: c.post('/api/atenciones', json=ctx.atencion()),
+        'POST /api/atenciones/bulk': carga_masiva,
+        'GET /api/atenciones': lambda c: c.get('/api/atenciones?especie=Felino&limit=50'),
+        'GET /api/buscar': lambda c: c.get('/api/buscar?q=animal%2012'),
+        'GET /api/tutores/<dni>/historial': lambda c: c.get(f'/api/tutores/{20000000 + ctx.numero_existente() % 1000}/historial'),
+        'POST /api/castraciones': lambda c: c.post('/api/castraciones', json=ctx.atencion()),
+        'GET /api/castraciones': lambda c: c.get(f'/api/castraciones?fecha_desde={hace_un_mes}'),
+        'GET /api/estadisticas': lambda c: c.get('/api/estadisticas'),
+        'GET /api/estadisticas/barrios': lambda c: c.get('/api/estadisticas/barrios'),
+        'GET /api/barrios/lista': lambda c: c.get('/api/barrios/lista'),
+        'GET /api/barrios/mapa': lambda c: c.get('/api/barrios/mapa'),
+        'POST /api/barrios/mapa': alta_barrio,
+        'PUT /api/barrios/mapa/<int:barrio_id>': lambda c: c.put(
+            f'/api/barrios/mapa/{ctx.barrios_mapa[-1]}', json={'nombre': 'Bench 2', 'latitud': -33.1, 'longitud': -58.4}),
+        'DELETE /api/barrios/mapa/<int:barrio_id>': lambda c: c.delete(f'/api/barrios/mapa/{ctx.barrios_mapa.pop()}'),
+        'GET /api/atenciones/<int:numero>': lambda c: c.get(f'/api/atenciones/{ctx.numero_existente()}'),
+        'PUT /api/atenciones/<int:numero>': lambda c: _put(c, '/api/atenciones', ctx.numero_existente(), ctx),
+        'DELETE /api/atenciones/<int:numero>': lambda c: c.delete(f'/api/atenciones/{ctx.creados.pop()}'),
+        'GET /api/siguiente-numero': lambda c: c.get('/api/siguiente-numero'),
+        'POST /api/numeros/reservar': lambda c: c.post('/api/numeros/reservar'),
+        'GET /api/castraciones/<int:numero>': lambda c: c.get(f'/api/castraciones/{ctx.castracion_existente()}'),
+        'PUT /api/castraciones/<int:numero>': lambda c: _put(c, '/api/castraciones', ctx.castracion_existente(), ctx),
+        'DELETE /api/castraciones/<int:numero>': lambda c: c.delete(f'/api/castraciones/{ctx.creados.pop()}'),
+        'GET /api/dashboard': lambda c: c.get('/api/dashboard'),
+        'GET /api/cache': lambda c: c.get('/api/cache'),
+        'POST /api/turnos': lambda c: c.post('/api/turnos', json=ctx.turno()),
+        'GET /api/turnos': lambda c: c.get(f'/api/turnos?desde={hace_un_mes}&estado=pendiente&limit=50'),
+        'GET /api/turnos/resumen': lambda c: c.get('/api/turnos/resumen'),
+        'GET /api/turnos/disponibles': lambda c: c.get('/api/turnos/disponibles'),
+        'GET /api/turnos/cupos': lambda c: c.get('/api/turnos/cupos'),
+        'PUT /api/turnos/cupos': lambda c: c.put('/api/turnos/cupos', json=ctx.cupo()),
+        'DELETE /api/turnos/cupos': lambda c: c.delete('/api/turnos/cupos', json=ctx.cupo_creado()),
+        'PUT /api/turnos/<int:turno_id>': lambda c: c.put(f'/api/turnos/{ctx.turnos[-1]}', json={'estado': 'completado'}),
+        'DELETE /api/turnos/<int:turno_id>': lambda c: c.delete(f'/api/turnos/{ctx.turnos.pop()}'),
+        'GET /api/auditoria': lambda c: c.get('/api/auditoria?tabla=atenciones&limit=50'),
+        'GET /api/auditoria/<tabla>/<int:registro_id>': lambda c: c.get(f'/api/auditoria/atenciones/{ctx.numero_existente()}'),
+    }
+
+
+def _put(cliente, ruta, numero, ctx):
+    return cliente.put(f'{ruta}/{numero}', json=ctx.datos(numero, observaciones='bench'))
+
+
+def _cronometrar(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {'min_ms': round(min(tiempos), 3), 'mediana_ms': round(statistics.median(tiempos), 3),
+            'repeticiones': repeticiones}
+
+
+def medir_metodos(db, ctx, repeticiones, directorio):
+    """Tiempos de cada método público de Database; devuelve (tiempos, métodos sin caso)"""
+    casos = _casos_metodos(db, ctx, directorio)
+    resultados = {}
+    for nombre, funcion, una_sola_vez in casos:
+        resultados[nombre] = _cronometrar(funcion, 1 if una_sola_vez else repeticiones)
+        print(f"   {nombre:32} {resultados[nombre]['mediana_ms']:10.2f} ms")
+    publicos = [nombre for nombre in dir(Database) if not nombre.startswith('_') and callable(getattr(Database, nombre))]
+    sin_caso = sorted(set(publicos) - set(resultados) - set(AUXILIARES))
+    return resultados, sin_caso
+
+
+def medir_rutas(app_module, db, ctx, repeticiones):
+    """Tiempos de cada ruta /api/* con el cliente de pruebas de Flask; devuelve (tiempos, rutas sin caso)"""
+    app_module.db = db
+    cliente = app_module.app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['logged_in'] = True
+        sesion['usuario'] = 'bench'
+
+    casos = _casos_rutas(ctx)
+    reglas = [f'{metodo} {regla.rule}' for regla in app_module.app.url_map.iter_rules()
+              if regla.rule.startswith('/api/') for metodo in sorted(regla.methods - {'HEAD', 'OPTIONS'})]
+    resultados = {}
+    for clave in reglas:
+        if clave not in casos:
+            continue
+        estados = set()
+
+        def pedido():
+            with redirect_stdout(io.StringIO()):  # login_required imprime cada pedido
+                respuesta = casos[clave](cliente)
+                respuesta.get_data()
+            estados.add(respuesta.status_code)
+
+        resultados[clave] = _cronometrar(pedido, repeticiones)
+        resultados[clave]['estados'] = sorted(estados)
+        print(f"   {clave:50} {resultados[clave]['mediana_ms']:10.2f} ms  {sorted(estados)}")
+    return resultados, [clave for clave in reglas if clave not in casos]
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def bench_suite(args):
+    informe = {
+        'meta': {
+            'commit': _commit_actual(),
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'motor': 'postgresql' if args.postgres else 'sqlite',
+            'repeticiones': args.repeticiones,
+            'semilla': args.semilla,
+        },
+        'tamanios': {},
+    }
+    app_module = None
+    for registros in args.tamanios:
+        print(f"\n📦 Generando {registros} atenciones sintéticas...")
+        inicio = time.perf_counter()
+        if args.postgres:
+            vaciar_base(Database(db_url=args.postgres))
+        db = generar_base(registros, dias=args.dias, semilla=args.semilla, db_url=args.postgres,
+                          barrios=_ponderada(args.barrios) if args.barrios else BARRIOS,
+                          especies=_ponderada(args.especies) if args.especies else ESPECIES,
+                          tutores_por_atencion=args.tutores_por_atencion)
+        generacion = time.perf_counter() - inicio
+        print(f"   listo en {generacion:.1f} s")
+
+        if app_module is None:
+            # app.py crea su Database al importarse: que apunte a la base de prueba
+            os.environ['DATABASE_URL'] = db.db_url
+            import app as app_module
+        ctx = Contexto(db, registros, int(registros * 0.1))
+
+        print("🔎 Métodos de Database")
+        with tempfile.TemporaryDirectory(prefix='mari_bench_archivo_') as directorio:
+            metodos, metodos_sin_caso = medir_metodos(db, ctx, args.repeticiones, directorio)
+        print("🌐 Rutas /api")
+        rutas, rutas_sin_caso = medir_rutas(app_module, db, ctx, args.repeticiones)
+
+        informe['tamanios'][str(registros)] = {
+            'generacion_s': round(generacion, 2),
+            'metodos': metodos,
+            'rutas': rutas,
+            'sin_caso': {'metodos': metodos_sin_caso, 'rutas': rutas_sin_caso},
+        }
+        for tipo, faltantes in (('métodos', metodos_sin_caso), ('rutas', rutas_sin_caso)):
+            if faltantes:
+                print(f"⚠️  {tipo} sin caso de benchmark: {', '.join(faltantes)}")
+
+    with open(args.salida, 'w', encoding='utf-8') as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados en {args.salida}")
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Arranque: tiempo y memoria de `import app` (lo que paga cada worker)
+# ---------------------------------------------------------------------------
+
+# Módulos que solo usan exportación/importación XLSX: no deben cargarse al arrancar
+MODULOS_DIFERIDOS = ('openpyxl', 'pandas')
+
+_MEDIR_ARRANQUE = """
+import contextlib, io, json, resource, sys, time
+inicio = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+segundos = time.perf_counter() - inicio
+print(json.dumps({
+    'import_ms': segundos * 1000,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modulos': len(sys.modules),
+    'diferidos_cargados': [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def medir_arranque(db_url):
+    """Importa app en un proceso nuevo; devuelve {import_ms, rss_mb, modulos, diferidos_cargados}"""
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    salida = subprocess.run([sys.executable, '-c', _MEDIR_ARRANQUE % (MODULOS_DIFERIDOS,)],
+                            capture_output=True, text=True, check=True, cwd=directorio,
+                            env=dict(os.environ, DATABASE_URL=db_url))
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def bench_arranque(args):
+    db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='mari_bench_'), 'arranque.db')}"
+    medir_arranque(db_url)  # la primera vez crea el esquema y compila los .pyc
+
+    medidas = [medir_arranque(db_url) for _ in range(args.repeticiones)]
+    import_ms = statistics.median(m['import_ms'] for m in medidas)
+    rss_mb = statistics.median(m['rss_mb'] for m in medidas)
+    diferidos = sorted({modulo for m in medidas for modulo in m['diferidos_cargados']})
+
+    print(f"⏱️  import app:  {import_ms:8.1f} ms (mediana de {args.repeticiones})")
+    print(f"🧠 RSS máximo:  {rss_mb:8.1f} MB")
+    print(f"📚 Módulos:     {medidas[-1]['modulos']:8d}")
+
+    fallas = []
+    if diferidos:
+        fallas.append(f"se cargaron al arrancar: {', '.join(diferidos)}")
+    if args.maximo_ms and import_ms > args.maximo_ms:
+        fallas.append(f"import app tardó {import_ms:.0f} ms (máximo {args.maximo_ms} ms)")
+    if args.maximo_mb and rss_mb > args.maximo_mb:
+        fallas.append(f"RSS de {rss_mb:.0f} MB (máximo {args.maximo_mb} MB)")
+    for falla in fallas:
+        print(f"❌ {falla}")
+    if not fallas:
+        print("✅ Arranque sin módulos de exportación cargados")
+    return 1 if fallas else 0
+
+
+# ---------------------------------------------------------------------------
+# Carga: gunicorn real (gunicorn.conf.py) con clientes concurrentes
+# ---------------------------------------------------------------------------
+
+# Pedidos de lectura que reparten los clientes (se eligen al azar)
+RUTAS_CARGA = [
+    '/api/dashboard',
+    '/api/atenciones?limit=50',
+    '/api/atenciones?especie=Felino&limit=50',
+    '/api/buscar?q=animal%2012',
+    '/api/estadisticas/barrios',
+    '/api/barrios/lista',
+    '/api/siguiente-numero',
+]
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _iniciar_gunicorn(db_url, workers, threads):
+    """Levanta gunicorn con gunicorn.conf.py; devuelve (proceso, url base)"""
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+         '--threads', str(threads), '--bind', f'127.0.0.1:{puerto}', '--max-requests', '0', 'app:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=dict(os.environ, DATABASE_URL=db_url),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{puerto}'
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            urllib.request.urlopen(f'{base}/login', timeout=1).read()
+            return proceso, base
+        except OSError:
+            if proceso.poll() is not None:
+                break
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError('gunicorn no respondió (¿está instalado?)')
+
+
+def _sesion(base):
+    """Inicia sesión y devuelve la cookie"""
+    pedido = urllib.request.Request(f'{base}/login', method='POST', headers={'Content-Type': 'application/json'},
+                                    data=json.dumps({'usuario': config.USUARIO, 'password': config.PASSWORD}).encode())
+    with urllib.request.urlopen(pedido) as respuesta:
+        return respuesta.headers['Set-Cookie'].split(';')[0]
+
+
+def _cliente(base, cookie, rutas, hasta, latencias, errores, semilla):
+    azar = random.Random(semilla)
+    while time.monotonic() < hasta:
+        pedido = urllib.request.Request(base + azar.choice(rutas), headers={'Cookie': cookie})
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(pedido, timeout=60) as respuesta:
+                respuesta.read()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        except OSError:
+            errores.append(1)
+
+
+def medir_carga(db_url, workers, threads, clientes, segundos, exportando):
+    """Pedidos por segundo y latencias con `clientes` hilos; `exportando` clientes más piden /api/exportar"""
+    proceso, base = _iniciar_gunicorn(db_url, workers, threads)
+    try:
+        cookie = _sesion(base)
+        latencias, errores, exportaciones = [], [], []
+        hasta = time.monotonic() + segundos
+        hilos = [threading.Thread(target=_cliente, args=(base, cookie, RUTAS_CARGA, hasta, latencias, errores, i))
+                 for i in range(clientes)]
+        hilos += [threading.Thread(target=_cliente, args=(base, cookie, ['/api/exportar'], hasta, exportaciones,
+                                                          errores, i))
+                  for i in range(exportando)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+    latencias.sort()
+    return {
+        'workers': workers,
+        'threads': threads,
+        'pedidos_s': round(len(latencias) / segundos, 1),
+        'p50_ms': round(latencias[len(latencias) // 2], 1) if latencias else None,
+        'p95_ms': round(latencias[int(len(latencias) * 0.95)], 1) if latencias else None,
+        'exportaciones': len(exportaciones),
+        'errores': len(errores),
+    }
+
+
+def bench_carga(args):
+    print(f"📦 Generando {args.registros} atenciones sintéticas...")
+    db = generar_base(args.registros)
+    print(f"🖥️  CPU disponibles: {os.cpu_count()}; {args.clientes} clientes"
+          f"{f' + {args.exportando} exportando' if args.exportando else ''}, {args.segundos} s por configuración\n")
+
+    resultados = []
+    for workers in args.workers:
+        resultado = medir_carga(db.db_url, workers, args.threads, args.clientes, args.segundos, args.exportando)
+        resultados.append(resultado)
+        escala = resultado['pedidos_s'] / resultados[0]['pedidos_s'] if resultados[0]['pedidos_s'] else 0
+        print(f"   {workers} workers × {args.threads} hilos: {resultado['pedidos_s']:8.1f} pedidos/s  "
+              f"p50 {resultado['p50_ms']} ms  p95 {resultado['p95_ms']} ms  "
+              f"({escala:.2f}x)  errores: {resultado['errores']}")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump({'meta': {'commit': _commit_actual(), 'cpu': os.cpu_count(), 'registros': args.registros},
+                       'resultados': resultados}, archivo, indent=2, ensure_ascii=False)
+    return 1 if any(r['errores'] for r in resultados) else 0
+
+
+# ---------------------------------------------------------------------------
+# PRAGMA de SQLite: perfil de config.SQLITE_PRAGMAS contra los valores de fábrica
+# ---------------------------------------------------------------------------
+
+# Valores por defecto de SQLite (journal_mode se guarda en el archivo: hay que volver a DELETE)
+PRAGMAS_FABRICA = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'mmap_size': 0,
+                   'cache_size': -2000, 'temp_store': 'DEFAULT', 'foreign_keys': 'OFF'}
+
+
+def _lectura(db, numeros):
+    numero = random.randint(1, numeros)
+    db.obtener_castracion_por_id(numero)
+    db.buscar_atenciones({'especie': 'Felino'}, after_numero=numero, limite=50)
+    db.obtener_dashboard_stats()
+
+
+def medir_pragmas(db_url, pragmas, registros, lectores, segundos):
+    """Lecturas/s con `lectores` hilos mientras un hilo escribe, y escrituras/s de ese hilo"""
+    anteriores = config.SQLITE_PRAGMAS
+    config.SQLITE_PRAGMAS = pragmas
+    try:
+        with redirect_stdout(io.StringIO()):
+            db = Database(db_url=db_url)
+    finally:
+        config.SQLITE_PRAGMAS = anteriores
+    db.cache.ttl = 0
+    numeros = itertools.count(db.obtener_siguiente_numero())
+    lecturas, escrituras = [], []
+    hasta = time.monotonic() + segundos
+
+    def lector():
+        while time.monotonic() < hasta:
+            _lectura(db, registros)
+            lecturas.append(1)
+
+    def escritor():
+        while time.monotonic() < hasta:
+            numero = next(numeros)
+            exito, mensaje = db.agregar_atencion(numero, date.today().isoformat(), 'castracion', 'Bench', 'Canino',
+                                                 'Macho', '1', 'Tutor Bench', str(numero % 1000), '', 'Centro', '')
+            if not exito:
+                raise RuntimeError(mensaje)
+            escrituras.append(1)
+
+    hilos = [threading.Thread(target=lector) for _ in range(lectores)] + [threading.Thread(target=escritor)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    db.pool.cerrar()
+    return {'lecturas_s': round(len(lecturas) / segundos, 1), 'escrituras_s': round(len(escrituras) / segundos, 1)}
+
+
+def bench_sqlite(args):
+    print(f"📦 Generando {args.registros} atenciones sintéticas...")
+    db = generar_base(args.registros)
+    db.pool.cerrar()
+    print(f"👥 {args.lectores} hilos leyendo + 1 escribiendo, {args.segundos} s por perfil\n")
+
+    resultados = {}
+    for nombre, pragmas in (('fábrica', PRAGMAS_FABRICA), ('config', config.SQLITE_PRAGMAS)):
+        mixto = medir_pragmas(db.db_url, pragmas, args.registros, args.lectores, args.segundos)
+        solo = medir_pragmas(db.db_url, pragmas, args.registros, 0, args.segundos)
+        resultados[nombre] = {'lecturas_s': mixto['lecturas_s'], 'escrituras_s': mixto['escrituras_s'],
+                              'escrituras_solas_s': solo['escrituras_s']}
+        print(f"   {nombre:8} {mixto['lecturas_s']:9.1f} lecturas/s  {mixto['escrituras_s']:9.1f} escrituras/s  "
+              f"| sin lectores: {solo['escrituras_s']:9.1f} escrituras/s")
+
+    antes, ahora = resultados['fábrica'], resultados['config']
+    for clave in ('lecturas_s', 'escrituras_s', 'escrituras_solas_s'):
+        if antes[clave]:
+            print(f"🚀 {clave[:-2].replace('_', ' ')}: {ahora[clave] / antes[clave]:.2f}x")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de MARI/MATECA')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('estadisticas', help='obtener_estadisticas: diez consultas vs. resumen diario')
+    p.add_argument('--registros', type=int, default=100000)
+    p.add_argument('--dias', type=int, default=3 * 365, help='días cubiertos por los datos')
+    p.add_argument('--repeticiones', type=int, default=5)
+    p.set_defaults(funcion=bench_estadisticas)
+
+    p = sub.add_parser('suite', help='todos los métodos de Database y las rutas /api a varias escalas')
+    p.add_argument('--tamanios', type=int, nargs='+', default=[10000, 100000, 1000000])
+    p.add_argument('--repeticiones', type=int, default=5)
+    p.add_argument('--dias', type=int, default=3 * 365, help='días cubiertos por los datos')
+    p.add_argument('--semilla', type=int, default=42)
+    p.add_argument('--barrios', help="distribución de barrios, p. ej. 'Centro=5,Pueblo Nuevo=2'")
+    p.add_argument('--especies', help="distribución de especies, p. ej. 'Canino=3,Felino=2,Otro=1'")
+    p.add_argument('--tutores-por-atencion', type=float, default=0.7)
+    p.add_argument('--postgres', metavar='URL', help='PostgreSQL local de pruebas (se vacía antes de cada tamaño)')
+    p.add_argument('--salida', default='benchmark.json')
+    p.set_defaults(funcion=bench_suite)
+
+    p = sub.add_parser('arranque', help='tiempo de import app y memoria de un worker recién iniciado')
+    p.add_argument('--repeticiones', type=int, default=5)
+    p.add_argument('--maximo-ms', type=float, help='falla si la mediana de import app supera este tiempo')
+    p.add_argument('--maximo-mb', type=float, help='falla si el RSS supera esta memoria')
+    p.set_defaults(funcion=bench_arranque)
+
+    p = sub.add_parser('carga', help='pedidos por segundo de gunicorn con 1, 2, 4... workers')
+    p.add_argument('--registros', type=int, default=100000)
+    p.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    p.add_argument('--threads', type=int, default=4)
+    p.add_argument('--clientes', type=int, default=16, help='hilos que piden rutas de lectura sin pausa')
+    p.add_argument('--exportando', type=int, default=1, help='clientes adicionales pidiendo /api/exportar')
+    p.add_argument('--segundos', type=float, default=10)
+    p.add_argument('--salida', help='guardar los resultados en JSON')
+    p.set_defaults(funcion=bench_carga)
+
+    p = sub.add_parser('sqlite', help='lecturas y escrituras concurrentes: PRAGMA de fábrica vs. SQLITE_PRAGMAS')
+    p.add_argument('--registros', type=int, default=100000)
+    p.add_argument('--lectores', type=int, default=4)
+    p.add_argument('--segundos', type=float, default=10)
+    p.set_defaults(funcion=bench_sqlite)
+
+    args = parser.parse_args()
+    raise SystemExit(args.funcion(args))
+
+
+if __name__ == '__main__':
+    main()
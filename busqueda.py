@@ -0,0 +1,151 @@
+"""
+Índices de subcadena para los filtros LIKE '%...%' de la búsqueda
+
+Un LIKE con comodín inicial no puede usar un índice B-tree, así que cada
+búsqueda recorría todo el join atenciones/tutores. Con índices de trigramas:
+
+- PostgreSQL: extensión pg_trgm e índices GIN (gin_trgm_ops); el planificador
+  los usa solo con el mismo LIKE de siempre.
+- SQLite: tablas virtuales FTS5 con tokenizador trigram (contenido externo,
+  sincronizadas por triggers). La condición se reescribe como
+  `id IN (SELECT rowid FROM ..._fts WHERE columna LIKE ?)`, que FTS5 resuelve
+  con el índice y con la misma semántica que LIKE (sin distinguir mayúsculas).
+  SQLite no tiene estadísticas para decidir, así que solo se indexan las
+  columnas selectivas (nombre_animal, dni): especie y barrio coinciden con
+  buena parte de la tabla y ahí el LIKE paginado por numero corta antes.
+
+Si la base no soporta trigramas se sigue usando el LIKE sobre la tabla.
+"""
+import sqlite3
+
+# tabla -> columnas indexadas con pg_trgm (el planificador decide cuándo usarlas)
+COLUMNAS_INDEXADAS = {
+    'atenciones': ('nombre_animal', 'especie'),
+    'tutores': ('dni', 'barrio'),
+}
+
+# tabla -> columnas con FTS5 en SQLite (siempre se usan, solo las selectivas)
+COLUMNAS_FTS = {
+    'atenciones': ('nombre_animal',),
+    'tutores': ('dni',),
+}
+
+# filtro -> (alias en la consulta, tabla, columna)
+FILTROS_SUBCADENA = {
+    'especie': ('a', 'atenciones', 'especie'),
+    'dni': ('t', 'tutores', 'dni'),
+    'barrio': ('t', 'tutores', 'barrio'),
+    'nombre_animal': ('a', 'atenciones', 'nombre_animal'),
+}
+
+# FTS5 trigram solo usa el índice con al menos 3 caracteres
+LARGO_MINIMO = 3
+
+
+def crear_indices_busqueda(cursor, db_type):
+    """Crea los índices de trigramas; devuelve True si quedaron disponibles"""
+    if db_type == 'postgresql':
+        return _crear_indices_postgres(cursor)
+    return _crear_indices_sqlite(cursor)
+
+
+def indices_busqueda_disponibles(cursor, db_type):
+    """¿Existen los índices de trigramas? (lectura del catálogo, sin DDL)"""
+    if db_type == 'postgresql':
+        cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'idx_atenciones_nombre_animal_trgm'")
+    else:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'atenciones_fts'")
+    return cursor.fetchone() is not None
+
+
+def _crear_indices_postgres(cursor):
+    # SAVEPOINT: si falta permiso para la extensión no se aborta la migración
+    cursor.execute('SAVEPOINT indices_busqueda')
+    try:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for tabla, columnas in COLUMNAS_INDEXADAS.items():
+            for columna in columnas:
+                cursor.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_{tabla}_{columna}_trgm
+                    ON {tabla} USING gin ({columna} gin_trgm_ops)
+                ''')
+    except Exception as e:
+        cursor.execute('ROLLBACK TO SAVEPOINT indices_busqueda')
+        print(f"⚠️ Índices de trigramas no disponibles: {e}")
+        return False
+    cursor.execute('RELEASE SAVEPOINT indices_busqueda')
+    return True
+
+
+def _crear_indices_sqlite(cursor):
+    for tabla, columnas in COLUMNAS_FTS.items():
+        fts = f'{tabla}_fts'
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,))
+        if cursor.fetchone():
+            continue
+
+        try:
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE {fts} USING fts5(
+                    {', '.join(columnas)},
+                    content='{tabla}', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            # SQLite compilado sin FTS5 o anterior a 3.34 (sin trigram)
+            print(f"⚠️ Índices de trigramas no disponibles: {e}")
+            return False
+
+        lista = ', '.join(columnas)
+        nuevos = ', '.join(f'new.{c}' for c in columnas)
+        viejos = ', '.join(f'old.{c}' for c in columnas)
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO {fts} (rowid, {lista}) VALUES (new.id, {nuevos});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {tabla} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {lista} ON {tabla} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos});
+                INSERT INTO {fts} (rowid, {lista}) VALUES (new.id, {nuevos});
+            END
+        ''')
+        # Indexar las filas que ya existían
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    return True
+
+
+def _tiene_fts(filtro):
+    _, tabla, columna = FILTROS_SUBCADENA[filtro]
+    return columna in COLUMNAS_FTS[tabla]
+
+
+def condiciones_subcadena(db_type, indexada, filtros):
+    """Devuelve [(condición, parámetro)] para los filtros de subcadena presentes"""
+    presentes = [(filtro, filtros[filtro]) for filtro in FILTROS_SUBCADENA if filtros.get(filtro)]
+
+    # En SQLite el índice FTS5 maneja la consulta: se usa para un solo filtro
+    # (el término más largo, normalmente el más selectivo) y el resto se
+    # verifica con LIKE sobre las filas que devuelve
+    indexado = None
+    if db_type != 'postgresql' and indexada:
+        candidatos = [(len(valor), filtro) for filtro, valor in presentes
+                      if len(valor) >= LARGO_MINIMO and _tiene_fts(filtro)]
+        if candidatos:
+            indexado = max(candidatos)[1]
+
+    ph = '%s' if db_type == 'postgresql' else '?'
+    condiciones = []
+    for filtro, valor in presentes:
+        alias, tabla, columna = FILTROS_SUBCADENA[filtro]
+        if filtro == indexado:
+            sql = f'{alias}.id IN (SELECT rowid FROM {tabla}_fts WHERE {columna} LIKE {ph})'
+        else:
+            sql = f'{alias}.{columna} LIKE {ph}'
+        condiciones.append((sql, f"%{valor}%"))
+    return condiciones
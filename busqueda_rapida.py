@@ -0,0 +1,287 @@
+"""
+Búsqueda rápida (/api/buscar?q=) sobre animales, tutores, DNI, teléfono y barrio
+
+Índice invertido precalculado en la tabla busqueda_indice: una fila por
+palabra normalizada (sin tildes, en minúsculas, ver normalizacion.py) de
+cada campo de cada atención. DNI y teléfono se guardan como una sola
+"palabra" de dígitos, así "20.123.456" se encuentra escribiendo "20123".
+
+La consulta busca cada término como prefijo de palabra con el índice
+B-tree de `palabra` (LIKE 'q%' con text_pattern_ops en PostgreSQL, rango
+palabra >= q AND palabra < q + U+FFFF en SQLite). Los candidatos salen del
+término más selectivo, ya cruzados en SQL con los demás términos y
+ordenados por relevancia (peso del campo, coincidencia exacta y después
+las atenciones más nuevas) antes del tope de candidatos; el ranking final
+se ordena en Python con todos los términos.
+
+El índice se mantiene en la misma transacción que cada alta, edición o
+baja de atenciones (indexar_atencion / desindexar_atencion).
+"""
+import html
+import re
+
+from normalizacion import quitar_tildes
+
+# campo -> (expresión SQL, peso)
+CAMPOS = {
+    'dni': ('t.dni', 4),
+    'nombre_animal': ('a.nombre_animal', 3),
+    'nombre_apellido': ('t.nombre_apellido', 3),
+    'telefono': ('t.telefono', 2),
+    'barrio': ('t.barrio', 1),
+}
+CAMPOS_NUMERICOS = ('dni', 'telefono')
+
+LIMITE_RESULTADOS = 10
+MAXIMO_CANDIDATOS = 500  # atenciones candidatas, las más relevantes, que se rankean en Python
+MAXIMO_CONTEO = 20000  # tope al contar coincidencias para elegir el término más selectivo
+TAMANIO_LOTE = 5000
+FIN_PREFIJO = '\uffff'
+
+_SELECT_CAMPOS = f'''
+    SELECT a.id, {', '.join(expresion for expresion, _ in CAMPOS.values())}
+    FROM atenciones a
+    JOIN tutores t ON a.tutor_id = t.id
+'''
+
+
+def crear_tabla_indice(cursor, db_type):
+    """Crea la tabla del índice de búsqueda rápida y sus índices"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS busqueda_indice (
+            atencion_id INTEGER NOT NULL,
+            campo TEXT NOT NULL,
+            palabra TEXT NOT NULL
+        )
+    ''')
+    # text_pattern_ops: LIKE 'prefijo%' usa el índice con cualquier collation.
+    # (palabra, atencion_id, campo) resuelve la consulta de candidatos solo con el índice;
+    # (atencion_id, palabra) busca directo los otros términos de una atención
+    opclase = ' text_pattern_ops' if db_type == 'postgresql' else ''
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_busqueda_indice_palabra_atencion '
+                   f'ON busqueda_indice(palabra{opclase}, atencion_id, campo)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_busqueda_indice_atencion_palabra '
+                   f'ON busqueda_indice(atencion_id, palabra{opclase})')
+
+
+def palabras(campo, valor):
+    """Palabras indexadas de un valor"""
+    if not valor:
+        return set()
+    if campo in CAMPOS_NUMERICOS:
+        digitos = re.sub(r'\D', '', valor)
+        return {digitos} if digitos else set()
+    return set(re.findall(r'\w+', quitar_tildes(valor).lower()))
+
+
+def _filas_indice(fila):
+    atencion_id, valores = fila[0], fila[1:]
+    return [(atencion_id, campo, palabra)
+            for campo, valor in zip(CAMPOS, valores)
+            for palabra in palabras(campo, valor)]
+
+
+def indexar_atencion(cursor, placeholder, numero):
+    """(Re)indexa una atención después de insertarla o editarla"""
+    indexar_atenciones(cursor, placeholder, [numero])
+
+
+def indexar_atenciones(cursor, placeholder, numeros):
+    """(Re)indexa varias atenciones (cargas masivas)"""
+    if not numeros:
+        return
+    marcas = ', '.join([placeholder] * len(numeros))
+    cursor.execute(f'''
+        DELETE FROM busqueda_indice
+        WHERE atencion_id IN (SELECT id FROM atenciones WHERE numero IN ({marcas}))
+    ''', numeros)
+    cursor.execute(f'{_SELECT_CAMPOS} WHERE a.numero IN ({marcas})', numeros)
+    nuevas = [f for fila in cursor.fetchall() for f in _filas_indice(fila)]
+    cursor.executemany(
+        f'INSERT INTO busqueda_indice (atencion_id, campo, palabra) '
+        f'VALUES ({placeholder}, {placeholder}, {placeholder})',
+        nuevas
+    )
+
+
+def desindexar_atencion(cursor, placeholder, numero):
+    """Quita una atención del índice (antes de borrarla)"""
+    cursor.execute(f'''
+        DELETE FROM busqueda_indice
+        WHERE atencion_id IN (SELECT id FROM atenciones WHERE numero = {placeholder})
+    ''', (numero,))
+
+
+def reconstruir_indice(conn, placeholder):
+    """Recalcula el índice completo desde atenciones y tutores"""
+    lectura = conn.cursor()
+    escritura = conn.cursor()
+    escritura.execute('DELETE FROM busqueda_indice')
+    lectura.execute(_SELECT_CAMPOS)
+    total = 0
+    while True:
+        filas = lectura.fetchmany(TAMANIO_LOTE)
+        if not filas:
+            break
+        nuevas = [f for fila in filas for f in _filas_indice(fila)]
+        escritura.executemany(
+            f'INSERT INTO busqueda_indice (atencion_id, campo, palabra) '
+            f'VALUES ({placeholder}, {placeholder}, {placeholder})',
+            nuevas
+        )
+        total += len(nuevas)
+    return total
+
+
+def terminos(q):
+    """Términos de búsqueda normalizados ("3446-15 55" -> ["34461555"])"""
+    q = q.strip()
+    if re.fullmatch(r'[\d\s.\-/]+', q):
+        digitos = re.sub(r'\D', '', q)
+        return [digitos] if digitos else []
+    return sorted(set(re.findall(r'\w+', quitar_tildes(q).lower())), key=len, reverse=True)
+
+
+def _condicion_prefijo(db_type, placeholder, termino, columna='palabra'):
+    if db_type == 'postgresql':
+        patron = termino.replace('\\', '\\\\').replace('_', '\\_').replace('%', '\\%') + '%'
+        return f"{columna} LIKE {placeholder}", (patron,)
+    return f'{columna} >= {placeholder} AND {columna} < {placeholder}', (termino, termino + FIN_PREFIJO)
+
+
+def _contar_acotado(cursor, db_type, placeholder, termino):
+    """Cantidad de palabras con ese prefijo, contando hasta MAXIMO_CONTEO"""
+    prefijo, params = _condicion_prefijo(db_type, placeholder, termino)
+    cursor.execute(f'''
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM busqueda_indice WHERE {prefijo} LIMIT {MAXIMO_CONTEO}
+        ) muestra
+    ''', params)
+    return cursor.fetchone()[0]
+
+
+def buscar(cursor, db_type, placeholder, q, limite=LIMITE_RESULTADOS):
+    """Devuelve las `limite` atenciones mejor rankeadas para la consulta"""
+    lista = terminos(q)
+    if not lista:
+        return []
+
+    # El término más selectivo define los candidatos; los demás deben coincidir también
+    principal = lista[0] if len(lista) == 1 else min(lista, key=lambda t: _contar_acotado(cursor, db_type, placeholder, t))
+    prefijo, params = _condicion_prefijo(db_type, placeholder, principal, 'b.palabra')
+    condiciones = [prefijo]
+    for termino in lista:
+        if termino != principal:
+            otro, otros_params = _condicion_prefijo(db_type, placeholder, termino, 'o.palabra')
+            condiciones.append(f'EXISTS (SELECT 1 FROM busqueda_indice o WHERE o.atencion_id = b.atencion_id AND {otro})')
+            params += otros_params
+    # Mismo criterio que _puntuar para el término principal; a igual peso, las más nuevas
+    peso = 'CASE b.campo ' + ' '.join(f"WHEN '{campo}' THEN {p}" for campo, (_, p) in CAMPOS.items()) + ' END'
+    cursor.execute(f'''
+        SELECT b.atencion_id FROM busqueda_indice b
+        WHERE {' AND '.join(condiciones)}
+        GROUP BY b.atencion_id
+        ORDER BY MAX({peso} * CASE WHEN b.palabra = {placeholder} THEN 2 ELSE 1 END) DESC, b.atencion_id DESC
+        LIMIT {MAXIMO_CANDIDATOS}
+    ''', (*params, principal))
+    candidatos = [fila[0] for fila in cursor.fetchall()]
+    if not candidatos:
+        return []
+
+    marcas = ', '.join([placeholder] * len(candidatos))
+    cursor.execute(f'''
+        SELECT atencion_id, campo, palabra FROM busqueda_indice
+        WHERE atencion_id IN ({marcas})
+    ''', candidatos)
+    por_atencion = {}
+    for atencion_id, campo, palabra in cursor.fetchall():
+        por_atencion.setdefault(atencion_id, []).append((campo, palabra))
+
+    ranking = []
+    for atencion_id, indexadas in por_atencion.items():
+        puntaje, campos = _puntuar(lista, indexadas)
+        if puntaje:
+            ranking.append((puntaje, atencion_id, campos))
+    ranking.sort(key=lambda r: (-r[0], -r[1]))
+    ranking = ranking[:limite]
+    if not ranking:
+        return []
+
+    marcas = ', '.join([placeholder] * len(ranking))
+    cursor.execute(f'''
+        SELECT a.id, a.numero, a.fecha, a.tipo_atencion,
+               {', '.join(expresion for expresion, _ in CAMPOS.values())}
+        FROM atenciones a
+        JOIN tutores t ON a.tutor_id = t.id
+        WHERE a.id IN ({marcas})
+    ''', [atencion_id for _, atencion_id, _ in ranking])
+    filas = {fila[0]: fila for fila in cursor.fetchall()}
+
+    resultados = []
+    for puntaje, atencion_id, campos in ranking:
+        fila = filas[atencion_id]
+        valores = dict(zip(CAMPOS, fila[4:]))
+        resultados.append({
+            'numero': fila[1],
+            'fecha': str(fila[2]),
+            'tipo_atencion': fila[3],
+            **valores,
+            'puntaje': puntaje,
+            'coincidencias': {campo: resaltar(campo, valores[campo], lista) for campo in campos},
+        })
+    return resultados
+
+
+def _puntuar(lista, indexadas):
+    """Puntaje de una atención: cada término debe ser prefijo de alguna palabra"""
+    puntaje = 0
+    campos = []
+    for termino in lista:
+        mejor = 0
+        mejor_campo = None
+        for campo, palabra in indexadas:
+            if palabra.startswith(termino):
+                peso = CAMPOS[campo][1] * (2 if palabra == termino else 1)
+                if peso > mejor:
+                    mejor, mejor_campo = peso, campo
+        if not mejor:
+            return 0, []
+        puntaje += mejor
+        if mejor_campo not in campos:
+            campos.append(mejor_campo)
+    return puntaje, campos
+
+
+def resaltar(campo, valor, lista):
+    """Valor (escapado para HTML) con los prefijos coincidentes entre <mark>"""
+    valor = valor or ''
+    # Índice de cada carácter normalizado -> carácter original
+    normalizado = []
+    origen = []
+    for i, c in enumerate(valor):
+        for n in quitar_tildes(c).lower():
+            normalizado.append(n)
+            origen.append(i)
+    normalizado = ''.join(normalizado)
+
+    tramos = []
+    for termino in lista:
+        if campo in CAMPOS_NUMERICOS:
+            # El término son dígitos sin separadores: "20123" marca "20.123"
+            patron = r'\D*'.join(re.escape(d) for d in termino)
+            coincidencias = re.finditer(r'(?<!\d)' + patron, normalizado)
+        else:
+            coincidencias = re.finditer(r'(?<!\w)' + re.escape(termino), normalizado)
+        for m in coincidencias:
+            tramos.append((origen[m.start()], origen[m.end() - 1] + 1))
+
+    partes = []
+    posicion = 0
+    for inicio, fin in sorted(tramos):
+        if inicio < posicion:
+            continue
+        partes.append(html.escape(valor[posicion:inicio]))
+        partes.append(f'<mark>{html.escape(valor[inicio:fin])}</mark>')
+        posicion = fin
+    partes.append(html.escape(valor[posicion:]))
+    return ''.join(partes)
@@ -0,0 +1,99 @@
+"""
+Caché en memoria (por proceso) para consultas de lectura frecuentes
+
+LRU con TTL: las entradas vencen a los `ttl` segundos y, superado `maximo`,
+se descarta la menos usada. Toda escritura invalida la caché completa; con
+varios workers de gunicorn cada proceso tiene la suya, y el TTL acota el
+tiempo que un worker puede servir datos escritos por otro.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class CacheTTL:
+    """Caché LRU thread-safe con vencimiento por tiempo"""
+
+    def __init__(self, maximo=128, ttl=30):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (vence, valor)
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+
+    def obtener(self, clave):
+        """Devuelve (encontrado, valor)"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                vence, valor = entrada
+                if vence > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, valor
+                del self._datos[clave]
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave, valor, generacion=None):
+        """Guarda un valor salvo que haya habido una invalidación mientras se calculaba"""
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def generacion(self):
+        with self._lock:
+            return self._generacion
+
+    def invalidar(self):
+        with self._lock:
+            self._datos.clear()
+            self._generacion += 1
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'maximo': self.maximo,
+                'ttl': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 3) if consultas else 0,
+                'invalidaciones': self.invalidaciones,
+            }
+
+
+def cacheado(metodo):
+    """Cachea el resultado de un método de Database según nombre y argumentos"""
+    @wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        clave = (metodo.__name__, args, tuple(sorted(kwargs.items())))
+        encontrado, valor = self.cache.obtener(clave)
+        if encontrado:
+            return valor
+        generacion = self.cache.generacion()
+        valor = metodo(self, *args, **kwargs)
+        self.cache.guardar(clave, valor, generacion)
+        return valor
+    return envoltura
+
+
+def invalida_cache(metodo):
+    """Invalida la caché después de un método de escritura de Database"""
+    @wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        try:
+            return metodo(self, *args, **kwargs)
+        finally:
+            self.cache.invalidar()
+    return envoltura
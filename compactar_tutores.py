@@ -0,0 +1,26 @@
+"""
+Script para compactar la tabla tutores: asigna a cada tutor su identidad por
+DNI, une las versiones con datos idénticos (las que dejaban las altas y
+ediciones anteriores, y separar_tutores.py) y reapunta las atenciones.
+Se puede ejecutar con la aplicación en uso; trabaja por lotes.
+"""
+import os
+from database import Database
+
+def compactar_tutores():
+    database_url = os.environ.get('DATABASE_URL')
+    db = Database(db_url=database_url) if database_url else Database(db_url='sqlite:///mari.db')
+    
+    def progreso(unidas, total):
+        print(f"  ✓ {unidas}/{total} versiones repetidas unidas")
+    
+    try:
+        print("🔧 Compactando tutores...")
+        resultado = db.compactar_tutores(progreso=progreso)
+        print(f"\n✅ Tutores: {resultado['tutores_antes']} → {resultado['tutores_despues']}")
+        print(f"✅ Identidades (DNI distintos): {resultado['identidades']}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+if __name__ == '__main__':
+    compactar_tutores()
@@ -0,0 +1,200 @@
+"""
+Pools de conexiones para MARI/MATECA
+
+- PostgreSQL: pool acotado y thread-safe, con verificación de salud y
+  descarte de conexiones inactivas.
+- SQLite: una conexión persistente por hilo, con los PRAGMA de
+  config.SQLITE_PRAGMAS (WAL: los lectores no esperan al escritor) y con
+  busy_timeout (un escritor espera al otro en lugar de fallar con
+  "database is locked").
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class PoolAgotadoError(Exception):
+    """No hay conexiones libres dentro del tiempo de espera"""
+
+
+class PoolPostgres:
+    """Pool acotado de conexiones psycopg2"""
+
+    def __init__(self, connect, minimo=1, maximo=10, max_inactividad=300,
+                 timeout=30, verificar_tras=30):
+        self._connect = connect
+        self.minimo = minimo
+        self.maximo = maximo
+        self.max_inactividad = max_inactividad
+        self.timeout = timeout
+        self.verificar_tras = verificar_tras
+        self._cond = threading.Condition()
+        self._libres = []  # [(conexion, ultimo_uso)] - LIFO
+        self._abiertas = 0
+        self._pid = os.getpid()
+
+    def _revisar_fork(self):
+        """Tras un fork (gunicorn) las conexiones del padre no se reutilizan"""
+        if self._pid != os.getpid():
+            self._libres = []
+            self._abiertas = 0
+            self._pid = os.getpid()
+
+    def _cerrar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _desalojar_inactivas(self, ahora):
+        """Cierra conexiones que superan max_inactividad, respetando el mínimo"""
+        conservar = []
+        for conn, ultimo_uso in self._libres:
+            if ahora - ultimo_uso > self.max_inactividad and self._abiertas > self.minimo:
+                self._cerrar(conn)
+                self._abiertas -= 1
+            else:
+                conservar.append((conn, ultimo_uso))
+        self._libres = conservar
+
+    def _esta_sana(self, conn, ultimo_uso, ahora):
+        if conn.closed:
+            return False
+        if ahora - ultimo_uso < self.verificar_tras:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def obtener(self):
+        """Obtiene una conexión libre, abre una nueva o espera hasta timeout"""
+        limite = time.monotonic() + self.timeout
+        with self._cond:
+            self._revisar_fork()
+            while True:
+                ahora = time.monotonic()
+                self._desalojar_inactivas(ahora)
+                while self._libres:
+                    conn, ultimo_uso = self._libres.pop()
+                    if self._esta_sana(conn, ultimo_uso, ahora):
+                        return conn
+                    self._cerrar(conn)
+                    self._abiertas -= 1
+                if self._abiertas < self.maximo:
+                    self._abiertas += 1
+                    break
+                restante = limite - ahora
+                if restante <= 0:
+                    raise PoolAgotadoError(
+                        f"No hay conexiones disponibles (máximo {self.maximo})")
+                self._cond.wait(restante)
+
+        # Abrir fuera del lock para no bloquear a otros hilos durante el handshake
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._abiertas -= 1
+                self._cond.notify()
+            raise
+
+    def devolver(self, conn, descartar=False):
+        """Devuelve la conexión al pool (o la cierra si está rota)"""
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            if not descartar and not conn.closed:
+                try:
+                    # No dejar transacciones abiertas ("idle in transaction")
+                    conn.rollback()
+                except Exception:
+                    descartar = True
+            if descartar or conn.closed:
+                self._cerrar(conn)
+                self._abiertas -= 1
+            else:
+                self._libres.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres"""
+        with self._cond:
+            for conn, _ in self._libres:
+                self._cerrar(conn)
+            self._abiertas -= len(self._libres)
+            self._libres = []
+
+
+def conectar_sqlite(db_name, timeout=30, pragmas=None):
+    """Abre una conexión SQLite y le aplica los PRAGMA (journal_mode primero)"""
+    # timeout = busy_timeout de SQLite: cuánto espera un escritor a que el otro termine
+    conn = sqlite3.connect(db_name, timeout=timeout, check_same_thread=False)
+    for nombre, valor in (pragmas or {}).items():
+        conn.execute(f'PRAGMA {nombre} = {valor}')
+    return conn
+
+
+class PoolSQLite:
+    """Una conexión SQLite persistente por hilo"""
+
+    def __init__(self, db_name, timeout=30, pragmas=None):
+        self.db_name = db_name
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._todas = []
+        self._pid = os.getpid()
+
+    def _crear(self):
+        conn = conectar_sqlite(self.db_name, self.timeout, self.pragmas)
+        with self._lock:
+            self._todas.append(conn)
+        return conn
+
+    def obtener(self):
+        """Obtiene la conexión del hilo actual (reentrante)"""
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._todas = []
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._crear()
+            self._local.profundidad = 0
+        self._local.profundidad += 1
+        return conn
+
+    def devolver(self, conn, descartar=False):
+        """Libera un nivel de uso; al llegar a cero deja la conexión limpia"""
+        self._local.profundidad -= 1
+        if self._local.profundidad > 0:
+            return
+        if descartar:
+            with self._lock:
+                if conn in self._todas:
+                    self._todas.remove(conn)
+            self._local.conn = None
+            try:
+                conn.close()
+            except Exception:
+                pass
+        elif conn.in_transaction:
+            conn.rollback()
+
+    def cerrar(self):
+        """Cierra todas las conexiones abiertas por cualquier hilo"""
+        with self._lock:
+            for conn in self._todas:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._todas = []
+        self._local = threading.local()
@@ -19,6 +19,36 @@ class Config:
     DATABASE_URL = os.environ.get('DATABASE_URL')  # PostgreSQL en Render
     DATABASE_NAME = 'mari.db'  # SQLite local (fallback)
     
+    # Pool de conexiones
+    DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+    DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+    DB_POOL_MAX_INACTIVIDAD = int(os.environ.get('DB_POOL_MAX_INACTIVIDAD', 300))  # segundos
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # segundos
+    # Sentencias preparadas en el servidor (PostgreSQL); desactivar detrás de PgBouncer en modo transacción
+    DB_SENTENCIAS_PREPARADAS = os.environ.get('DB_SENTENCIAS_PREPARADAS', '1').lower() in ('1', 'true', 'si')
+    
+    # SQLite (desarrollo e instalaciones locales): PRAGMA de cada conexión nueva, en este orden
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),  # lectores sin esperar al escritor
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),  # con WAL no arriesga la base, solo el último commit ante un corte de luz
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),  # bytes leídos por mmap (caché del sistema, compartida)
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -16000)),  # negativo = KiB por conexión (16 MB)
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),  # ORDER BY / GROUP BY temporales en memoria
+        'foreign_keys': os.environ.get('SQLITE_FOREIGN_KEYS', 'ON'),
+    }
+    
+    # Caché de dashboard y estadísticas
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 30))  # segundos
+    CACHE_MAX_ENTRADAS = int(os.environ.get('CACHE_MAX_ENTRADAS', 128))
+    
+    # Auditoría (se escribe en la transacción del cambio). Retención: los meses
+    # más viejos se comprimen a disco (archivar_auditoria.py)
+    AUDITORIA_MESES_RETENCION = int(os.environ.get('AUDITORIA_MESES_RETENCION', 12))
+    AUDITORIA_DIRECTORIO_ARCHIVO = os.environ.get('AUDITORIA_DIRECTORIO_ARCHIVO', 'archivo_auditoria')
+    
+    # Reserva del número de atención al empezar a completar el formulario
+    NUMERO_RESERVA_MINUTOS = int(os.environ.get('NUMERO_RESERVA_MINUTOS', 30))
+    
     # Credenciales (CAMBIAR EN PRODUCCIÓN)
     USUARIO = os.environ.get('APP_USUARIO') or 'mariateresa'
     PASSWORD = os.environ.get('APP_PASSWORD') or 'mateca'
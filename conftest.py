@@ -0,0 +1,23 @@
+# Fixtures compartidas de las pruebas (python -m pytest)
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Base SQLite nueva, con todas las migraciones aplicadas"""
+    return Database(db_url=f'sqlite:///{tmp_path / "mari.db"}')
+
+
+@pytest.fixture
+def cliente(db, monkeypatch, tmp_path):
+    """Cliente de Flask con la sesión iniciada, que trabaja sobre la base de `db`"""
+    # app.py crea su propia base al importarse: que no sea mari.db
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "app.db"}')
+    import app
+    monkeypatch.setattr(app, 'db', db)
+    cliente = app.app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['logged_in'] = True
+    return cliente
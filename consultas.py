@@ -0,0 +1,280 @@
+"""
+Registro de consultas compiladas por dialecto
+
+Las sentencias fijas de la aplicación se escriben una sola vez, con
+parámetros %s y fragmentos de dialecto entre llaves ({hoy}, {devolver_id}...),
+y se compilan al iniciar para el motor en uso:
+
+- SQLite: los %s pasan a '?'. sqlite3 guarda cada sentencia preparada en la
+  caché de la conexión (cached_statements) con el texto como clave; como el
+  texto compilado es siempre el mismo objeto, el plan se reutiliza.
+- PostgreSQL: los %s pasan a $1, $2... y cada conexión hace PREPARE la
+  primera vez que usa una sentencia; después solo se envía
+  EXECUTE nombre(...), y el servidor reutiliza el plan de la sesión.
+  Con un pooler en modo transacción (PgBouncer) hay que desactivarlo con
+  DB_SENTENCIAS_PREPARADAS=0: las sentencias quedan en la sesión del servidor.
+
+Las consultas armadas en el momento (filtros opcionales, listas IN) siguen
+construyéndose con get_placeholder().
+"""
+import re
+import threading
+import weakref
+
+import importacion
+
+# Fragmentos que cambian según el motor. Las fechas son constantes de la
+# consulta (nunca funciones sobre la columna), para que los filtros se
+# resuelvan como rangos semiabiertos sobre el índice: columna >= a AND columna < b.
+# dia_siguiente y dia_semana solo se aplican a las fechas generadas por la CTE
+# dias de turnos_disponibles (0 = lunes, como date.weekday()).
+# Las listas JSON del dashboard: en PostgreSQL el orden va dentro de json_agg; SQLite
+# (sin ORDER BY en agregados antes de 3.44) agrega las filas en el orden en que las
+# entrega la CTE, que ya las recorre ordenadas por índice (un ORDER BY más afuera
+# solo suma un USE TEMP B-TREE).
+DIALECTOS = {
+    'postgresql': {
+        'hoy': 'CURRENT_DATE',
+        'manana': 'CURRENT_DATE + 1',
+        'hace_una_semana': 'CURRENT_DATE - 7',
+        'en_ocho_dias': 'CURRENT_DATE + 8',
+        'inicio_mes': "DATE_TRUNC('month', CURRENT_DATE)::date",
+        'inicio_mes_siguiente': "(DATE_TRUNC('month', CURRENT_DATE) + INTERVAL '1 month')::date",
+        'menor': 'LEAST',
+        'json_lista': 'json_agg',
+        'orden_ultimas': ' ORDER BY fecha DESC, numero DESC',
+        'orden_turnos_semana': ' ORDER BY fecha, hora, id',
+        'json_objeto': 'json_build_object',
+        'devolver_id': 'RETURNING id',
+        'fecha_parametro': 'CAST(%s AS DATE)',
+        'dia_siguiente': 'fecha + 1',
+        'dia_semana': 'CAST(EXTRACT(ISODOW FROM d.fecha) AS INTEGER) - 1',
+    },
+    'sqlite': {
+        'hoy': "DATE('now')",
+        'manana': "DATE('now', '+1 day')",
+        'hace_una_semana': "DATE('now', 'weekday 0', '-7 days')",
+        'en_ocho_dias': "DATE('now', '+8 days')",
+        'inicio_mes': "DATE('now', 'start of month')",
+        'inicio_mes_siguiente': "DATE('now', 'start of month', '+1 month')",
+        'menor': 'MIN',
+        'json_lista': 'json_group_array',
+        'orden_ultimas': '',
+        'orden_turnos_semana': '',
+        'json_objeto': 'json_object',
+        'devolver_id': '',
+        'fecha_parametro': 'DATE(%s)',
+        'dia_siguiente': "DATE(fecha, '+1 day')",
+        'dia_semana': "(CAST(strftime('%w', d.fecha) AS INTEGER) + 6) % 7",
+    },
+}
+
+_COLUMNAS_ATENCION = ', '.join([f'a.{campo}' for campo in importacion.CAMPOS_ATENCION] +
+                               [f't.{campo}' for campo in importacion.CAMPOS_TUTOR])
+
+CONSULTAS = {
+    # Atenciones
+    'atencion_insertar': '''
+        INSERT INTO atenciones (numero, fecha, tipo_atencion, nombre_animal, especie, sexo, edad,
+                               tutor_id, motivo, diagnostico, tratamiento, derivacion, observaciones)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ''',
+    'atencion_actualizar': '''
+        UPDATE atenciones
+        SET fecha = %s, nombre_animal = %s, especie = %s, sexo = %s, edad = %s,
+            motivo = %s, diagnostico = %s, tratamiento = %s, derivacion = %s,
+            observaciones = %s, tutor_id = %s
+        WHERE numero = %s
+    ''',
+    'atencion_datos': f'''
+        SELECT a.id, {_COLUMNAS_ATENCION}
+        FROM atenciones a
+        JOIN tutores t ON a.tutor_id = t.id
+        WHERE a.numero = %s
+    ''',
+    'atencion_eliminar': 'DELETE FROM atenciones WHERE numero = %s',
+    'castracion_obtener': '''
+        SELECT a.numero, a.fecha, a.nombre_animal, a.especie, a.sexo, a.edad,
+               t.nombre_apellido, t.dni, t.direccion, t.barrio, t.telefono
+        FROM atenciones a
+        JOIN tutores t ON a.tutor_id = t.id
+        WHERE a.numero = %s AND a.tipo_atencion = 'castracion'
+    ''',
+
+    # Dashboard: contadores, últimas atenciones y turnos de la semana en una sola consulta
+    'dashboard': '''
+        WITH contadores AS (
+            SELECT COALESCE(SUM(CASE WHEN fecha = {hoy} THEN cantidad END), 0) AS hoy,
+                   COALESCE(SUM(CASE WHEN fecha >= {hace_una_semana} THEN cantidad END), 0) AS semana,
+                   COALESCE(SUM(CASE WHEN fecha >= {inicio_mes} AND fecha < {inicio_mes_siguiente}
+                                     THEN cantidad END), 0) AS mes,
+                   COALESCE(SUM(CASE WHEN fecha = {hoy} AND tipo_atencion = 'atencion_primaria'
+                                     THEN cantidad END), 0) AS primaria_hoy
+            FROM estadisticas_diarias
+            WHERE fecha >= {menor}({hace_una_semana}, {inicio_mes})
+        ),
+        ultimas AS (
+            SELECT a.numero, a.fecha, a.tipo_atencion, a.nombre_animal, a.especie,
+                   t.nombre_apellido AS tutor
+            FROM atenciones a
+            JOIN tutores t ON a.tutor_id = t.id
+            ORDER BY a.fecha DESC, a.numero DESC
+            LIMIT 5
+        ),
+        turnos_semana AS (
+            SELECT fecha, hora, nombre_animal, tutor_nombre, tipo, estado, id
+            FROM turnos
+            WHERE fecha >= {hoy} AND fecha < {en_ocho_dias}
+            ORDER BY fecha, hora, id
+        )
+        SELECT hoy, semana, mes, primaria_hoy, {hoy},
+               (SELECT {json_lista}({json_objeto}('numero', numero, 'fecha', fecha,
+                                                  'tipo_atencion', tipo_atencion,
+                                                  'nombre_animal', nombre_animal,
+                                                  'especie', especie, 'tutor', tutor){orden_ultimas})
+                FROM ultimas),
+               (SELECT {json_lista}({json_objeto}('fecha', fecha, 'hora', hora,
+                                                  'nombre_animal', nombre_animal,
+                                                  'tutor_nombre', tutor_nombre, 'tipo', tipo,
+                                                  'estado', estado, 'id', id){orden_turnos_semana})
+                FROM turnos_semana)
+        FROM contadores
+    ''',
+
+    # Turnos
+    'turno_insertar': '''
+        INSERT INTO turnos (fecha, hora, nombre_animal, tutor_nombre, telefono, tipo, observaciones)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ''',
+    'turno_obtener': 'SELECT fecha, hora, tipo, estado FROM turnos WHERE id = %s',
+    'turno_actualizar_estado': 'UPDATE turnos SET estado = %s WHERE id = %s',
+    'turno_eliminar': 'DELETE FROM turnos WHERE id = %s',
+    # Turnos por día y estado entre dos fechas (vista de calendario)
+    'turnos_por_dia': '''
+        SELECT fecha, COUNT(*) AS total,
+               SUM(CASE WHEN estado = 'pendiente' THEN 1 ELSE 0 END) AS pendientes,
+               SUM(CASE WHEN estado = 'completado' THEN 1 ELSE 0 END) AS completados,
+               SUM(CASE WHEN estado = 'cancelado' THEN 1 ELSE 0 END) AS cancelados
+        FROM turnos
+        WHERE fecha >= %s AND fecha <= %s AND tipo = COALESCE(%s, tipo)
+        GROUP BY fecha
+        ORDER BY fecha
+    ''',
+    # Horarios con lugar entre dos fechas (agenda.py): días del rango × cupos - turnos no cancelados
+    'turnos_disponibles': '''
+        WITH RECURSIVE dias(fecha) AS (
+            SELECT {fecha_parametro}
+            UNION ALL
+            SELECT {dia_siguiente} FROM dias WHERE fecha < {fecha_parametro}
+        ),
+        ocupados AS (
+            SELECT fecha, hora, tipo, COUNT(*) AS cantidad
+            FROM turnos
+            WHERE fecha >= %s AND fecha <= %s AND estado <> 'cancelado'
+            GROUP BY fecha, hora, tipo
+        )
+        SELECT d.fecha, c.hora, c.tipo, c.capacidad, c.capacidad - COALESCE(o.cantidad, 0) AS libres
+        FROM dias d
+        JOIN turnos_cupos c ON c.dia_semana = {dia_semana}
+        LEFT JOIN ocupados o ON o.fecha = d.fecha AND o.hora = c.hora AND o.tipo = c.tipo
+        WHERE c.tipo = COALESCE(%s, c.tipo) AND c.capacidad > COALESCE(o.cantidad, 0)
+        ORDER BY d.fecha, c.hora, c.tipo
+    ''',
+    # Cupos de la agenda (agenda.py)
+    'cupos_listar': 'SELECT tipo, dia_semana, hora, capacidad FROM turnos_cupos ORDER BY tipo, dia_semana, hora',
+    'cupos_guardar': '''
+        INSERT INTO turnos_cupos (tipo, dia_semana, hora, capacidad)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (tipo, dia_semana, hora) DO UPDATE SET capacidad = excluded.capacidad
+    ''',
+    'cupos_eliminar': 'DELETE FROM turnos_cupos WHERE tipo = %s AND dia_semana = %s AND hora = %s',
+
+    # Barrios del mapa
+    'barrios_mapa_listar': 'SELECT id, nombre, latitud, longitud, color FROM barrios_mapa ORDER BY nombre',
+    'barrios_mapa_insertar': '''
+        INSERT INTO barrios_mapa (nombre, latitud, longitud, color)
+        VALUES (%s, %s, %s, %s)
+        {devolver_id}
+    ''',
+    'barrios_mapa_actualizar': '''
+        UPDATE barrios_mapa
+        SET nombre = %s, latitud = %s, longitud = %s, color = %s
+        WHERE id = %s
+    ''',
+    'barrios_mapa_eliminar': 'DELETE FROM barrios_mapa WHERE id = %s',
+}
+
+
+class Sentencia:
+    """Una consulta del registro ya compilada para un dialecto"""
+
+    __slots__ = ('nombre', 'sql', 'directo', 'ejecutar_sql')
+
+    def __init__(self, nombre, sql, directo, ejecutar_sql=None):
+        self.nombre = nombre
+        self.sql = sql                    # texto para el motor (con ? o $n)
+        self.directo = directo            # texto para cursor.execute sin preparar
+        self.ejecutar_sql = ejecutar_sql  # PostgreSQL: EXECUTE nombre(%s, ...)
+
+
+def compilar(nombre, plantilla, db_type):
+    """Compila una plantilla del registro para `db_type`"""
+    texto = ' '.join(plantilla.format(**DIALECTOS[db_type]).split())
+    if db_type != 'postgresql':
+        sql = texto.replace('%s', '?')
+        return Sentencia(nombre, sql, sql)
+
+    parametros = texto.count('%s')
+    numeros = iter(range(1, parametros + 1))
+    sql = re.sub('%s', lambda _: f'${next(numeros)}', texto)
+    argumentos = f"({', '.join(['%s'] * parametros)})" if parametros else ''
+    return Sentencia(nombre, sql, texto, f'EXECUTE {nombre}{argumentos}')
+
+
+class Registro:
+    """Consultas compiladas para un motor; en PostgreSQL, preparadas por conexión"""
+
+    def __init__(self, db_type, preparar=True, consultas=CONSULTAS):
+        self.db_type = db_type
+        self.preparar = preparar and db_type == 'postgresql'
+        self.sentencias = {nombre: compilar(nombre, plantilla, db_type)
+                           for nombre, plantilla in consultas.items()}
+        self._preparadas = weakref.WeakKeyDictionary()  # conexión -> {nombres}
+        self._lock = threading.Lock()
+
+    def sql(self, nombre):
+        """Texto compilado de la sentencia (por ejemplo, para EXPLAIN)"""
+        return self.sentencias[nombre].directo
+
+    def ejecutar(self, cursor, nombre, params=()):
+        """Ejecuta la sentencia `nombre` con `params` y devuelve el cursor"""
+        sentencia = self.sentencias[nombre]
+        if not self.preparar:
+            cursor.execute(sentencia.directo, params)
+            return cursor
+
+        conn = cursor.connection
+        with self._lock:
+            preparadas = self._preparadas.setdefault(conn, set())
+        if nombre not in preparadas:
+            # PREPARE no es transaccional: la sentencia sigue en la sesión aunque haya rollback
+            cursor.execute(f'PREPARE {nombre} AS {sentencia.sql}')
+            preparadas.add(nombre)
+        cursor.execute(sentencia.ejecutar_sql, params)
+        return cursor
+
+    def explicar(self, cursor, nombre, params=()):
+        """Plan de ejecución de la sentencia, una línea por paso"""
+        sentencia = self.sentencias[nombre]
+        if self.db_type == 'postgresql':
+            cursor.execute(f'EXPLAIN {sentencia.directo}', params)
+            return [fila[0] for fila in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN QUERY PLAN {sentencia.sql}', params)
+        return [fila[-1] for fila in cursor.fetchall()]
+
+    def insertar(self, cursor, nombre, params=()):
+        """Ejecuta un INSERT con {devolver_id} y devuelve el id de la fila nueva"""
+        self.ejecutar(cursor, nombre, params)
+        if self.db_type == 'postgresql':
+            return cursor.fetchone()[0]
+        return cursor.lastrowid
@@ -1,9 +1,23 @@
+import json
 import os
-from datetime import datetime
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+from contextlib import contextmanager
+from datetime import date, datetime
 import sqlite3
+from cache import CacheTTL, cacheado, invalida_cache
+from config import config
+from conexiones import PoolPostgres, PoolSQLite, conectar_sqlite
+import exportacion
+import importacion
+from busqueda import condiciones_subcadena, indices_busqueda_disponibles
+import busqueda_rapida
+import tutores
+import numeracion
+import agenda
+import auditoria
+import migraciones
+from consultas import Registro
+from barrios import canonizar_barrio, completar_barrios, estadisticas_barrios, lista_barrios
+from estadisticas import ajustar_rollup, calcular_estadisticas, reconstruir_rollup
 
 # Intentar importar psycopg2 (solo disponible en producción)
 psycopg2 = None
@@ -17,7 +31,9 @@ except Exception as e:
     print(f"❌ Error al importar psycopg2: {e}")
 
 class Database:
-    def __init__(self, db_url=None):
+    """Acceso a datos; una instancia por proceso, usable desde varios hilos a la vez"""
+
+    def __init__(self, db_url=None, progreso_migracion=None):
         self.db_url = db_url or os.environ.get('DATABASE_URL')
         
         print(f"🔍 DATABASE_URL: {self.db_url[:50] if self.db_url else 'None'}...")
@@ -44,14 +60,49 @@ class Database:
             self.db_type = 'sqlite'
             self.db_name = 'mari.db'
             print(f"✅ Usando SQLite por defecto: {self.db_name}")
-            
-        self.init_db()
+        
+        # Pool de conexiones reutilizables
+        if self.db_type == 'postgresql':
+            self.pool = PoolPostgres(
+                self.get_connection,
+                minimo=config.DB_POOL_MIN,
+                maximo=config.DB_POOL_MAX,
+                max_inactividad=config.DB_POOL_MAX_INACTIVIDAD,
+                timeout=config.DB_POOL_TIMEOUT
+            )
+        else:
+            self.pool = PoolSQLite(self.db_name, timeout=config.DB_POOL_TIMEOUT, pragmas=config.SQLITE_PRAGMAS)
+        
+        # Sentencias fijas compiladas para este motor (preparadas en el servidor si es PostgreSQL)
+        self.consultas = Registro(self.db_type, preparar=config.DB_SENTENCIAS_PREPARADAS)
+        
+        # Caché de dashboard y estadísticas (se invalida en cada escritura)
+        self.cache = CacheTTL(maximo=config.CACHE_MAX_ENTRADAS, ttl=config.CACHE_TTL)
+        
+        self.init_db(progreso_migracion)
     
     def get_connection(self):
+        """Abre una conexión nueva fuera del pool (scripts y migraciones)"""
         if self.db_type == 'postgresql':
             return psycopg2.connect(self.db_url)
         else:
-            return sqlite3.connect(self.db_name)
+            return conectar_sqlite(self.db_name, config.DB_POOL_TIMEOUT, config.SQLITE_PRAGMAS)
+    
+    @contextmanager
+    def conexion(self):
+        """Conexión del pool; se devuelve automáticamente al salir del bloque with"""
+        conn = self.pool.obtener()
+        descartar = False
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                descartar = True
+            raise
+        finally:
+            self.pool.devolver(conn, descartar)
     
     def get_placeholder(self):
         """Retorna el placeholder correcto según el tipo de BD"""
@@ -64,11 +115,9 @@ class Database:
         else:
             return 'INTEGER PRIMARY KEY AUTOINCREMENT'
     
-    def convert_query(self, query):
-        """Convierte placeholders según el tipo de BD"""
-        if self.db_type == 'sqlite':
-            return query.replace('%s', '?')
-        return query
+    def ejecutar(self, cursor, nombre, params=()):
+        """Ejecuta una sentencia del registro de consultas (consultas.CONSULTAS)"""
+        return self.consultas.ejecutar(cursor, nombre, params)
     
     def get_integrity_error(self):
         """Retorna la excepción de integridad correcta"""
@@ -76,294 +125,170 @@ class Database:
             return psycopg2.IntegrityError
         return sqlite3.IntegrityError
     
-    def get_lastrowid(self, cursor):
-        """Obtiene el último ID insertado según el tipo de BD"""
-        if self.db_type == 'postgresql':
-            # En PostgreSQL, fetchone() después de INSERT ... RETURNING
-            return cursor.fetchone()[0]
-        else:
-            # En SQLite, usar lastrowid
-            return cursor.lastrowid
+    def insertar(self, cursor, nombre, params=()):
+        """Ejecuta un INSERT del registro y devuelve el id nuevo (RETURNING o lastrowid)"""
+        return self.consultas.insertar(cursor, nombre, params)
     
-    def init_db(self):
-        """Inicializa la base de datos con las tablas necesarias"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        pk = self.get_autoincrement()
-        
-        # Tabla de tutores
-        cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS tutores (
-                id {pk},
-                nombre_apellido TEXT NOT NULL,
-                dni TEXT NOT NULL,
-                direccion TEXT,
-                barrio TEXT,
-                telefono TEXT,
-                UNIQUE(dni)
-            )
-        ''')
-        
-        # Tabla de atenciones (unifica castraciones y atención primaria)
-        cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS atenciones (
-                id {pk},
-                numero INTEGER UNIQUE NOT NULL,
-                fecha DATE NOT NULL,
-                tipo_atencion TEXT NOT NULL,
-                nombre_animal TEXT NOT NULL,
-                especie TEXT NOT NULL,
-                sexo TEXT NOT NULL,
-                edad TEXT,
-                tutor_id INTEGER NOT NULL,
-                motivo TEXT,
-                diagnostico TEXT,
-                tratamiento TEXT,
-                derivacion TEXT,
-                estado TEXT DEFAULT 'completado',
-                observaciones TEXT,
-                FOREIGN KEY (tutor_id) REFERENCES tutores(id)
-            )
-        ''')
-        
-        # Tabla de turnos/cronograma
-        cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS turnos (
-                id {pk},
-                fecha DATE NOT NULL,
-                hora TEXT NOT NULL,
-                nombre_animal TEXT NOT NULL,
-                tutor_nombre TEXT NOT NULL,
-                telefono TEXT,
-                tipo TEXT NOT NULL,
-                estado TEXT DEFAULT 'pendiente',
-                observaciones TEXT
-            )
-        ''')
-        
-        # Tabla de auditoría/log
-        cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS auditoria (
-                id {pk},
-                fecha_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                tipo_operacion TEXT NOT NULL,
-                tabla TEXT NOT NULL,
-                registro_id INTEGER,
-                usuario TEXT,
-                datos_anteriores TEXT,
-                datos_nuevos TEXT,
-                descripcion TEXT
-            )
-        ''')
-        
-        # Tabla de barrios en el mapa
-        cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS barrios_mapa (
-                id {pk},
-                nombre TEXT NOT NULL,
-                latitud REAL NOT NULL,
-                longitud REAL NOT NULL,
-                color TEXT DEFAULT '#3498db',
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Crear índices para mejorar rendimiento
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_atenciones_fecha ON atenciones(fecha)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_atenciones_tipo ON atenciones(tipo_atencion)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_atenciones_numero ON atenciones(numero)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tutores_dni ON tutores(dni)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_turnos_fecha ON turnos(fecha)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_auditoria_fecha ON auditoria(fecha_hora)')
-        
-        conn.commit()
-        conn.close()
+    def init_db(self, progreso=None):
+        """Verifica la versión del esquema y aplica las migraciones pendientes (migraciones.py)"""
+        with self.conexion() as conn:
+            if migraciones.version_actual(conn) < migraciones.ULTIMA_VERSION:
+                migraciones.migrar(conn, self, progreso)
+            self.busqueda_indexada = indices_busqueda_disponibles(conn.cursor(), self.db_type)
     
+    @invalida_cache
     def agregar_atencion(self, numero, fecha, tipo_atencion, nombre_animal, especie, sexo, edad,
                         nombre_apellido, dni, direccion, barrio, telefono, 
                         motivo='', diagnostico='', tratamiento='', derivacion='', observaciones=''):
         """Agrega una nueva atención (castración o atención primaria) a la base de datos"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.conexion() as conn:
+            cursor = conn.cursor()
         
-        try:
-            # Crear siempre un nuevo tutor para cada atención (evita conflictos de barrio/dirección)
-            if self.db_type == 'postgresql':
-                cursor.execute(self.convert_query('''
-                    INSERT INTO tutores (nombre_apellido, dni, direccion, barrio, telefono)
-                    VALUES (%s, %s, %s, %s, %s)
-                    RETURNING id
-                '''), (nombre_apellido, dni, direccion, barrio, telefono))
-                tutor_id = self.get_lastrowid(cursor)
-            else:
-                cursor.execute(self.convert_query('''
-                    INSERT INTO tutores (nombre_apellido, dni, direccion, barrio, telefono)
-                    VALUES (%s, %s, %s, %s, %s)
-                '''), (nombre_apellido, dni, direccion, barrio, telefono))
-                tutor_id = cursor.lastrowid
+            try:
+                barrio_norm = canonizar_barrio(cursor, self.get_placeholder(), barrio)
             
-            # Agregar atención
-            cursor.execute(self.convert_query('''
-                INSERT INTO atenciones (numero, fecha, tipo_atencion, nombre_animal, especie, sexo, edad, 
-                                       tutor_id, motivo, diagnostico, tratamiento, derivacion, observaciones)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            '''), (numero, fecha, tipo_atencion, nombre_animal, especie, sexo, edad, tutor_id,
-                  motivo, diagnostico, tratamiento, derivacion, observaciones))
+                # Versión del tutor (se reutiliza si los datos no cambiaron)
+                tutor_id = tutores.obtener_tutor(
+                    cursor, self.db_type, self.get_placeholder(),
+                    nombre_apellido=nombre_apellido, dni=dni, direccion=direccion,
+                    barrio=barrio, telefono=telefono, barrio_norm=barrio_norm
+                )
             
-            conn.commit()
-            tipo_texto = "Castración" if tipo_atencion == "castracion" else "Atención primaria"
-            return True, f"{tipo_texto} registrada exitosamente (#{numero})"
-        except self.get_integrity_error() as e:
-            conn.rollback()
-            if "numero" in str(e).lower():
-                return False, f"El número {numero} ya existe en el sistema"
-            elif "dni" in str(e).lower():
-                return False, "Error al procesar los datos del tutor"
-            return False, f"Error de integridad: {str(e)}"
-        except Exception as e:
-            conn.rollback()
-            return False, f"Error al registrar: {str(e)}"
-        finally:
-            conn.close()
+                # Agregar atención
+                self.ejecutar(cursor, 'atencion_insertar', (numero, fecha, tipo_atencion, nombre_animal, especie, sexo, edad, tutor_id,
+                      motivo, diagnostico, tratamiento, derivacion, observaciones))
+                ajustar_rollup(cursor, self.get_placeholder(), numero, +1)
+                busqueda_rapida.indexar_atencion(cursor, self.get_placeholder(), numero)
+                numeracion.consumir(cursor, self.db_type, self.get_placeholder(), [numero])
+            
+                conn.commit()
+                tipo_texto = "Castración" if tipo_atencion == "castracion" else "Atención primaria"
+                return True, f"{tipo_texto} registrada exitosamente (#{numero})"
+            except self.get_integrity_error() as e:
+                conn.rollback()
+                if "numero" in str(e).lower():
+                    return False, f"El número {numero} ya existe en el sistema"
+                elif "dni" in str(e).lower():
+                    return False, "Error al procesar los datos del tutor"
+                return False, f"Error de integridad: {str(e)}"
+            except Exception as e:
+                conn.rollback()
+                return False, f"Error al registrar: {str(e)}"
 
+    @invalida_cache
     def editar_atencion(self, numero, datos, usuario='mariateresa'):
         """Edita una atención existente y registra cambios en auditoría"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        placeholder = self.get_placeholder()
-        
-        try:
-            # Obtener datos anteriores para auditoría
-            cursor.execute(self.convert_query('''
-                SELECT a.*, t.nombre_apellido, t.dni 
-                FROM atenciones a 
-                JOIN tutores t ON a.tutor_id = t.id 
-                WHERE a.numero = %s
-            '''), (numero,))
-            row_anterior = cursor.fetchone()
-            
-            if not row_anterior:
-                return False, "Registro no encontrado"
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+            placeholder = self.get_placeholder()
+        
+            try:
+                # Obtener datos anteriores para auditoría
+                atencion_id, anterior = self._datos_atencion(cursor, numero)
+                if atencion_id is None:
+                    return False, "Registro no encontrado"
             
-            datos_anteriores = f"#{row_anterior[1]} - {row_anterior[4]} ({row_anterior[5]}) - Tutor: {row_anterior[-2]}"
+                # Versión del tutor con los datos editados (las versiones son inmutables: no afecta otros registros)
+                dni = datos.get('dni')
+                barrio_norm = canonizar_barrio(cursor, placeholder, datos.get('barrio', ''))
+                nuevo_tutor_id = tutores.obtener_tutor(
+                    cursor, self.db_type, placeholder,
+                    nombre_apellido=datos.get('nombre_apellido'), dni=dni,
+                    direccion=datos.get('direccion', ''), barrio=datos.get('barrio', ''),
+                    telefono=datos.get('telefono', ''), barrio_norm=barrio_norm
+                )
             
-            # SIEMPRE crear un tutor NUEVO al editar (evita afectar otros registros que compartan tutor)
-            dni = datos.get('dni')
+                # Descontar del resumen diario la versión anterior
+                ajustar_rollup(cursor, placeholder, numero, -1)
             
-            if self.db_type == 'postgresql':
-                cursor.execute(self.convert_query('''
-                    INSERT INTO tutores (nombre_apellido, dni, direccion, barrio, telefono)
-                    VALUES (%s, %s, %s, %s, %s)
-                    RETURNING id
-                '''), (datos.get('nombre_apellido'), dni, datos.get('direccion', ''),
-                      datos.get('barrio', ''), datos.get('telefono', '')))
-                nuevo_tutor_id = cursor.fetchone()[0]
-            else:
-                cursor.execute(self.convert_query('''
-                    INSERT INTO tutores (nombre_apellido, dni, direccion, barrio, telefono)
-                    VALUES (%s, %s, %s, %s, %s)
-                '''), (datos.get('nombre_apellido'), dni, datos.get('direccion', ''),
-                      datos.get('barrio', ''), datos.get('telefono', '')))
-                nuevo_tutor_id = cursor.lastrowid
+                # Actualizar datos de la atención
+                self.ejecutar(cursor, 'atencion_actualizar', (datos.get('fecha'), datos.get('nombre_animal'), datos.get('especie'), 
+                      datos.get('sexo'), datos.get('edad', ''), datos.get('motivo', ''), 
+                      datos.get('diagnostico', ''), datos.get('tratamiento', ''), 
+                      datos.get('derivacion', ''), datos.get('observaciones', ''), 
+                      nuevo_tutor_id, numero))
+                ajustar_rollup(cursor, placeholder, numero, +1)
+                busqueda_rapida.indexar_atencion(cursor, placeholder, numero)
             
-            # Actualizar datos de la atención
-            cursor.execute(self.convert_query('''
-                UPDATE atenciones 
-                SET fecha = %s, nombre_animal = %s, especie = %s, sexo = %s, edad = %s,
-                    motivo = %s, diagnostico = %s, tratamiento = %s, derivacion = %s, 
-                    observaciones = %s, tutor_id = %s
-                WHERE numero = %s
-            '''), (datos.get('fecha'), datos.get('nombre_animal'), datos.get('especie'), 
-                  datos.get('sexo'), datos.get('edad', ''), datos.get('motivo', ''), 
-                  datos.get('diagnostico', ''), datos.get('tratamiento', ''), 
-                  datos.get('derivacion', ''), datos.get('observaciones', ''), 
-                  nuevo_tutor_id, numero))
+                # Registrar en auditoría solo los campos que cambiaron
+                antes, despues = auditoria.diferencias(anterior, {
+                    campo: datos.get(campo, '') for campo in anterior if campo not in ('numero', 'tipo_atencion')
+                })
+                self.registrar_auditoria(
+                    cursor, 'UPDATE', 'atenciones', atencion_id, usuario,
+                    datos_anteriores=antes,
+                    datos_nuevos=despues,
+                    descripcion=f"Edición de atención #{numero}"
+                )
             
-            # Registrar en auditoría
-            datos_nuevos = f"#{numero} - {datos.get('nombre_animal')} ({datos.get('especie')})"
-            self.registrar_auditoria(
-                'UPDATE', 'atenciones', row_anterior[0], usuario,
-                datos_anteriores=datos_anteriores,
-                datos_nuevos=datos_nuevos,
-                descripcion=f"Edición de atención #{numero}"
-            )
-            
-            conn.commit()
-            return True, "Registro actualizado y cambios guardados en historial"
-        except Exception as e:
-            conn.rollback()
-            return False, f"Error al editar: {str(e)}"
-        finally:
-            conn.close()
+                conn.commit()
+                return True, "Registro actualizado y cambios guardados en historial"
+            except Exception as e:
+                conn.rollback()
+                return False, f"Error al editar: {str(e)}"
     
-    def registrar_auditoria(self, tipo_operacion, tabla, registro_id, usuario, datos_anteriores='', datos_nuevos='', descripcion=''):
-        """Registra una operación en la tabla de auditoría"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute(self.convert_query('''
-                INSERT INTO auditoria (tipo_operacion, tabla, registro_id, usuario, datos_anteriores, datos_nuevos, descripcion)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            '''), (tipo_operacion, tabla, registro_id, usuario, datos_anteriores, datos_nuevos, descripcion))
-            conn.commit()
-        except Exception as e:
-            print(f"Error al registrar auditoría: {e}")
-        finally:
-            conn.close()
+    def _datos_atencion(self, cursor, numero):
+        """(id, {campo: valor}) de una atención con los datos de su tutor, o (None, None)"""
+        self.ejecutar(cursor, 'atencion_datos', (numero,))
+        fila = cursor.fetchone()
+        if not fila:
+            return None, None
+        return fila[0], dict(zip(importacion.CAMPOS, fila[1:]))
+    
+    def registrar_auditoria(self, cursor, tipo_operacion, tabla, registro_id, usuario,
+                            datos_anteriores=None, datos_nuevos=None, descripcion=''):
+        """Registra una operación en la auditoría dentro de la transacción del cursor"""
+        entrada = auditoria.entrada(tipo_operacion, tabla, registro_id, usuario,
+                                    datos_anteriores, datos_nuevos, descripcion)
+        auditoria.insertar(cursor, self.get_placeholder(), [entrada])
     
+    @invalida_cache
     def eliminar_atencion(self, numero, usuario='mariateresa'):
         """Elimina una atención (soft delete - guarda en auditoría)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # Obtener datos antes de eliminar
-            cursor.execute('''
-                SELECT a.*, t.nombre_apellido, t.dni 
-                FROM atenciones a 
-                JOIN tutores t ON a.tutor_id = t.id 
-                WHERE a.numero = %s
-            ''', (numero,))
-            row = cursor.fetchone()
-            
-            if not row:
-                return False, "Registro no encontrado"
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+        
+            try:
+                # Obtener datos antes de eliminar
+                atencion_id, anterior = self._datos_atencion(cursor, numero)
+                if atencion_id is None:
+                    return False, "Registro no encontrado"
             
-            # Guardar en auditoría
-            datos_anteriores = f"#{row[1]} - {row[4]} ({row[5]}) - Tutor: {row[-2]} (DNI: {row[-1]})"
-            self.registrar_auditoria(
-                'DELETE', 'atenciones', row[0], usuario, 
-                datos_anteriores=datos_anteriores,
-                descripcion=f"Eliminación de atención #{numero}"
-            )
+                # Eliminar
+                ajustar_rollup(cursor, self.get_placeholder(), numero, -1)
+                busqueda_rapida.desindexar_atencion(cursor, self.get_placeholder(), numero)
+                self.ejecutar(cursor, 'atencion_eliminar', (numero,))
             
-            # Eliminar
-            cursor.execute('DELETE FROM atenciones WHERE numero = %s', (numero,))
-            conn.commit()
-            return True, "Registro eliminado y guardado en historial"
-        except Exception as e:
-            return False, f"Error al eliminar: {str(e)}"
-        finally:
-            conn.close()
+                # Guardar en auditoría el registro completo
+                self.registrar_auditoria(
+                    cursor, 'DELETE', 'atenciones', atencion_id, usuario,
+                    datos_anteriores=anterior,
+                    descripcion=f"Eliminación de atención #{numero}"
+                )
+                conn.commit()
+                return True, "Registro eliminado y guardado en historial"
+            except Exception as e:
+                conn.rollback()
+                return False, f"Error al eliminar: {str(e)}"
     
-    def obtener_auditoria(self, limite=100):
-        """Obtiene el historial de auditoría"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, fecha_hora, tipo_operacion, tabla, registro_id, usuario, 
-                   datos_anteriores, datos_nuevos, descripcion
-            FROM auditoria
-            ORDER BY fecha_hora DESC
-            LIMIT %s
-        ''', (limite,))
-        
-        resultados = cursor.fetchall()
-        conn.close()
-        return resultados
+    def obtener_auditoria(self, limite=100, filtros=None, after_id=None):
+        """Historial de auditoría, del más reciente al más antiguo (paginado por id)"""
+        with self.conexion() as conn:
+            return auditoria.consultar(conn.cursor(), self.db_type, self.get_placeholder(), filtros, after_id,
+                                       limite, directorio=config.AUDITORIA_DIRECTORIO_ARCHIVO)
+    
+    def historial_registro(self, tabla, registro_id):
+        """Todas las entradas de auditoría de un registro, en orden cronológico"""
+        with self.conexion() as conn:
+            return auditoria.historial_registro(conn.cursor(), self.db_type, self.get_placeholder(), tabla,
+                                                registro_id, directorio=config.AUDITORIA_DIRECTORIO_ARCHIVO)
+    
+    def archivar_auditoria(self, meses=None, directorio=None, progreso=None):
+        """Pasa a tablas mensuales y comprime a disco la auditoría más vieja que la retención"""
+        meses = config.AUDITORIA_MESES_RETENCION if meses is None else meses
+        with self.conexion() as conn:
+            return auditoria.archivar(conn, self.db_type, self.get_placeholder(), meses,
+                                      directorio or config.AUDITORIA_DIRECTORIO_ARCHIVO, progreso)
 
     # Mantener compatibilidad con código antiguo
     def agregar_castracion(self, numero, fecha, nombre_animal, especie, sexo, edad,
@@ -372,54 +297,73 @@ class Database:
         return self.agregar_atencion(numero, fecha, 'castracion', nombre_animal, especie, sexo, edad,
                                      nombre_apellido, dni, direccion, barrio, telefono)
     
-    def buscar_atenciones(self, filtros=None):
-        """Busca atenciones con filtros opcionales"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        query = '''
-            SELECT a.id, a.numero, a.fecha, a.tipo_atencion, a.nombre_animal, a.especie, a.sexo, a.edad,
-                   t.nombre_apellido, t.dni, t.direccion, t.barrio, t.telefono,
-                   a.motivo, a.diagnostico, a.tratamiento, a.derivacion, a.observaciones
-            FROM atenciones a
-            JOIN tutores t ON a.tutor_id = t.id
-            WHERE 1=1
-        '''
+    def _condicion_atenciones(self, filtros):
+        """Arma el WHERE de búsqueda de atenciones (compartido por búsqueda, conteo y exportación)"""
+        ph = self.get_placeholder()
+        condicion = 'WHERE 1=1'
         params = []
         
         if filtros:
             if filtros.get('numero'):
-                query += ' AND a.numero = %s'
+                condicion += f' AND a.numero = {ph}'
                 params.append(filtros['numero'])
             if filtros.get('tipo_atencion'):
-                query += ' AND a.tipo_atencion = %s'
+                condicion += f' AND a.tipo_atencion = {ph}'
                 params.append(filtros['tipo_atencion'])
-            if filtros.get('especie'):
-                query += ' AND a.especie LIKE %s'
-                params.append(f"%{filtros['especie']}%")
-            if filtros.get('dni'):
-                query += ' AND t.dni LIKE %s'
-                params.append(f"%{filtros['dni']}%")
-            if filtros.get('barrio'):
-                query += ' AND t.barrio LIKE %s'
-                params.append(f"%{filtros['barrio']}%")
-            if filtros.get('nombre_animal'):
-                query += ' AND a.nombre_animal LIKE %s'
-                params.append(f"%{filtros['nombre_animal']}%")
+            for sql, patron in condiciones_subcadena(self.db_type, self.busqueda_indexada, filtros):
+                condicion += f' AND {sql}'
+                params.append(patron)
             if filtros.get('fecha_desde'):
-                query += ' AND a.fecha >= %s'
+                condicion += f' AND a.fecha >= {ph}'
                 params.append(filtros['fecha_desde'])
             if filtros.get('fecha_hasta'):
-                query += ' AND a.fecha <= %s'
+                condicion += f' AND a.fecha <= {ph}'
                 params.append(filtros['fecha_hasta'])
         
-        query += ' ORDER BY a.numero DESC'
+        return condicion, params
+    
+    def buscar_atenciones(self, filtros=None, after_numero=None, limite=None):
+        """Busca atenciones con filtros opcionales.
+        
+        Paginación por clave: devuelve hasta `limite` filas con numero < after_numero,
+        ordenadas por numero descendente (usa el índice único de numero).
+        """
+        condicion, params = self._condicion_atenciones(filtros)
         
-        cursor.execute(query, params)
-        resultados = cursor.fetchall()
-        conn.close()
+        if after_numero is not None:
+            condicion += f' AND a.numero < {self.get_placeholder()}'
+            params.append(after_numero)
         
-        return resultados
+        query = f'''
+            SELECT a.id, a.numero, a.fecha, a.tipo_atencion, a.nombre_animal, a.especie, a.sexo, a.edad,
+                   t.nombre_apellido, t.dni, t.direccion, t.barrio, t.telefono,
+                   a.motivo, a.diagnostico, a.tratamiento, a.derivacion, a.observaciones
+            FROM atenciones a
+            JOIN tutores t ON a.tutor_id = t.id
+            {condicion}
+            ORDER BY a.numero DESC
+        '''
+        if limite is not None:
+            query += f' LIMIT {self.get_placeholder()}'
+            params.append(limite)
+        
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    def contar_atenciones(self, filtros=None):
+        """Cuenta las atenciones que cumplen los filtros (solo se usa si el cliente pide el total)"""
+        condicion, params = self._condicion_atenciones(filtros)
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT COUNT(*)
+                FROM atenciones a
+                JOIN tutores t ON a.tutor_id = t.id
+                {condicion}
+            ''', params)
+            return cursor.fetchone()[0]
 
     # Mantener compatibilidad con código antiguo
     def buscar_castraciones(self, filtros=None):
@@ -429,511 +373,310 @@ class Database:
         filtros['tipo_atencion'] = 'castracion'
         return self.buscar_atenciones(filtros)
     
+    @cacheado
     def obtener_estadisticas(self, fecha_desde=None, fecha_hasta=None):
-        """Obtiene estadísticas con filtros de fecha opcionales"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        stats = {}
-        placeholder = self.get_placeholder()
-        
-        # Construir condición de fecha
-        fecha_condicion = "1=1"
-        fecha_params = []
-        if fecha_desde:
-            fecha_condicion += f" AND fecha >= {placeholder}"
-            fecha_params.append(fecha_desde)
-        if fecha_hasta:
-            fecha_condicion += f" AND fecha <= {placeholder}"
-            fecha_params.append(fecha_hasta)
-        
-        # Total de atenciones
-        cursor.execute(f'SELECT COUNT(*) FROM atenciones WHERE {fecha_condicion}', fecha_params)
-        stats['total'] = cursor.fetchone()[0]
-        
-        # Por tipo de atención
-        cursor.execute(f'''
-            SELECT tipo_atencion, COUNT(*) as cantidad
-            FROM atenciones
-            WHERE {fecha_condicion}
-            GROUP BY tipo_atencion
-            ORDER BY cantidad DESC
-        ''', fecha_params)
-        stats['por_tipo'] = cursor.fetchall()
-        
-        # Por especie
-        cursor.execute(f'''
-            SELECT especie, COUNT(*) as cantidad
-            FROM atenciones
-            WHERE {fecha_condicion}
-            GROUP BY especie
-            ORDER BY cantidad DESC
-        ''', fecha_params)
-        stats['por_especie'] = cursor.fetchall()
-        
-        # Por sexo
-        cursor.execute(f'''
-            SELECT sexo, COUNT(*) as cantidad
-            FROM atenciones
-            WHERE {fecha_condicion}
-            GROUP BY sexo
-        ''', fecha_params)
-        stats['por_sexo'] = cursor.fetchall()
-        
-        # Por día - compatible con ambas BD
-        if self.db_type == 'postgresql':
-            cursor.execute(f'''
-                SELECT fecha::date as dia, COUNT(*) as cantidad
-                FROM atenciones
-                WHERE {fecha_condicion}
-                GROUP BY fecha::date
-                ORDER BY dia ASC
-            ''', fecha_params)
-        else:
-            cursor.execute(f'''
-                SELECT DATE(fecha) as dia, COUNT(*) as cantidad
-                FROM atenciones
-                WHERE {fecha_condicion}
-                GROUP BY dia
-                ORDER BY dia ASC
-            ''', fecha_params)
-        stats['por_dia'] = cursor.fetchall()
-        
-        # Por semana - compatible con ambas BD
-        if self.db_type == 'postgresql':
-            cursor.execute(f'''
-                SELECT TO_CHAR(fecha, 'IYYY-IW') as semana, COUNT(*) as cantidad
-                FROM atenciones
-                WHERE {fecha_condicion}
-                GROUP BY TO_CHAR(fecha, 'IYYY-IW')
-                ORDER BY semana ASC
-            ''', fecha_params)
-        else:
-            cursor.execute(f'''
-                SELECT strftime('%Y-W%W', fecha) as semana, COUNT(*) as cantidad
-                FROM atenciones
-                WHERE {fecha_condicion}
-                GROUP BY semana
-                ORDER BY semana ASC
-            ''', fecha_params)
-        stats['por_semana'] = cursor.fetchall()
-        
-        # Por mes - compatible con ambas BD
-        if self.db_type == 'postgresql':
-            cursor.execute(f'''
-                SELECT TO_CHAR(fecha, 'YYYY-MM') as mes, COUNT(*) as cantidad
-                FROM atenciones
-                WHERE {fecha_condicion}
-                GROUP BY TO_CHAR(fecha, 'YYYY-MM')
-                ORDER BY mes ASC
-            ''', fecha_params)
-        else:
-            cursor.execute(f'''
-                SELECT strftime('%Y-%m', fecha) as mes, COUNT(*) as cantidad
-                FROM atenciones
-                WHERE {fecha_condicion}
-                GROUP BY mes
-                ORDER BY mes ASC
-            ''', fecha_params)
-        stats['por_mes'] = cursor.fetchall()
-        
-        # Por barrio
-        cursor.execute(f'''
-            SELECT t.barrio, COUNT(*) as cantidad
-            FROM atenciones a
-            JOIN tutores t ON a.tutor_id = t.id
-            WHERE t.barrio IS NOT NULL AND t.barrio != '' AND {fecha_condicion}
-            GROUP BY t.barrio
-            ORDER BY cantidad DESC
-            LIMIT 15
-        ''', fecha_params)
-        stats['por_barrio'] = cursor.fetchall()
-        
-        # Por año - compatible con ambas BD
-        if self.db_type == 'postgresql':
-            cursor.execute(f'''
-                SELECT EXTRACT(YEAR FROM fecha)::text as anio, COUNT(*) as cantidad
-                FROM atenciones
-                WHERE {fecha_condicion}
-                GROUP BY EXTRACT(YEAR FROM fecha)
-                ORDER BY anio DESC
-            ''', fecha_params)
-        else:
-            cursor.execute(f'''
-                SELECT strftime('%Y', fecha) as anio, COUNT(*) as cantidad
-                FROM atenciones
-                WHERE {fecha_condicion}
-                GROUP BY anio
-                ORDER BY anio DESC
-            ''', fecha_params)
-        stats['por_anio'] = cursor.fetchall()
-        
-        # Totales por especie y sexo combinados
-        cursor.execute(f'''
-            SELECT especie, sexo, COUNT(*) as cantidad
-            FROM atenciones
-            WHERE {fecha_condicion}
-            GROUP BY especie, sexo
-            ORDER BY especie, sexo
-        ''', fecha_params)
-        stats['especie_sexo'] = cursor.fetchall()
-        
-        conn.close()
-        return stats
+        """Obtiene estadísticas con filtros de fecha opcionales (una sola pasada sobre atenciones)"""
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+            return calcular_estadisticas(cursor, self.db_type, self.get_placeholder(),
+                                         fecha_desde, fecha_hasta)
+    
+    @invalida_cache
+    def reconstruir_estadisticas(self):
+        """Recalcula el resumen diario de estadísticas desde atenciones"""
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+            filas = reconstruir_rollup(cursor)
+            conn.commit()
+            return filas
+    
+    def reconstruir_busqueda(self):
+        """Recalcula el índice de la búsqueda rápida desde atenciones y tutores"""
+        with self.conexion() as conn:
+            filas = busqueda_rapida.reconstruir_indice(conn, self.get_placeholder())
+            conn.commit()
+            return filas
+    
+    def buscar_rapido(self, q, limite=busqueda_rapida.LIMITE_RESULTADOS):
+        """Búsqueda por nombre de animal, tutor, DNI, teléfono o barrio, ordenada por relevancia"""
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+            return busqueda_rapida.buscar(cursor, self.db_type, self.get_placeholder(), q, limite)
+    
+    @cacheado
+    def obtener_estadisticas_barrios(self):
+        """Castraciones por barrio (variantes agrupadas), para el mapa"""
+        with self.conexion() as conn:
+            return estadisticas_barrios(conn.cursor(), self.db_type, self.get_placeholder())
+    
+    @cacheado
+    def obtener_lista_barrios(self):
+        """Barrios registrados con cantidad de tutores y sus variantes"""
+        with self.conexion() as conn:
+            return lista_barrios(conn.cursor(), self.db_type)
+    
+    @invalida_cache
+    def actualizar_barrios(self):
+        """Completa barrio_norm de los tutores cargados por fuera de la aplicación"""
+        with self.conexion() as conn:
+            filas = completar_barrios(conn.cursor(), self.get_placeholder())
+            conn.commit()
+            return filas
+    
+    @invalida_cache
+    def compactar_tutores(self, tamanio_lote=tutores.TAMANIO_LOTE, progreso=None):
+        """Une las versiones repetidas de cada tutor y reapunta las atenciones"""
+        with self.conexion() as conn:
+            return tutores.compactar(conn, self.get_placeholder(), tamanio_lote, progreso)
+    
+    @invalida_cache
+    def depurar_tutores(self, tamanio_lote=tutores.TAMANIO_LOTE, vacuum=True, progreso=None):
+        """Borra las versiones de tutores sin atenciones (archivadas en auditoría)"""
+        with self.conexion() as conn:
+            resultado = tutores.depurar_huerfanos(conn, self.db_type, self.get_placeholder(),
+                                                  tamanio_lote, progreso)
+            resultado['bytes_liberados'] = None
+            if vacuum and resultado['eliminadas']:
+                resultado['bytes_liberados'] = tutores.liberar_espacio(conn, self.db_type)
+            return resultado
+    
+    def historial_tutor(self, dni):
+        """Versiones de datos y atenciones de un tutor (por DNI)"""
+        with self.conexion() as conn:
+            return tutores.historial(conn.cursor(), self.get_placeholder(), dni)
     
     def obtener_siguiente_numero(self):
-        """Obtiene el siguiente número de registro disponible"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT MAX(numero) FROM atenciones')
-        max_num = cursor.fetchone()[0]
-        conn.close()
-        return (max_num or 0) + 1
+        """Próximo número del contador (solo consulta: para asignarlo usar reservar_numero)"""
+        with self.conexion() as conn:
+            return numeracion.proximo(conn.cursor(), self.db_type)
+    
+    def reservar_numero(self, usuario='mariateresa'):
+        """Reserva un número de atención para un formulario; devuelve (numero, vence)"""
+        with self.conexion() as conn:
+            numero, vence = numeracion.reservar(conn.cursor(), self.db_type, self.get_placeholder(), usuario,
+                                                config.NUMERO_RESERVA_MINUTOS)
+            conn.commit()
+            return numero, vence
     
     def obtener_castracion_por_id(self, numero):
-        """Obtiene una castración específica por número de registro"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT c.numero, c.fecha, c.nombre_animal, c.especie, c.sexo, c.edad,
-                   t.nombre_apellido, t.dni, t.direccion, t.barrio, t.telefono
-            FROM castraciones c
-            JOIN tutores t ON c.tutor_id = t.id
-            WHERE c.numero = %s
-        ''', (numero,))
-        
-        resultado = cursor.fetchone()
-        conn.close()
-        
-        if resultado:
-            return {
-                'numero': resultado[0],
-                'fecha': resultado[1],
-                'nombre_animal': resultado[2],
-                'especie': resultado[3],
-                'sexo': resultado[4],
-                'edad': resultado[5],
-                'tutor': {
-                    'nombre_apellido': resultado[6],
-                    'dni': resultado[7],
-                    'direccion': resultado[8],
-                    'barrio': resultado[9],
-                    'telefono': resultado[10]
+        """Método legacy - obtiene una castración por número de registro"""
+        with self.conexion() as conn:
+            resultado = self.ejecutar(conn.cursor(), 'castracion_obtener', (numero,)).fetchone()
+        
+            if resultado:
+                return {
+                    'numero': resultado[0],
+                    'fecha': resultado[1],
+                    'nombre_animal': resultado[2],
+                    'especie': resultado[3],
+                    'sexo': resultado[4],
+                    'edad': resultado[5],
+                    'tutor': {
+                        'nombre_apellido': resultado[6],
+                        'dni': resultado[7],
+                        'direccion': resultado[8],
+                        'barrio': resultado[9],
+                        'telefono': resultado[10]
+                    }
                 }
-            }
-        return None
+            return None
     
     def actualizar_castracion(self, numero_original, numero, fecha, nombre_animal, especie, sexo, edad,
                              nombre_apellido, dni, direccion, barrio, telefono):
-        """Actualiza una castración existente"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # Buscar o crear tutor
-            cursor.execute('SELECT id FROM tutores WHERE dni = %s', (dni,))
-            tutor = cursor.fetchone()
-            
-            if tutor:
-                tutor_id = tutor[0]
-                # Actualizar datos del tutor
-                cursor.execute('''
-                    UPDATE tutores 
-                    SET nombre_apellido = %s, direccion = %s, barrio = %s, telefono = %s
-                    WHERE id = %s
-                ''', (nombre_apellido, direccion, barrio, telefono, tutor_id))
-            else:
-                # Crear nuevo tutor
-                if self.db_type == 'postgresql':
-                    cursor.execute('''
-                        INSERT INTO tutores (nombre_apellido, dni, direccion, barrio, telefono)
-                        VALUES (%s, %s, %s, %s, %s)
-                        RETURNING id
-                    ''', (nombre_apellido, dni, direccion, barrio, telefono))
-                    tutor_id = self.get_lastrowid(cursor)
-                else:
-                    cursor.execute('''
-                        INSERT INTO tutores (nombre_apellido, dni, direccion, barrio, telefono)
-                        VALUES (%s, %s, %s, %s, %s)
-                    ''', (nombre_apellido, dni, direccion, barrio, telefono))
-                    tutor_id = cursor.lastrowid
-            
-            # Actualizar castración
-            cursor.execute('''
-                UPDATE castraciones
-                SET numero = %s, fecha = %s, nombre_animal = %s, especie = %s, sexo = %s, edad = %s, tutor_id = %s
-                WHERE numero = %s
-            ''', (numero, fecha, nombre_animal, especie, sexo, edad, tutor_id, numero_original))
-            
-            conn.commit()
-            return True, "Registro actualizado exitosamente"
-        except self.get_integrity_error():
-            return False, f"Error: El número de registro {numero} ya existe"
-        except Exception as e:
-            return False, f"Error al actualizar: {str(e)}"
-        finally:
-            conn.close()
+        """Método legacy - redirige a editar_atencion (el número de registro no se cambia)"""
+        if int(numero) != int(numero_original):
+            return False, "No se puede cambiar el número de registro"
+        return self.editar_atencion(numero_original, {
+            'fecha': fecha, 'nombre_animal': nombre_animal, 'especie': especie, 'sexo': sexo,
+            'edad': edad, 'nombre_apellido': nombre_apellido, 'dni': dni,
+            'direccion': direccion, 'barrio': barrio, 'telefono': telefono
+        })
     
     def eliminar_castracion(self, numero):
-        """Elimina una castración por número de registro"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('DELETE FROM castraciones WHERE numero = %s', (numero,))
-            
-            if cursor.rowcount > 0:
-                conn.commit()
-                conn.close()
-                return True, "Registro eliminado exitosamente"
-            else:
-                conn.close()
-                return False, "No se encontró el registro"
-        except Exception as e:
-            conn.close()
-            return False, f"Error al eliminar: {str(e)}"
+        """Método legacy - redirige a eliminar_atencion"""
+        return self.eliminar_atencion(numero)
     
+    @cacheado
     def obtener_dashboard_stats(self):
-        """Obtiene estadísticas para el dashboard principal"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Funciones SQL compatibles según el tipo de BD
-        if self.db_type == 'postgresql':
-            today = "CURRENT_DATE"
-            now_timestamp = "CURRENT_TIMESTAMP"
-            week_ago = "CURRENT_DATE - INTERVAL '7 days'"
-            month_format = "TO_CHAR(fecha, 'YYYY-MM')"
-            current_month = "TO_CHAR(CURRENT_DATE, 'YYYY-MM')"
-        else:
-            today = "DATE('now')"
-            now_timestamp = "datetime('now')"
-            week_ago = "DATE('now', 'weekday 0', '-7 days')"
-            month_format = "strftime('%Y-%m', fecha)"
-            current_month = "strftime('%Y-%m', 'now')"
-        
-        # Atenciones de hoy (total)
-        cursor.execute(f'''
-            SELECT COUNT(*) FROM atenciones 
-            WHERE DATE(fecha) = {today}
-        ''')
-        stats['hoy'] = cursor.fetchone()[0]
-        
-        # Atenciones de esta semana
-        cursor.execute(f'''
-            SELECT COUNT(*) FROM atenciones 
-            WHERE DATE(fecha) >= {week_ago}
-        ''')
-        stats['semana'] = cursor.fetchone()[0]
-        
-        # Atenciones del mes
-        cursor.execute(f'''
-            SELECT COUNT(*) FROM atenciones 
-            WHERE {month_format} = {current_month}
-        ''')
-        stats['mes'] = cursor.fetchone()[0]
-        
-        # Atención primaria del día
-        cursor.execute(f'''
-            SELECT COUNT(*) FROM atenciones 
-            WHERE DATE(fecha) = {today}
-            AND tipo_atencion = 'atencion_primaria'
-        ''')
-        stats['primaria_hoy'] = cursor.fetchone()[0]
-        
-        # Últimas 5 atenciones
-        cursor.execute('''
-            SELECT a.numero, a.fecha, a.tipo_atencion, a.nombre_animal, a.especie, 
-                   t.nombre_apellido
-            FROM atenciones a
-            JOIN tutores t ON a.tutor_id = t.id
-            ORDER BY a.fecha DESC, a.numero DESC
-            LIMIT 5
-        ''')
-        resultados = cursor.fetchall()
-        stats['ultimas'] = [
-            {
-                'numero': r[0],
-                'fecha': str(r[1]) if r[1] else None,  # Convertir a string
-                'tipo_atencion': r[2],
-                'nombre_animal': r[3],
-                'especie': r[4],
-                'tutor': r[5]
-            }
-            for r in resultados
-        ]
-        
-        # Turnos de hoy
-        cursor.execute(f'''
-            SELECT id, hora, nombre_animal, tutor_nombre, tipo, estado
-            FROM turnos
-            WHERE DATE(fecha) = {today}
-            ORDER BY hora
-        ''')
-        resultados = cursor.fetchall()
-        stats['turnos_hoy'] = [
-            {
-                'id': r[0],
-                'hora': r[1],
-                'nombre_animal': r[2],
-                'tutor_nombre': r[3],
-                'tipo': r[4],
-                'estado': r[5]
-            }
-            for r in resultados
-        ]
-        
-        # Turnos de esta semana
-        if self.db_type == 'postgresql':
-            cursor.execute('''
-                SELECT fecha, hora, nombre_animal, tutor_nombre, tipo, estado, id
-                FROM turnos
-                WHERE DATE(fecha) >= CURRENT_DATE
-                AND DATE(fecha) <= CURRENT_DATE + INTERVAL '7 days'
-                ORDER BY fecha, hora
-            ''')
-        else:
-            cursor.execute('''
-                SELECT fecha, hora, nombre_animal, tutor_nombre, tipo, estado, id
-                FROM turnos
-                WHERE DATE(fecha) >= DATE('now')
-                AND DATE(fecha) <= DATE('now', '+7 days')
-                ORDER BY fecha, hora
-            ''')
-        resultados = cursor.fetchall()
-        stats['turnos_semana'] = [
-            {
-                'fecha': str(r[0]) if r[0] else None,
-                'hora': r[1],
-                'nombre_animal': r[2],
-                'tutor_nombre': r[3],
-                'tipo': r[4],
-                'estado': r[5],
-                'id': r[6]
-            }
-            for r in resultados
-        ]
-        
-        conn.close()
-        return stats
+        """Obtiene estadísticas para el dashboard principal (una sola consulta)"""
+        with self.conexion() as conn:
+            fila = self.ejecutar(conn.cursor(), 'dashboard').fetchone()
+        
+        hoy, semana, mes, primaria_hoy, fecha_hoy, ultimas, turnos_semana = fila
+        # PostgreSQL devuelve las listas ya decodificadas (o None si no hay filas); SQLite, texto JSON
+        ultimas = (json.loads(ultimas) if isinstance(ultimas, str) else ultimas) or []
+        turnos_semana = (json.loads(turnos_semana) if isinstance(turnos_semana, str) else turnos_semana) or []
+        
+        return {
+            'hoy': hoy,
+            'semana': semana,
+            'mes': mes,
+            'primaria_hoy': primaria_hoy,
+            'ultimas': ultimas,
+            'turnos_hoy': [
+                {clave: turno[clave] for clave in ('id', 'hora', 'nombre_animal', 'tutor_nombre', 'tipo', 'estado')}
+                for turno in turnos_semana if str(turno['fecha'])[:10] == str(fecha_hoy)
+            ],
+            'turnos_semana': turnos_semana,
+        }
     
+    @invalida_cache
     def agregar_turno(self, fecha, hora, nombre_animal, tutor_nombre, telefono, tipo, observaciones=''):
-        """Agrega un nuevo turno al cronograma"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+        """Agrega un turno si su horario existe en la agenda y tiene lugar"""
         try:
-            cursor.execute('''
-                INSERT INTO turnos (fecha, hora, nombre_animal, tutor_nombre, telefono, tipo, observaciones)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ''', (fecha, hora, nombre_animal, tutor_nombre, telefono, tipo, observaciones))
+            fecha = date.fromisoformat(str(fecha)[:10]).isoformat()
+            hora = agenda.normalizar_hora(hora)
+        except ValueError as e:
+            return False, str(e)
+
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+        
+            try:
+                conflicto = agenda.verificar_cupo(cursor, self.db_type, self.get_placeholder(), fecha, hora, tipo)
+                if conflicto:
+                    conn.rollback()
+                    return False, conflicto
+                self.ejecutar(cursor, 'turno_insertar', (fecha, hora, nombre_animal, tutor_nombre, telefono, tipo, observaciones))
             
+                conn.commit()
+                return True, "Turno agendado exitosamente"
+            except Exception as e:
+                conn.rollback()
+                return False, f"Error al agendar turno: {str(e)}"
+    
+    @cacheado
+    def turnos_disponibles(self, desde, hasta, tipo=None):
+        """Horarios con lugar entre dos fechas (incluidas), en una sola consulta"""
+        with self.conexion() as conn:
+            cursor = self.ejecutar(conn.cursor(), 'turnos_disponibles', (desde, hasta, desde, hasta, tipo))
+            return [
+                {'fecha': str(fila[0])[:10], 'hora': fila[1], 'tipo': fila[2], 'capacidad': fila[3], 'libres': fila[4]}
+                for fila in cursor.fetchall()
+            ]
+    
+    def listar_cupos(self):
+        """Cupos de la agenda por tipo, día de la semana (0 = lunes) y hora"""
+        with self.conexion() as conn:
+            cursor = self.ejecutar(conn.cursor(), 'cupos_listar')
+            return [{'tipo': fila[0], 'dia_semana': fila[1], 'hora': fila[2], 'capacidad': fila[3]}
+                    for fila in cursor.fetchall()]
+    
+    @invalida_cache
+    def guardar_cupo(self, tipo, dia_semana, hora, capacidad):
+        """Crea o cambia la capacidad de un cupo (0 = ese horario no se atiende)"""
+        with self.conexion() as conn:
+            self.ejecutar(conn.cursor(), 'cupos_guardar', (tipo, dia_semana, hora, capacidad))
             conn.commit()
-            return True, "Turno agendado exitosamente"
-        except Exception as e:
-            return False, f"Error al agendar turno: {str(e)}"
-        finally:
-            conn.close()
+            return True, "Cupo guardado"
     
-    def actualizar_estado_turno(self, turno_id, estado):
-        """Actualiza el estado de un turno"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('UPDATE turnos SET estado = %s WHERE id = %s', (estado, turno_id))
+    @invalida_cache
+    def eliminar_cupo(self, tipo, dia_semana, hora):
+        """Quita un cupo; el horario vuelve a admitir agenda.CAPACIDAD_SIN_CUPO turnos"""
+        with self.conexion() as conn:
+            cursor = self.ejecutar(conn.cursor(), 'cupos_eliminar', (tipo, dia_semana, hora))
             conn.commit()
-            return True, "Estado actualizado"
-        except Exception as e:
-            return False, f"Error: {str(e)}"
-        finally:
-            conn.close()
+            if cursor.rowcount == 0:
+                return False, "Cupo no encontrado"
+            return True, "Cupo eliminado"
+    
+    def buscar_turnos(self, desde, hasta=None, estado=None, tipo=None, after=None, limite=None):
+        """Turnos desde una fecha (y hasta otra, incluidas), por estado y tipo.
+        
+        Paginación por clave: `after` es la (fecha, hora, id) del último turno de la
+        página anterior; el orden fecha, hora, id es el del índice de turnos.
+        """
+        ph = self.get_placeholder()
+        # La búsqueda en el índice arranca en la fecha del cursor; la comparación de
+        # (fecha, hora, id) solo descarta los turnos de ese día ya devueltos
+        condicion = f'WHERE fecha >= {ph}'
+        params = [max(desde, after[0]) if after is not None else desde]
+        for sql, valor in ((f'fecha <= {ph}', hasta), (f'estado = {ph}', estado), (f'tipo = {ph}', tipo)):
+            if valor:
+                condicion += f' AND {sql}'
+                params.append(valor)
+        if after is not None:
+            condicion += f' AND (fecha, hora, id) > ({ph}, {ph}, {ph})'
+            params.extend(after)
+        
+        query = f'''
+            SELECT id, fecha, hora, nombre_animal, tutor_nombre, telefono, tipo, estado, observaciones
+            FROM turnos
+            {condicion}
+            ORDER BY fecha, hora, id
+        '''
+        if limite is not None:
+            query += f' LIMIT {ph}'
+            params.append(limite)
+        
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    @cacheado
+    def resumen_turnos(self, desde, hasta, tipo=None):
+        """Cantidad de turnos por día y estado entre dos fechas (incluidas)"""
+        with self.conexion() as conn:
+            cursor = self.ejecutar(conn.cursor(), 'turnos_por_dia', (desde, hasta, tipo))
+            return [
+                {'fecha': str(fila[0])[:10], 'total': fila[1], 'pendientes': fila[2],
+                 'completados': fila[3], 'cancelados': fila[4]}
+                for fila in cursor.fetchall()
+            ]
     
+    @invalida_cache
+    def actualizar_estado_turno(self, turno_id, estado):
+        """Actualiza el estado de un turno (reactivar uno cancelado vuelve a pedir lugar en la agenda)"""
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+        
+            try:
+                turno = self.ejecutar(cursor, 'turno_obtener', (turno_id,)).fetchone()
+                if turno is None:
+                    return False, "Turno no encontrado"
+                fecha, hora, tipo, anterior = turno
+                if anterior == 'cancelado' and estado != 'cancelado':
+                    conflicto = agenda.verificar_cupo(cursor, self.db_type, self.get_placeholder(),
+                                                      str(fecha)[:10], hora, tipo)
+                    if conflicto:
+                        conn.rollback()
+                        return False, conflicto
+                self.ejecutar(cursor, 'turno_actualizar_estado', (estado, turno_id))
+                conn.commit()
+                return True, "Estado actualizado"
+            except Exception as e:
+                conn.rollback()
+                return False, f"Error: {str(e)}"
+    
+    @invalida_cache
     def eliminar_turno(self, turno_id):
         """Elimina un turno"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.conexion() as conn:
+            cursor = conn.cursor()
         
-        try:
-            cursor.execute('DELETE FROM turnos WHERE id = %s', (turno_id,))
-            conn.commit()
-            return True, "Turno eliminado"
-        except Exception as e:
-            return False, f"Error: {str(e)}"
-        finally:
-            conn.close()
+            try:
+                self.ejecutar(cursor, 'turno_eliminar', (turno_id,))
+                conn.commit()
+                return True, "Turno eliminado"
+            except Exception as e:
+                return False, f"Error: {str(e)}"
 
-    def exportar_a_excel(self, filename='atenciones_export.xlsx', filtros=None):
-        """Exporta todas las atenciones a un archivo Excel"""
+    def exportar_a_excel(self, destino='atenciones_export.xlsx', filtros=None):
+        """Exporta las atenciones (con los mismos filtros que la búsqueda) a un XLSX"""
         try:
-            conn = self.get_connection()
-            
-            # Obtener datos de atenciones con información completa
-            query = '''
-                SELECT 
-                    a.numero AS "Número",
-                    a.fecha AS "Fecha",
-                    a.tipo_atencion AS "Tipo de Atención",
-                    a.nombre_animal AS "Nombre Animal",
-                    a.especie AS "Especie",
-                    a.sexo AS "Sexo",
-                    COALESCE(a.edad, '') AS "Edad",
-                    t.nombre_apellido AS "Tutor",
-                    t.dni AS "DNI",
-                    COALESCE(t.telefono, '') AS "Teléfono",
-                    COALESCE(t.direccion, '') AS "Dirección",
-                    COALESCE(t.barrio, '') AS "Barrio",
-                    COALESCE(a.motivo, '') AS "Motivo",
-                    COALESCE(a.diagnostico, '') AS "Diagnóstico",
-                    COALESCE(a.tratamiento, '') AS "Tratamiento",
-                    COALESCE(a.derivacion, '') AS "Derivación",
-                    COALESCE(a.observaciones, '') AS "Observaciones"
-                FROM atenciones a
-                JOIN tutores t ON a.tutor_id = t.id
-                ORDER BY a.numero DESC
-            '''
-            
-            # Leer datos en DataFrame
-            df = pd.read_sql_query(query, conn)
-            conn.close()
-            
-            # Crear archivo Excel con formato
-            with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Atenciones', index=False)
-                
-                # Obtener el workbook y sheet para formatear
-                workbook = writer.book
-                worksheet = writer.sheets['Atenciones']
-                
-                # Formatear encabezados
-                header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-                header_font = Font(color='FFFFFF', bold=True)
-                
-                for cell in worksheet[1]:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                
-                # Ajustar anchos de columna
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(cell.value)
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            return True, f"Datos exportados exitosamente a {filename}"
-            
+            total = exportacion.escribir_xlsx(self, destino, filtros)
+            return True, f"{total} registros exportados exitosamente"
         except Exception as e:
             import traceback
             print(f"Error completo al exportar: {traceback.format_exc()}")
             return False, f"Error al exportar: {str(e)}"
-
+    
+    @invalida_cache
+    def importar_atenciones(self, filas, desde=0, limite=None, tamanio_lote=importacion.TAMANIO_LOTE, progreso=None):
+        """Carga masiva de atenciones por lotes, con errores por fila y offset para retomar"""
+        return importacion.importar(self, filas, desde, limite, tamanio_lote, progreso)
+    
+    def exportar_csv(self, filtros=None):
+        """Genera la exportación en CSV por bloques (para enviar en streaming)"""
+        return exportacion.generar_csv(self, filtros)
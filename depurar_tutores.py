@@ -0,0 +1,45 @@
+"""
+Script para depurar tutores: borra las versiones de tutores que ya no usa
+ninguna atención (quedan al editar o eliminar atenciones), guardando antes
+cada una en la auditoría, y después compacta la base (VACUUM/ANALYZE).
+
+Uso:
+    python depurar_tutores.py
+    python depurar_tutores.py --lote 500 --sin-vacuum
+
+En Render corre como cron job (ver render.yaml); en una instalación local
+se puede programar con el Programador de tareas o cron.
+"""
+import argparse
+import os
+
+from database import Database
+from tutores import TAMANIO_LOTE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Depuración de tutores sin atenciones')
+    parser.add_argument('--lote', type=int, default=TAMANIO_LOTE, help='tutores por transacción')
+    parser.add_argument('--sin-vacuum', action='store_true', help='no ejecutar VACUUM/ANALYZE')
+    args = parser.parse_args()
+
+    database_url = os.environ.get('DATABASE_URL')
+    db = Database(db_url=database_url) if database_url else Database(db_url='sqlite:///mari.db')
+
+    def progreso(eliminadas):
+        print(f"  🗑️ {eliminadas} tutores archivados y eliminados")
+
+    try:
+        print("🔧 Buscando tutores sin atenciones...")
+        resultado = db.depurar_tutores(tamanio_lote=args.lote, vacuum=not args.sin_vacuum,
+                                       progreso=progreso)
+        print(f"\n✅ Filas recuperadas: {resultado['eliminadas']} ({resultado['lotes']} lotes)")
+        if resultado['bytes_liberados'] is not None:
+            print(f"✅ Espacio liberado: {resultado['bytes_liberados'] / 1024:.0f} KB")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
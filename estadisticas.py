@@ -0,0 +1,233 @@
+"""
+Motor de estadísticas de una sola pasada
+
+Calcula todos los desgloses de /api/estadisticas (total, por_tipo, por_especie,
+por_sexo, por_dia, por_semana, por_mes, por_barrio, por_anio, especie_sexo)
+recorriendo una única vez la tabla resumen estadisticas_diarias, que guarda
+un contador por (fecha, tipo_atencion, especie, sexo, barrio) y se mantiene
+en la misma transacción que cada alta, edición o baja de atenciones:
+
+- PostgreSQL: un solo SELECT con GROUPING SETS.
+- SQLite: un solo SELECT leído por lotes; los contadores se llenan en
+  Python y las claves de fecha (semana, mes, año) se calculan una vez por
+  fecha distinta con las mismas funciones de SQLite.
+"""
+import json
+from collections import Counter
+
+# Columnas derivadas de cada fila, en el orden usado por GROUPING()
+COLUMNAS = ('dia', 'semana', 'mes', 'anio', 'tipo_atencion', 'especie', 'sexo', 'barrio')
+
+# Conjuntos de agrupación -> clave del diccionario de estadísticas
+CONJUNTOS = {
+    (): 'total',
+    ('tipo_atencion',): 'por_tipo',
+    ('especie',): 'por_especie',
+    ('sexo',): 'por_sexo',
+    ('dia',): 'por_dia',
+    ('semana',): 'por_semana',
+    ('mes',): 'por_mes',
+    ('barrio',): 'por_barrio',
+    ('anio',): 'por_anio',
+    ('especie', 'sexo'): 'especie_sexo',
+}
+
+TOP_BARRIOS = 15
+TAMANIO_LOTE = 10000
+
+CLAVE_ROLLUP = 'fecha, tipo_atencion, especie, sexo, barrio'
+
+# Fila de la atención expresada con la clave del resumen diario
+_SELECT_CLAVE = '''
+    SELECT DATE(a.fecha), a.tipo_atencion, a.especie, a.sexo, COALESCE(t.barrio, ''), {cantidad}
+    FROM atenciones a
+    LEFT JOIN tutores t ON a.tutor_id = t.id
+'''
+
+
+def crear_tabla_rollup(cursor):
+    """Crea la tabla resumen diaria y su índice único"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS estadisticas_diarias (
+            fecha DATE,
+            tipo_atencion TEXT NOT NULL,
+            especie TEXT NOT NULL,
+            sexo TEXT NOT NULL,
+            barrio TEXT NOT NULL DEFAULT '',
+            cantidad INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_estadisticas_diarias_clave
+        ON estadisticas_diarias ({CLAVE_ROLLUP})
+    ''')
+
+
+def ajustar_rollup(cursor, placeholder, numero, delta):
+    """Suma delta al contador diario de la atención (usar dentro de la misma transacción)"""
+    # +1 después de insertar la atención; -1 antes de borrarla o de editarla
+    cursor.execute(f'''
+        INSERT INTO estadisticas_diarias ({CLAVE_ROLLUP}, cantidad)
+        {_SELECT_CLAVE.format(cantidad=placeholder)}
+        WHERE a.numero = {placeholder}
+        ON CONFLICT ({CLAVE_ROLLUP})
+        DO UPDATE SET cantidad = estadisticas_diarias.cantidad + excluded.cantidad
+    ''', (delta, numero))
+
+
+def ajustar_rollup_lote(cursor, placeholder, numeros, delta):
+    """Como ajustar_rollup, para varias atenciones en una sola sentencia"""
+    if not numeros:
+        return
+    marcas = ', '.join([placeholder] * len(numeros))
+    cursor.execute(f'''
+        INSERT INTO estadisticas_diarias ({CLAVE_ROLLUP}, cantidad)
+        {_SELECT_CLAVE.format(cantidad=f'{placeholder} * COUNT(*)')}
+        WHERE a.numero IN ({marcas})
+        GROUP BY DATE(a.fecha), a.tipo_atencion, a.especie, a.sexo, COALESCE(t.barrio, '')
+        ON CONFLICT ({CLAVE_ROLLUP})
+        DO UPDATE SET cantidad = estadisticas_diarias.cantidad + excluded.cantidad
+    ''', (delta, *numeros))
+
+
+def reconstruir_rollup(cursor):
+    """Recalcula la tabla resumen completa desde atenciones"""
+    cursor.execute('DELETE FROM estadisticas_diarias')
+    cursor.execute(f'''
+        INSERT INTO estadisticas_diarias ({CLAVE_ROLLUP}, cantidad)
+        {_SELECT_CLAVE.format(cantidad='COUNT(*)')}
+        GROUP BY DATE(a.fecha), a.tipo_atencion, a.especie, a.sexo, COALESCE(t.barrio, '')
+    ''')
+    cursor.execute('SELECT COUNT(*) FROM estadisticas_diarias')
+    return cursor.fetchone()[0]
+
+
+def condicion_fecha(placeholder, fecha_desde=None, fecha_hasta=None, columna='r.fecha'):
+    """Arma la condición WHERE de rango de fechas y sus parámetros"""
+    condicion = "1=1"
+    params = []
+    if fecha_desde:
+        condicion += f" AND {columna} >= {placeholder}"
+        params.append(fecha_desde)
+    if fecha_hasta:
+        condicion += f" AND {columna} <= {placeholder}"
+        params.append(fecha_hasta)
+    return condicion, params
+
+
+def _consulta_postgres(condicion):
+    columnas = ', '.join(COLUMNAS)
+    conjuntos = ', '.join('(' + ', '.join(c) + ')' for c in CONJUNTOS)
+    return f'''
+        SELECT GROUPING({columnas}) AS g, {columnas}, COALESCE(SUM(cantidad), 0) AS cantidad
+        FROM (
+            SELECT r.fecha AS dia,
+                   TO_CHAR(r.fecha, 'IYYY-IW') AS semana,
+                   TO_CHAR(r.fecha, 'YYYY-MM') AS mes,
+                   EXTRACT(YEAR FROM r.fecha)::text AS anio,
+                   r.tipo_atencion, r.especie, r.sexo, r.barrio, r.cantidad
+            FROM estadisticas_diarias r
+            WHERE {condicion}
+        ) base
+        GROUP BY GROUPING SETS ({conjuntos})
+    '''
+
+
+def _conjunto_desde_grouping(g):
+    """Decodifica la máscara de GROUPING(): bit en 0 = columna agrupada"""
+    n = len(COLUMNAS)
+    return tuple(c for i, c in enumerate(COLUMNAS) if not (g >> (n - 1 - i)) & 1)
+
+
+def _clave_orden(valor):
+    # NULL primero, como en SQL con ORDER BY ASC
+    return (valor is not None, valor)
+
+
+def _por_cantidad(contador):
+    # +contador descarta claves que quedaron en cero tras bajas y ediciones
+    return sorted((+contador).items(), key=lambda kv: (-kv[1], _clave_orden(kv[0])))
+
+
+def _por_clave(contador, reverse=False):
+    return sorted((+contador).items(), key=lambda kv: _clave_orden(kv[0]), reverse=reverse)
+
+
+def _armar(contadores):
+    """Convierte los contadores al formato de filas que espera la API"""
+    barrios = Counter({b: n for b, n in contadores['por_barrio'].items() if b})
+    return {
+        'total': contadores['total'][()],
+        'por_tipo': _por_cantidad(contadores['por_tipo']),
+        'por_especie': _por_cantidad(contadores['por_especie']),
+        'por_sexo': _por_clave(contadores['por_sexo']),
+        'por_dia': _por_clave(contadores['por_dia']),
+        'por_semana': _por_clave(contadores['por_semana']),
+        'por_mes': _por_clave(contadores['por_mes']),
+        'por_barrio': _por_cantidad(barrios)[:TOP_BARRIOS],
+        'por_anio': _por_clave(contadores['por_anio'], reverse=True),
+        'especie_sexo': [(especie, sexo, n) for (especie, sexo), n
+                         in _por_clave(contadores['especie_sexo'])],
+    }
+
+
+def calcular_estadisticas(cursor, db_type, placeholder, fecha_desde=None, fecha_hasta=None):
+    """Calcula todas las estadísticas con un único recorrido del resumen diario"""
+    condicion, params = condicion_fecha(placeholder, fecha_desde, fecha_hasta)
+    contadores = {clave: Counter() for clave in CONJUNTOS.values()}
+    contadores['total'][()] = 0
+
+    if db_type == 'postgresql':
+        _contar_postgres(cursor, condicion, params, contadores)
+    else:
+        _contar_sqlite(cursor, condicion, params, contadores)
+    return _armar(contadores)
+
+
+def _contar_postgres(cursor, condicion, params, contadores):
+    cursor.execute(_consulta_postgres(condicion), params)
+    for fila in cursor:
+        conjunto = _conjunto_desde_grouping(fila[0])
+        valores = dict(zip(COLUMNAS, fila[1:-1]))
+        clave = tuple(valores[c] for c in conjunto)
+        if len(clave) == 1:
+            clave = clave[0]
+        contadores[CONJUNTOS[conjunto]][clave] += fila[-1]
+
+
+def _contar_sqlite(cursor, condicion, params, contadores):
+    cursor.execute(f'''
+        SELECT r.fecha, r.tipo_atencion, r.especie, r.sexo, r.barrio, r.cantidad
+        FROM estadisticas_diarias r
+        WHERE {condicion}
+    ''', params)
+
+    por_fecha = Counter()
+    while True:
+        filas = cursor.fetchmany(TAMANIO_LOTE)
+        if not filas:
+            break
+        for fecha, tipo, especie, sexo, barrio, cantidad in filas:
+            por_fecha[fecha] += cantidad
+            contadores['por_tipo'][tipo] += cantidad
+            contadores['por_especie'][especie] += cantidad
+            contadores['por_sexo'][sexo] += cantidad
+            contadores['por_barrio'][barrio] += cantidad
+            contadores['especie_sexo'][(especie, sexo)] += cantidad
+
+    contadores['total'][()] = sum(por_fecha.values())
+    por_fecha = +por_fecha
+    if not por_fecha:
+        return
+
+    # Claves derivadas una sola vez por fecha distinta (mismas funciones que antes)
+    cursor.execute('''
+        SELECT value, strftime('%Y-W%W', value), strftime('%Y-%m', value), strftime('%Y', value)
+        FROM json_each(?)
+    ''', (json.dumps(list(por_fecha)),))
+    for fecha, semana, mes, anio in cursor.fetchall():
+        cantidad = por_fecha[fecha]
+        contadores['por_dia'][fecha] += cantidad
+        contadores['por_semana'][semana] += cantidad
+        contadores['por_mes'][mes] += cantidad
+        contadores['por_anio'][anio] += cantidad
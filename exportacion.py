@@ -0,0 +1,145 @@
+"""
+Exportación de atenciones a XLSX y CSV por lotes
+
+Las filas se leen con un cursor del lado del servidor (PostgreSQL) o con
+fetchmany (SQLite) y se escriben a medida que llegan, así la memoria no
+depende de la cantidad de registros:
+
+- CSV: generador de texto que se envía directo en la respuesta.
+- XLSX: workbook de openpyxl en modo write-only escrito sobre un archivo
+  temporal anónimo (el formato zip necesita un destino con seek).
+
+openpyxl se importa recién en la primera exportación XLSX: los workers que
+nunca exportan no pagan su tiempo de importación ni su memoria
+(benchmark.py arranque lo controla).
+"""
+import csv
+import io
+
+# (encabezado, expresión SQL)
+COLUMNAS = [
+    ("Número", "a.numero"),
+    ("Fecha", "a.fecha"),
+    ("Tipo de Atención", "a.tipo_atencion"),
+    ("Nombre Animal", "a.nombre_animal"),
+    ("Especie", "a.especie"),
+    ("Sexo", "a.sexo"),
+    ("Edad", "COALESCE(a.edad, '')"),
+    ("Tutor", "t.nombre_apellido"),
+    ("DNI", "t.dni"),
+    ("Teléfono", "COALESCE(t.telefono, '')"),
+    ("Dirección", "COALESCE(t.direccion, '')"),
+    ("Barrio", "COALESCE(t.barrio, '')"),
+    ("Motivo", "COALESCE(a.motivo, '')"),
+    ("Diagnóstico", "COALESCE(a.diagnostico, '')"),
+    ("Tratamiento", "COALESCE(a.tratamiento, '')"),
+    ("Derivación", "COALESCE(a.derivacion, '')"),
+    ("Observaciones", "COALESCE(a.observaciones, '')"),
+]
+ENCABEZADOS = [encabezado for encabezado, _ in COLUMNAS]
+
+TAMANIO_LOTE = 1000
+MUESTRA_ANCHOS = 200  # filas usadas para estimar el ancho de las columnas
+ANCHO_MAXIMO = 50
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+MIMETYPE_CSV = 'text/csv; charset=utf-8'
+
+
+def iterar_lotes(db, filtros=None, tamanio_lote=TAMANIO_LOTE):
+    """Genera listas de filas de la exportación, de a `tamanio_lote`"""
+    condicion, params = db._condicion_atenciones(filtros)
+    query = f'''
+        SELECT {', '.join(expresion for _, expresion in COLUMNAS)}
+        FROM atenciones a
+        JOIN tutores t ON a.tutor_id = t.id
+        {condicion}
+        ORDER BY a.numero DESC
+    '''
+
+    with db.conexion() as conn:
+        if db.db_type == 'postgresql':
+            # Cursor con nombre = cursor del lado del servidor
+            cursor = conn.cursor(name='exportacion_atenciones')
+            cursor.itersize = tamanio_lote
+        else:
+            cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                filas = cursor.fetchmany(tamanio_lote)
+                if not filas:
+                    break
+                yield filas
+        finally:
+            cursor.close()
+
+
+def generar_csv(db, filtros=None):
+    """Genera el CSV en bloques de texto (con BOM para que Excel respete los acentos)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write('\ufeff')
+    writer.writerow(ENCABEZADOS)
+    for filas in iterar_lotes(db, filtros):
+        writer.writerows(filas)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def _estimar_anchos(filas):
+    anchos = [len(encabezado) for encabezado in ENCABEZADOS]
+    for fila in filas[:MUESTRA_ANCHOS]:
+        for i, valor in enumerate(fila):
+            if valor is not None:
+                anchos[i] = max(anchos[i], len(str(valor)))
+    return [min(ancho + 2, ANCHO_MAXIMO) for ancho in anchos]
+
+
+def escribir_xlsx(db, destino, filtros=None):
+    """Escribe el XLSX en `destino` (ruta o archivo binario) y devuelve la cantidad de filas"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Atenciones')
+
+    lotes = iterar_lotes(db, filtros)
+    primer_lote = next(lotes, [])
+
+    # En modo write-only los anchos se fijan antes de escribir filas
+    for i, ancho in enumerate(_estimar_anchos(primer_lote), start=1):
+        worksheet.column_dimensions[get_column_letter(i)].width = ancho
+
+    header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+    header_font = Font(color='FFFFFF', bold=True)
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    encabezado = []
+    for texto in ENCABEZADOS:
+        cell = WriteOnlyCell(worksheet, value=texto)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        encabezado.append(cell)
+    worksheet.append(encabezado)
+
+    total = 0
+    try:
+        for fila in primer_lote:
+            worksheet.append(fila)
+        total += len(primer_lote)
+        for filas in lotes:
+            for fila in filas:
+                worksheet.append(fila)
+            total += len(filas)
+    finally:
+        # Devuelve la conexión al pool aunque falle la escritura
+        lotes.close()
+
+    workbook.save(destino)
+    return total
@@ -1,88 +1,14 @@
 """
-Script para arreglar la base de datos:
-1. Eliminar constraint UNIQUE de DNI en tutores
-2. Permitir múltiples tutores con el mismo DNI
+Script para arreglar la base de datos (OBSOLETO)
+
+Quitar el UNIQUE de tutores.dni es ahora la migración 1 de migraciones.py:
+se aplica una sola vez y queda registrada en schema_version. Para aplicar
+las migraciones pendientes ejecutar: python migrar.py
 """
-import os
-from database import Database
 
 def fix_database():
-    database_url = os.environ.get('DATABASE_URL')
-    db = Database(db_url=database_url) if database_url else Database(db_url='sqlite:///mari.db')
-    
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        if db.db_type == 'postgresql':
-            print("🔧 Eliminando constraint UNIQUE de DNI en PostgreSQL...")
-            # Eliminar constraint único en PostgreSQL - intentar todos los nombres posibles
-            try:
-                cursor.execute("ALTER TABLE tutores DROP CONSTRAINT IF EXISTS tutores_dni_key;")
-                print("  ✓ Eliminado tutores_dni_key")
-            except Exception as e:
-                print(f"  - No se pudo eliminar tutores_dni_key: {e}")
-            
-            try:
-                cursor.execute("ALTER TABLE tutores DROP CONSTRAINT IF EXISTS tutores_dni_key1;")
-                print("  ✓ Eliminado tutores_dni_key1")
-            except Exception as e:
-                print(f"  - No se pudo eliminar tutores_dni_key1: {e}")
-            
-            try:
-                cursor.execute("ALTER TABLE tutores DROP CONSTRAINT IF EXISTS unique_dni;")
-                print("  ✓ Eliminado unique_dni")
-            except Exception as e:
-                print(f"  - No se pudo eliminar unique_dni: {e}")
-            
-            # También verificar índices únicos
-            try:
-                cursor.execute("DROP INDEX IF EXISTS tutores_dni_key;")
-                print("  ✓ Eliminado índice tutores_dni_key")
-            except Exception as e:
-                print(f"  - No se pudo eliminar índice: {e}")
-            
-            conn.commit()
-            print("✅ Constraint eliminado en PostgreSQL")
-            
-        else:
-            print("🔧 Recreando tabla tutores en SQLite sin UNIQUE constraint...")
-            # En SQLite, necesitamos recrear la tabla
-            cursor.execute("PRAGMA foreign_keys=off;")
-            
-            # Crear tabla temporal sin el constraint
-            cursor.execute("""
-                CREATE TABLE tutores_new (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre_apellido TEXT NOT NULL,
-                    dni TEXT NOT NULL,
-                    direccion TEXT,
-                    barrio TEXT,
-                    telefono TEXT
-                );
-            """)
-            
-            # Copiar datos
-            cursor.execute("""
-                INSERT INTO tutores_new (id, nombre_apellido, dni, direccion, barrio, telefono)
-                SELECT id, nombre_apellido, dni, direccion, barrio, telefono FROM tutores;
-            """)
-            
-            # Eliminar tabla vieja y renombrar
-            cursor.execute("DROP TABLE tutores;")
-            cursor.execute("ALTER TABLE tutores_new RENAME TO tutores;")
-            
-            cursor.execute("PRAGMA foreign_keys=on;")
-            conn.commit()
-            print("✅ Tabla recreada en SQLite sin constraint UNIQUE")
-            
-        print("✅ Base de datos corregida exitosamente")
-        
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+    print("⚠️ fix_database.py ya no es necesario: el cambio es una migración versionada.")
+    print("   Para aplicar las migraciones pendientes ejecutar: python migrar.py")
 
 if __name__ == '__main__':
     fix_database()
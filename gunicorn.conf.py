@@ -0,0 +1,47 @@
+"""
+Configuración de gunicorn para MARI/MATECA
+
+gunicorn la lee sola al ejecutar `gunicorn app:app` desde este directorio
+(start.sh). Cada worker es un proceso con varios hilos (gthread): una
+exportación lenta ocupa un hilo y los demás siguen atendiendo.
+
+Con preload_app la aplicación se importa una sola vez en el proceso
+maestro (migraciones ya aplicadas por migrar.py, módulos compartidos por
+copy-on-write) y los workers se crean con fork. Database es segura entre
+hilos: pool de conexiones PostgreSQL con lock, una conexión SQLite por
+hilo y caché con lock. En PostgreSQL conviene DB_POOL_MAX >= GUNICORN_THREADS;
+el total de conexiones es como mucho workers × DB_POOL_MAX.
+
+Por defecto hay un solo worker y se escala con hilos: la caché (cache.py) es
+de cada proceso y una escritura solo limpia la del worker que la atendió, así
+que con varios workers el dashboard y las estadísticas de los demás pueden
+quedar atrasados hasta CACHE_TTL segundos. GUNICORN_WORKERS > 1 solo conviene
+con CACHE_TTL=0 o si ese atraso es aceptable. Se usa una variable propia y no
+WEB_CONCURRENCY porque algunas plataformas la definen solas.
+
+Variables de entorno: GUNICORN_WORKERS, GUNICORN_THREADS, GUNICORN_TIMEOUT, PORT.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'gthread'
+# Un proceso: la caché y su invalidación se comparten entre todos los hilos
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = True
+
+# Las exportaciones grandes superan los 30 s por defecto
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers de a poco acota el crecimiento de memoria
+max_requests = 1000
+max_requests_jitter = 100
+
+
+def when_ready(server):
+    """Cierra las conexiones que abrió el maestro al importar la app, antes de crear los workers"""
+    # Una conexión heredada por fork comparte el socket con el maestro y los demás workers
+    from app import db
+    db.pool.cerrar()
@@ -0,0 +1,296 @@
+"""
+Importación masiva de atenciones (JSON Lines, JSON, CSV o el XLSX/CSV que
+genera la exportación)
+
+Las filas se validan y se insertan por lotes: las versiones de tutor se
+resuelven con unas pocas consultas por lote (tutores.obtener_tutores), las
+atenciones con un único execute_values/executemany y el resumen diario y
+el índice de búsqueda con una sola sentencia por lote, todo en una
+transacción por lote. Si un lote falla se reintenta fila por fila para
+informar el error exacto de cada una.
+
+Cada fila se identifica por su posición (offset, desde 0). El resultado
+incluye `siguiente_offset`: reenviar el mismo archivo con `desde` igual a
+ese valor retoma la carga; como los números ya existentes se informan como
+error y no se vuelven a insertar, repetir una carga es idempotente.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from barrios import canonizar_barrio
+from busqueda_rapida import indexar_atenciones
+from estadisticas import ajustar_rollup_lote
+from numeracion import consumir
+from tutores import obtener_tutores
+
+CAMPOS_TUTOR = ('nombre_apellido', 'dni', 'direccion', 'barrio', 'telefono')
+CAMPOS_ATENCION = ('numero', 'fecha', 'tipo_atencion', 'nombre_animal', 'especie', 'sexo', 'edad',
+                   'motivo', 'diagnostico', 'tratamiento', 'derivacion', 'observaciones')
+CAMPOS = CAMPOS_ATENCION + CAMPOS_TUTOR
+REQUERIDOS = ('numero', 'fecha', 'nombre_animal', 'especie', 'sexo', 'nombre_apellido', 'dni')
+TIPOS_ATENCION = ('castracion', 'atencion_primaria')
+
+# Encabezados de la exportación (exportacion.COLUMNAS) -> campo
+ENCABEZADOS = {
+    'Número': 'numero',
+    'Fecha': 'fecha',
+    'Tipo de Atención': 'tipo_atencion',
+    'Nombre Animal': 'nombre_animal',
+    'Especie': 'especie',
+    'Sexo': 'sexo',
+    'Edad': 'edad',
+    'Tutor': 'nombre_apellido',
+    'DNI': 'dni',
+    'Teléfono': 'telefono',
+    'Dirección': 'direccion',
+    'Barrio': 'barrio',
+    'Motivo': 'motivo',
+    'Diagnóstico': 'diagnostico',
+    'Tratamiento': 'tratamiento',
+    'Derivación': 'derivacion',
+    'Observaciones': 'observaciones',
+}
+
+FORMATOS = ('jsonl', 'json', 'csv', 'xlsx')
+EXTENSIONES = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'json', '.csv': 'csv', '.xlsx': 'xlsx'}
+MIMETYPES = {
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/json': 'json',
+    'text/csv': 'csv',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+}
+
+TAMANIO_LOTE = 500
+MAXIMO_ERRORES = 1000  # errores detallados en la respuesta (el total siempre se informa)
+
+
+def detectar_formato(nombre=None, mimetype=None):
+    """Formato según la extensión del archivo o el Content-Type"""
+    if nombre:
+        for extension, formato in EXTENSIONES.items():
+            if nombre.lower().endswith(extension):
+                return formato
+    return MIMETYPES.get(mimetype)
+
+
+def leer_filas(archivo, formato):
+    """Genera un diccionario por fila de un archivo binario"""
+    if formato == 'xlsx':
+        yield from _leer_xlsx(archivo)
+        return
+
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    if formato == 'jsonl':
+        for linea in texto:
+            if not linea.strip():
+                continue
+            try:
+                yield json.loads(linea)
+            except ValueError as e:
+                yield {'_error': f'JSON inválido: {e}'}
+    elif formato == 'json':
+        datos = json.load(texto)
+        yield from (datos if isinstance(datos, list) else [datos])
+    elif formato == 'csv':
+        lector = csv.reader(texto)
+        campos = _campos_desde_encabezado(next(lector, []))
+        for valores in lector:
+            if any(valores):
+                yield dict(zip(campos, valores))
+    else:
+        raise ValueError(f'Formato no soportado: {formato}')
+
+
+def _leer_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    if not archivo.seekable():
+        archivo = io.BytesIO(archivo.read())
+    workbook = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = workbook.active.iter_rows(values_only=True)
+        campos = _campos_desde_encabezado(next(filas, ()))
+        for valores in filas:
+            if any(v not in (None, '') for v in valores):
+                yield dict(zip(campos, valores))
+    finally:
+        workbook.close()
+
+
+def _campos_desde_encabezado(encabezado):
+    # Acepta los encabezados de la exportación o directamente los nombres de campo
+    return [ENCABEZADOS.get(str(e).strip(), str(e).strip()) if e is not None else None
+            for e in encabezado]
+
+
+def _entero(valor):
+    """'12', 12 o 12.0 (Excel guarda los números como float) -> 12; None si no es un entero"""
+    if isinstance(valor, bool):
+        return None  # True/False son int para Python, no números de atención
+    if isinstance(valor, (int, str)):
+        try:
+            return int(valor)
+        except ValueError:
+            pass
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return int(numero) if numero.is_integer() else None  # descarta 12.5, inf y nan
+
+
+def validar(fila):
+    """Devuelve (diccionario con todos los campos, None) o (None, mensaje de error)"""
+    if not isinstance(fila, dict):
+        return None, 'La fila debe ser un objeto'
+    if fila.get('_error'):
+        return None, fila['_error']
+
+    for campo in REQUERIDOS:
+        if fila.get(campo) in (None, ''):
+            return None, f'El campo {campo} es requerido'
+
+    datos = {campo: '' if fila.get(campo) is None else str(fila[campo]).strip() for campo in CAMPOS}
+    datos['tipo_atencion'] = datos['tipo_atencion'] or 'castracion'
+    if datos['tipo_atencion'] not in TIPOS_ATENCION:
+        return None, f"Tipo de atención inválido: {datos['tipo_atencion']}"
+
+    datos['numero'] = _entero(fila['numero'])
+    if datos['numero'] is None:
+        return None, f"Número inválido: {fila['numero']}"
+
+    fecha = fila['fecha']
+    if isinstance(fecha, (date, datetime)):
+        datos['fecha'] = fecha.strftime('%Y-%m-%d')
+    else:
+        try:
+            datos['fecha'] = date.fromisoformat(str(fecha).strip()[:10]).isoformat()
+        except ValueError:
+            return None, f'Fecha inválida: {fecha}'
+    return datos, None
+
+
+def importar(db, filas, desde=0, limite=None, tamanio_lote=TAMANIO_LOTE, progreso=None):
+    """Importa las filas desde el offset `desde` (como mucho `limite` filas)"""
+    resultado = {
+        'insertadas': 0,
+        'errores': [],
+        'total_errores': 0,
+        'procesadas': 0,
+        'siguiente_offset': desde,
+        'completo': True,
+    }
+    barrios = {}  # barrio -> barrio_norm, para no repetir consultas en cada lote
+
+    with db.conexion() as conn:
+        cursor = conn.cursor()
+        lote = []
+        for offset, fila in enumerate(filas):
+            if offset < desde:
+                continue
+            if limite is not None and offset >= desde + limite:
+                resultado['completo'] = False
+                break
+            lote.append((offset, fila))
+            if len(lote) >= tamanio_lote:
+                _procesar_lote(db, conn, cursor, lote, barrios, resultado)
+                lote = []
+                if progreso:
+                    progreso(resultado)
+        if lote:
+            _procesar_lote(db, conn, cursor, lote, barrios, resultado)
+            if progreso:
+                progreso(resultado)
+    resultado['errores'].sort(key=lambda error: error['fila'])
+    return resultado
+
+
+def _registrar_error(resultado, offset, numero, mensaje):
+    resultado['total_errores'] += 1
+    if len(resultado['errores']) < MAXIMO_ERRORES:
+        resultado['errores'].append({'fila': offset, 'numero': numero, 'error': mensaje})
+
+
+def _procesar_lote(db, conn, cursor, lote, barrios, resultado):
+    ph = db.get_placeholder()
+    validas = []
+    vistos = set()
+    for offset, fila in lote:
+        datos, error = validar(fila)
+        if error:
+            numero = fila.get('numero') if isinstance(fila, dict) else None
+            _registrar_error(resultado, offset, numero, error)
+        elif datos['numero'] in vistos:
+            _registrar_error(resultado, offset, datos['numero'], 'Número repetido en el archivo')
+        else:
+            vistos.add(datos['numero'])
+            validas.append((offset, datos))
+
+    if validas:
+        marcas = ', '.join([ph] * len(validas))
+        cursor.execute(f'SELECT numero FROM atenciones WHERE numero IN ({marcas})',
+                       [datos['numero'] for _, datos in validas])
+        existentes = {fila[0] for fila in cursor.fetchall()}
+        for offset, datos in validas:
+            if datos['numero'] in existentes:
+                _registrar_error(resultado, offset, datos['numero'],
+                                 f"El número {datos['numero']} ya existe en el sistema")
+        validas = [(offset, datos) for offset, datos in validas if datos['numero'] not in existentes]
+
+    try:
+        _insertar(db, cursor, [datos for _, datos in validas], barrios)
+        conn.commit()
+        resultado['insertadas'] += len(validas)
+    except Exception:
+        conn.rollback()
+        barrios.clear()
+        # Reintento fila por fila para aislar el error
+        for offset, datos in validas:
+            try:
+                _insertar(db, cursor, [datos], barrios)
+                conn.commit()
+                resultado['insertadas'] += 1
+            except Exception as e:
+                conn.rollback()
+                barrios.clear()
+                _registrar_error(resultado, offset, datos['numero'], f'Error al registrar: {e}')
+
+    resultado['procesadas'] += len(lote)
+    resultado['siguiente_offset'] = lote[-1][0] + 1
+
+
+def _insertar(db, cursor, filas, barrios):
+    """Inserta tutores y atenciones de un lote (sin commit)"""
+    if not filas:
+        return
+    ph = db.get_placeholder()
+
+    for datos in filas:
+        barrio = datos['barrio']
+        if barrio not in barrios:
+            barrios[barrio] = canonizar_barrio(cursor, ph, barrio)
+
+    # Versiones de tutor: se reutilizan las existentes con los mismos datos
+    tutor_ids = obtener_tutores(cursor, db.db_type, ph, [
+        dict({c: datos[c] for c in CAMPOS_TUTOR}, barrio_norm=barrios[datos['barrio']])
+        for datos in filas
+    ])
+
+    atenciones = [tuple(datos[c] for c in CAMPOS_ATENCION) + (tutor_id,)
+                  for datos, tutor_id in zip(filas, tutor_ids)]
+    columnas_atencion = ', '.join(CAMPOS_ATENCION + ('tutor_id',))
+    if db.db_type == 'postgresql':
+        from psycopg2.extras import execute_values
+        execute_values(cursor, f'INSERT INTO atenciones ({columnas_atencion}) VALUES %s',
+                       atenciones, page_size=len(atenciones))
+    else:
+        marcas = ', '.join([ph] * len(atenciones[0]))
+        cursor.executemany(f'INSERT INTO atenciones ({columnas_atencion}) VALUES ({marcas})', atenciones)
+
+    numeros = [datos['numero'] for datos in filas]
+    ajustar_rollup_lote(cursor, ph, numeros, +1)
+    indexar_atenciones(cursor, ph, numeros)
+    consumir(cursor, db.db_type, ph, numeros)
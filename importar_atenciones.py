@@ -0,0 +1,58 @@
+"""
+Script para cargar atenciones en forma masiva desde un archivo JSON Lines,
+JSON, CSV o XLSX (el mismo formato que genera la exportación a Excel).
+
+Uso:
+    python importar_atenciones.py atenciones.xlsx
+    python importar_atenciones.py atenciones.jsonl --desde 12000
+
+Si la carga se interrumpe, volver a ejecutarla con --desde igual al último
+"siguiente offset" informado: las filas ya cargadas no se duplican.
+"""
+import argparse
+import os
+
+from database import Database
+from importacion import FORMATOS, TAMANIO_LOTE, detectar_formato, leer_filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga masiva de atenciones')
+    parser.add_argument('archivo')
+    parser.add_argument('--formato', choices=FORMATOS, help='por defecto, según la extensión')
+    parser.add_argument('--desde', type=int, default=0, help='offset de la primera fila a cargar')
+    parser.add_argument('--limite', type=int, help='cantidad máxima de filas a procesar')
+    parser.add_argument('--lote', type=int, default=TAMANIO_LOTE, help='filas por transacción')
+    args = parser.parse_args()
+
+    formato = args.formato or detectar_formato(args.archivo)
+    if not formato:
+        print("❌ No se pudo detectar el formato; usar --formato")
+        raise SystemExit(2)
+
+    database_url = os.environ.get('DATABASE_URL')
+    db = Database(db_url=database_url) if database_url else Database(db_url='sqlite:///mari.db')
+
+    def progreso(resultado):
+        print(f"  📥 {resultado['insertadas']} insertadas, {resultado['total_errores']} errores "
+              f"(siguiente offset: {resultado['siguiente_offset']})")
+
+    print(f"📂 Importando {args.archivo} ({formato}) desde la fila {args.desde}...")
+    with open(args.archivo, 'rb') as archivo:
+        resultado = db.importar_atenciones(leer_filas(archivo, formato), desde=args.desde,
+                                           limite=args.limite, tamanio_lote=args.lote,
+                                           progreso=progreso)
+
+    for error in resultado['errores']:
+        print(f"  ❌ Fila {error['fila']} (#{error['numero']}): {error['error']}")
+    if resultado['total_errores'] > len(resultado['errores']):
+        print(f"  ... y {resultado['total_errores'] - len(resultado['errores'])} errores más")
+
+    print(f"\n✅ Insertadas: {resultado['insertadas']}")
+    print(f"❌ Errores: {resultado['total_errores']}")
+    print(f"➡️  Siguiente offset: {resultado['siguiente_offset']}"
+          f"{'' if resultado['completo'] else ' (quedan filas por cargar)'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""
+Migraciones versionadas del esquema
+
+Cada migración se aplica una sola vez, en su propia transacción, y queda
+registrada en schema_version. Al iniciar, cada worker solo lee la versión
+(una consulta); si la base está al día no ejecuta ningún DDL. Las
+pendientes las aplica `python migrar.py` antes de levantar gunicorn (o el
+primer proceso que encuentre la base atrasada, por ejemplo en desarrollo).
+
+Para que dos procesos no apliquen la misma migración a la vez, cada una
+toma un bloqueo antes de volver a leer la versión:
+- PostgreSQL: pg_advisory_xact_lock (se libera con el commit).
+- SQLite: BEGIN IMMEDIATE (bloqueo de escritura de la base).
+
+Para cambiar el esquema se agrega una función al final de MIGRACIONES;
+nunca se edita una migración ya publicada. Las migraciones trabajan con
+sentencias por conjunto (INSERT ... SELECT, UPDATE ... WHERE), no fila por fila.
+"""
+import time
+
+import agenda
+import auditoria
+import busqueda_rapida
+import numeracion
+import tutores
+from barrios import completar_barrios, crear_tablas_barrios
+from busqueda import crear_indices_busqueda
+from estadisticas import crear_tabla_rollup, reconstruir_rollup
+
+# Clave del bloqueo consultivo de PostgreSQL (cualquier entero fijo)
+BLOQUEO = 20250101
+
+# Columnas de tutores en el esquema original
+COLUMNAS_TUTORES = ('id', 'nombre_apellido', 'dni', 'direccion', 'barrio', 'telefono')
+
+
+def _dni_sin_unique(cursor, db):
+    """Bases anteriores: varios tutores pueden compartir DNI (antes fix_database.py)"""
+    if db.db_type == 'postgresql':
+        for restriccion in ('tutores_dni_key', 'tutores_dni_key1', 'unique_dni'):
+            cursor.execute(f'ALTER TABLE IF EXISTS tutores DROP CONSTRAINT IF EXISTS {restriccion}')
+        cursor.execute('DROP INDEX IF EXISTS tutores_dni_key')
+        return
+
+    if not _indices_unicos_dni(cursor):
+        return
+    # SQLite no puede quitar una restricción: se recrea la tabla (como hacía fix_database.py).
+    # Las columnas que no son del esquema base se agregan con su tipo y valor por defecto.
+    cursor.execute("PRAGMA table_info('tutores')")
+    columnas = [(fila[1], fila[2], fila[4]) for fila in cursor.fetchall()]
+    # Índices de la tabla (idx_tutores_dni): se borran con ella y se recrean
+    cursor.execute("SELECT sql FROM sqlite_master WHERE tbl_name = 'tutores' "
+                   "AND type IN ('index', 'trigger') AND sql IS NOT NULL")
+    dependientes = [fila[0] for fila in cursor.fetchall()]
+    cursor.execute('''
+        CREATE TABLE tutores_nueva (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_apellido TEXT NOT NULL,
+            dni TEXT NOT NULL,
+            direccion TEXT,
+            barrio TEXT,
+            telefono TEXT
+        )
+    ''')
+    for nombre, tipo, defecto in columnas:
+        if nombre not in COLUMNAS_TUTORES:
+            cursor.execute(f'ALTER TABLE tutores_nueva ADD COLUMN "{nombre}" {tipo}'
+                           + (f' DEFAULT {defecto}' if defecto is not None else ''))
+    lista = ', '.join(f'"{nombre}"' for nombre, _, _ in columnas)
+    cursor.execute(f'INSERT INTO tutores_nueva ({lista}) SELECT {lista} FROM tutores')
+    cursor.execute('DROP TABLE tutores')
+    cursor.execute('ALTER TABLE tutores_nueva RENAME TO tutores')
+    for sql in dependientes:
+        cursor.execute(sql)
+
+
+def _indices_unicos_dni(cursor):
+    """SQLite: índices únicos de tutores que son solo sobre dni (UNIQUE de columna o de tabla)"""
+    cursor.execute("PRAGMA index_list('tutores')")
+    unicos = [(fila[1], fila[3]) for fila in cursor.fetchall() if fila[2]]  # (nombre, origen)
+    encontrados = []
+    for nombre, origen in unicos:
+        cursor.execute(f"PRAGMA index_info('{nombre}')")
+        if [fila[2] for fila in cursor.fetchall()] != ['dni']:
+            continue
+        if origen == 'c':
+            cursor.execute(f'DROP INDEX "{nombre}"')  # CREATE UNIQUE INDEX: basta con borrarlo
+        else:
+            encontrados.append(nombre)  # sqlite_autoindex_tutores_N: parte de la definición
+    return encontrados
+
+
+def _tablas_base(cursor, db):
+    """Tutores, atenciones, turnos y barrios del mapa, con sus índices"""
+    pk = db.get_autoincrement()
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS tutores (
+            id {pk},
+            nombre_apellido TEXT NOT NULL,
+            dni TEXT NOT NULL,
+            direccion TEXT,
+            barrio TEXT,
+            telefono TEXT
+        )
+    ''')
+
+    # Tabla de atenciones (unifica castraciones y atención primaria)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS atenciones (
+            id {pk},
+            numero INTEGER UNIQUE NOT NULL,
+            fecha DATE NOT NULL,
+            tipo_atencion TEXT NOT NULL,
+            nombre_animal TEXT NOT NULL,
+            especie TEXT NOT NULL,
+            sexo TEXT NOT NULL,
+            edad TEXT,
+            tutor_id INTEGER NOT NULL,
+            motivo TEXT,
+            diagnostico TEXT,
+            tratamiento TEXT,
+            derivacion TEXT,
+            estado TEXT DEFAULT 'completado',
+            observaciones TEXT,
+            FOREIGN KEY (tutor_id) REFERENCES tutores(id)
+        )
+    ''')
+
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS turnos (
+            id {pk},
+            fecha DATE NOT NULL,
+            hora TEXT NOT NULL,
+            nombre_animal TEXT NOT NULL,
+            tutor_nombre TEXT NOT NULL,
+            telefono TEXT,
+            tipo TEXT NOT NULL,
+            estado TEXT DEFAULT 'pendiente',
+            observaciones TEXT
+        )
+    ''')
+
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS barrios_mapa (
+            id {pk},
+            nombre TEXT NOT NULL,
+            latitud REAL NOT NULL,
+            longitud REAL NOT NULL,
+            color TEXT DEFAULT '#3498db',
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Compuestos: (fecha, numero) da "últimas atenciones" sin ordenar, (tipo_atencion, fecha)
+    # resuelve tipo + rango de fechas, (tipo_atencion, numero) da las páginas de un tipo ya
+    # ordenadas, (fecha, hora) da los turnos del día ya ordenados
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_atenciones_fecha_numero ON atenciones(fecha, numero)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_atenciones_tipo_fecha ON atenciones(tipo_atencion, fecha)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_atenciones_tipo_numero ON atenciones(tipo_atencion, numero)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_atenciones_numero ON atenciones(numero)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tutores_dni ON tutores(dni)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_turnos_fecha_hora ON turnos(fecha, hora)')
+    # Reemplazados por los compuestos (tienen las mismas columnas iniciales)
+    for indice in ('idx_atenciones_fecha', 'idx_atenciones_tipo', 'idx_turnos_fecha'):
+        cursor.execute(f'DROP INDEX IF EXISTS {indice}')
+
+
+def _auditoria(cursor, db):
+    """Tabla de auditoría (particionada por mes en PostgreSQL) y sus índices"""
+    auditoria.crear_tabla_auditoria(cursor, db.db_type, db.get_autoincrement())
+    auditoria.crear_indices_auditoria(cursor)
+
+
+def _indices_busqueda(cursor, db):
+    """Índices de trigramas para los filtros LIKE '%...%' de la búsqueda"""
+    crear_indices_busqueda(cursor, db.db_type)
+
+
+def _resumen_diario(cursor, db):
+    """Resumen diario para estadísticas"""
+    crear_tabla_rollup(cursor)
+    cursor.execute('SELECT 1 FROM estadisticas_diarias LIMIT 1')
+    if cursor.fetchone() is None:
+        reconstruir_rollup(cursor)
+
+
+def _barrios_canonicos(cursor, db):
+    """Barrios canónicos (completa barrio_norm de los tutores anteriores)"""
+    crear_tablas_barrios(cursor, db.db_type)
+    completar_barrios(cursor, db.get_placeholder())
+
+
+def _identidades_tutores(cursor, db):
+    """Identidades de tutores por DNI (las versiones repetidas se unen con compactar_tutores.py)"""
+    tutores.crear_tablas_tutores(cursor, db.db_type, db.get_autoincrement())
+    tutores.asignar_identidades(cursor)
+
+
+def _numeracion(cursor, db):
+    """Contador de números de atención y reservas de los formularios"""
+    numeracion.crear_tablas_numeracion(cursor, db.db_type)
+
+
+def _busqueda_rapida(cursor, db):
+    """Índice de la búsqueda rápida"""
+    busqueda_rapida.crear_tabla_indice(cursor, db.db_type)
+    cursor.execute('SELECT 1 FROM busqueda_indice LIMIT 1')
+    if cursor.fetchone() is None:
+        busqueda_rapida.reconstruir_indice(cursor.connection, db.get_placeholder())
+
+
+def _cupos_turnos(cursor, db):
+    """Cupos de turnos por tipo, día y hora (agenda.py)"""
+    agenda.crear_tabla_cupos(cursor, db.get_placeholder())
+
+
+def _orden_turnos(cursor, db):
+    """Índice (fecha, hora, id) para paginar turnos por clave"""
+    # En SQLite el índice (fecha, hora) ya termina en el rowid (= id)
+    if db.db_type == 'postgresql':
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_turnos_fecha_hora_id ON turnos(fecha, hora, id)')
+        cursor.execute('DROP INDEX IF EXISTS idx_turnos_fecha_hora')
+
+
+# (versión, función). La descripción registrada es la primera línea del docstring.
+MIGRACIONES = [
+    (1, _dni_sin_unique),
+    (2, _tablas_base),
+    (3, _auditoria),
+    (4, _indices_busqueda),
+    (5, _resumen_diario),
+    (6, _barrios_canonicos),
+    (7, _identidades_tutores),
+    (8, _numeracion),
+    (9, _busqueda_rapida),
+    (10, _cupos_turnos),
+    (11, _orden_turnos),
+]
+
+ULTIMA_VERSION = MIGRACIONES[-1][0]
+
+
+def version_actual(conn):
+    """Versión aplicada del esquema (0 si la base es nueva)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+    except Exception:
+        conn.rollback()
+        return 0
+    return cursor.fetchone()[0] or 0
+
+
+def _crear_tabla_version(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            segundos REAL
+        )
+    ''')
+    conn.commit()
+
+
+def _bloquear(cursor, db_type):
+    if db_type == 'postgresql':
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', (BLOQUEO,))
+    else:
+        cursor.execute('BEGIN IMMEDIATE')
+
+
+def _claves_foraneas(conn, activar):
+    """SQLite: activa o desactiva foreign_keys; devuelve el valor anterior"""
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA foreign_keys')
+    anterior = bool(cursor.fetchone()[0])
+    # Fuera de una transacción (dentro, SQLite ignora el cambio)
+    cursor.execute(f"PRAGMA foreign_keys = {'ON' if activar else 'OFF'}")
+    return anterior
+
+
+def migrar(conn, db, progreso=None):
+    """Aplica las migraciones pendientes; devuelve las versiones aplicadas por este proceso"""
+    _crear_tabla_version(conn)
+    if db.db_type == 'sqlite':
+        # Recrear una tabla referenciada (DROP + RENAME) fallaría con las claves foráneas activas
+        claves_foraneas = _claves_foraneas(conn, False)
+        try:
+            return _aplicar(conn, db, progreso)
+        finally:
+            _claves_foraneas(conn, claves_foraneas)
+    return _aplicar(conn, db, progreso)
+
+
+def _aplicar(conn, db, progreso):
+    ph = db.get_placeholder()
+    aplicadas = []
+    for version, funcion in MIGRACIONES:
+        cursor = conn.cursor()
+        _bloquear(cursor, db.db_type)
+        cursor.execute(f'SELECT 1 FROM schema_version WHERE version = {ph}', (version,))
+        if cursor.fetchone():
+            conn.rollback()  # ya aplicada (quizás por otro proceso mientras esperábamos)
+            continue
+
+        descripcion = funcion.__doc__.strip().splitlines()[0]
+        if progreso:
+            progreso(version, descripcion)
+        inicio = time.perf_counter()
+        try:
+            funcion(cursor, db)
+            cursor.execute(f'INSERT INTO schema_version (version, descripcion, segundos) VALUES ({ph}, {ph}, {ph})',
+                           (version, descripcion, round(time.perf_counter() - inicio, 3)))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        aplicadas.append(version)
+    return aplicadas
+
+
+def historial(conn):
+    """[(versión, descripción, aplicada, segundos)] de las migraciones aplicadas"""
+    if not version_actual(conn):
+        return []
+    cursor = conn.cursor()
+    cursor.execute('SELECT version, descripcion, aplicada, segundos FROM schema_version ORDER BY version')
+    return cursor.fetchall()
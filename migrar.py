@@ -0,0 +1,45 @@
+"""
+Script que aplica las migraciones pendientes del esquema (migraciones.py).
+
+Uso:
+    python migrar.py            # aplica las pendientes
+    python migrar.py --estado   # además lista las migraciones aplicadas
+
+start.sh lo ejecuta una vez por deploy, antes de gunicorn: los workers
+encuentran la base al día y al iniciar solo leen la versión.
+"""
+import argparse
+import os
+
+import auditoria
+import migraciones
+from database import Database
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migraciones del esquema')
+    parser.add_argument('--estado', action='store_true', help='listar las migraciones aplicadas')
+    args = parser.parse_args()
+
+    def progreso(version, descripcion):
+        print(f"  🔧 {version}: {descripcion}")
+
+    print("🔧 Verificando el esquema...")
+    database_url = os.environ.get('DATABASE_URL')
+    # Database aplica las pendientes al iniciar; acá además se informa el avance
+    db = Database(db_url=database_url or 'sqlite:///mari.db', progreso_migracion=progreso)
+
+    with db.conexion() as conn:
+        if db.db_type == 'postgresql':
+            # Particiones de auditoría del mes en curso y los siguientes
+            auditoria.asegurar_particiones(conn.cursor())
+            conn.commit()
+        if args.estado:
+            for version, descripcion, aplicada, segundos in migraciones.historial(conn):
+                print(f"  ✅ {version}: {descripcion} ({aplicada}, {segundos or 0:.2f} s)")
+
+    print(f"✅ Esquema en la versión {migraciones.ULTIMA_VERSION}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""
+Normalización de texto (tildes, mayúsculas, espacios) compartida por la
+búsqueda rápida y la agrupación de barrios
+"""
+import re
+import unicodedata
+
+
+def quitar_tildes(texto):
+    """Quita tildes y diacríticos (á -> a, ñ -> n, ü -> u)"""
+    return ''.join(c for c in unicodedata.normalize('NFD', texto)
+                   if unicodedata.category(c) != 'Mn')
+
+
+def normalizar_texto(texto):
+    """Sin tildes, en minúsculas y con los espacios colapsados"""
+    if not texto:
+        return ""
+    return re.sub(r'\s+', ' ', quitar_tildes(texto).lower().strip())
+
+
+def normalizar_barrio(nombre):
+    """Nombre de barrio normalizado para agrupar variantes ("B° Centro" = "centro")"""
+    nombre = normalizar_texto(nombre)
+    # Remover palabras comunes
+    return re.sub(r'\b(barrio|sum|b°|bº)\b', '', nombre).strip()
@@ -0,0 +1,132 @@
+"""
+Numeración de atenciones (atenciones.numero)
+
+El próximo número sale de un contador atómico en lugar de MAX(numero):
+- PostgreSQL: la secuencia atenciones_numero_seq. nextval no repite entre
+  transacciones concurrentes, pero comparar y llamar a setval sí podría
+  intercalarse con un nextval y hacerla retroceder: las dos operaciones
+  toman el bloqueo consultivo BLOQUEO hasta el commit.
+- SQLite: la tabla numeracion, incrementada con un UPDATE que toma el
+  bloqueo de escritura, así dos pedidos simultáneos no leen el mismo valor.
+
+El formulario reserva su número (reservar): queda en numeros_reservados
+hasta que se registra la atención (que consume la reserva en la misma
+transacción) o hasta que vence. Un número con la reserva vencida se vuelve
+a entregar antes de pedir uno nuevo al contador, así no quedan huecos por
+formularios abandonados.
+
+Los números cargados a mano o por importación adelantan el contador
+(avanzar), y al iniciar se sincroniza con MAX(numero), que con el índice
+único es una sola lectura.
+"""
+from datetime import datetime, timedelta
+
+SECUENCIA = 'atenciones_numero_seq'
+CONTADOR = 'atenciones'
+MINUTOS_RESERVA = 30
+# Clave del bloqueo consultivo del contador en PostgreSQL (cualquier entero fijo)
+BLOQUEO = 20250116
+
+
+def crear_tablas_numeracion(cursor, db_type):
+    """Crea el contador (secuencia o tabla) y la tabla de reservas, y los sincroniza"""
+    if db_type == 'postgresql':
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {SECUENCIA}')
+    else:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS numeracion (
+                nombre TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('INSERT INTO numeracion (nombre, valor) VALUES (?, 0) ON CONFLICT (nombre) DO NOTHING',
+                       (CONTADOR,))
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS numeros_reservados (
+            numero INTEGER PRIMARY KEY,
+            usuario TEXT,
+            vence TIMESTAMP NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_numeros_reservados_vence ON numeros_reservados(vence)')
+
+    cursor.execute('SELECT MAX(numero) FROM atenciones')
+    avanzar(cursor, db_type, cursor.fetchone()[0] or 0)
+
+
+def avanzar(cursor, db_type, numero):
+    """Lleva el contador al menos hasta `numero` (nunca lo hace retroceder)"""
+    if db_type == 'postgresql':
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', (BLOQUEO,))
+        cursor.execute(f'''
+            SELECT setval('{SECUENCIA}', %s)
+            WHERE %s > (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {SECUENCIA})
+        ''', (numero, numero))
+    else:
+        cursor.execute('UPDATE numeracion SET valor = ? WHERE nombre = ? AND valor < ?',
+                       (numero, CONTADOR, numero))
+
+
+def _siguiente(cursor, db_type):
+    if db_type == 'postgresql':
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', (BLOQUEO,))
+        cursor.execute(f"SELECT nextval('{SECUENCIA}')")
+        return cursor.fetchone()[0]
+    cursor.execute('UPDATE numeracion SET valor = valor + 1 WHERE nombre = ?', (CONTADOR,))
+    cursor.execute('SELECT valor FROM numeracion WHERE nombre = ?', (CONTADOR,))
+    return cursor.fetchone()[0]
+
+
+def proximo(cursor, db_type):
+    """Próximo número que entregaría el contador, sin consumirlo ni reservarlo"""
+    if db_type == 'postgresql':
+        cursor.execute(f'SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {SECUENCIA}')
+    else:
+        cursor.execute('SELECT valor FROM numeracion WHERE nombre = ?', (CONTADOR,))
+    return cursor.fetchone()[0] + 1
+
+
+def reservar(cursor, db_type, placeholder, usuario, minutos=MINUTOS_RESERVA):
+    """Reserva un número para un formulario; devuelve (numero, vence)"""
+    ahora = datetime.now().isoformat(sep=' ', timespec='seconds')
+    vence = (datetime.now() + timedelta(minutes=minutos)).isoformat(sep=' ', timespec='seconds')
+
+    # Primero se reutiliza una reserva vencida (su número nunca se registró)
+    if db_type == 'postgresql':
+        cursor.execute('''
+            UPDATE numeros_reservados SET usuario = %s, vence = %s
+            WHERE numero = (
+                SELECT numero FROM numeros_reservados
+                WHERE vence < %s
+                ORDER BY numero
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING numero
+        ''', (usuario, vence, ahora))
+        fila = cursor.fetchone()
+    else:
+        # En SQLite el primer UPDATE toma el bloqueo de escritura: nadie más elige la misma fila
+        cursor.execute('UPDATE numeracion SET valor = valor WHERE nombre = ?', (CONTADOR,))
+        cursor.execute('SELECT numero FROM numeros_reservados WHERE vence < ? ORDER BY numero LIMIT 1',
+                       (ahora,))
+        fila = cursor.fetchone()
+        if fila:
+            cursor.execute('UPDATE numeros_reservados SET usuario = ?, vence = ? WHERE numero = ?',
+                           (usuario, vence, fila[0]))
+    if fila:
+        return fila[0], vence
+
+    numero = _siguiente(cursor, db_type)
+    cursor.execute(f'INSERT INTO numeros_reservados (numero, usuario, vence) VALUES ({placeholder}, {placeholder}, {placeholder})',
+                   (numero, usuario, vence))
+    return numero, vence
+
+
+def consumir(cursor, db_type, placeholder, numeros):
+    """Al registrar atenciones: libera sus reservas y adelanta el contador"""
+    if not numeros:
+        return
+    marcas = ', '.join([placeholder] * len(numeros))
+    cursor.execute(f'DELETE FROM numeros_reservados WHERE numero IN ({marcas})', list(numeros))
+    avanzar(cursor, db_type, max(numeros))
@@ -0,0 +1,20 @@
+"""
+Script para reconstruir el resumen diario de estadísticas (estadisticas_diarias)
+desde la tabla atenciones. Usar después de cargas masivas o correcciones manuales.
+"""
+import os
+from database import Database
+
+def reconstruir_estadisticas():
+    database_url = os.environ.get('DATABASE_URL')
+    db = Database(db_url=database_url) if database_url else Database(db_url='sqlite:///mari.db')
+    
+    try:
+        print("🔧 Reconstruyendo resumen diario de estadísticas...")
+        filas = db.reconstruir_estadisticas()
+        print(f"✅ Resumen reconstruido: {filas} filas (fecha, tipo, especie, sexo, barrio)")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+if __name__ == '__main__':
+    reconstruir_estadisticas()
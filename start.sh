@@ -1,11 +1,9 @@
 #!/bin/bash
 # Script de inicio para Render
+set -e
 
-echo "🔧 Ejecutando migraciones de base de datos..."
-python fix_database.py
-
-echo "🔧 Separando tutores compartidos..."
-python separar_tutores.py
+echo "🔧 Aplicando migraciones pendientes..."
+python migrar.py
 
 echo "🚀 Iniciando aplicación..."
-gunicorn app:app
+gunicorn -c gunicorn.conf.py app:app
@@ -59,24 +59,53 @@ function establecerFechaActual() {
     document.getElementById('fecha').value = today;
 }
 
+// Número reservado para el formulario de alta: se pide al empezar a completarlo
+// y se reutiliza hasta registrar la atención o hasta que venza la reserva
+let reservaNumero = null;
+
+function reservaVigente() {
+    return reservaNumero && Date.now() < reservaNumero.vence;
+}
+
+function mostrarNumero(numero) {
+    const numeroInput = document.getElementById('numero');
+    numeroInput.value = numero;
+
+    // Prevenir edición manual solo si no se configuró antes
+    if (!numeroInput.dataset.configured) {
+        numeroInput.addEventListener('keydown', (e) => e.preventDefault());
+        numeroInput.addEventListener('paste', (e) => e.preventDefault());
+        numeroInput.dataset.configured = 'true';
+    }
+}
+
 async function cargarSiguienteNumero() {
     try {
+        if (reservaVigente()) {
+            mostrarNumero(reservaNumero.numero);
+            return;
+        }
+        // Solo consulta: el número se reserva cuando se empieza a completar el formulario
         const response = await fetch('/api/siguiente-numero');
         const data = await response.json();
-        const numeroInput = document.getElementById('numero');
-        numeroInput.value = data.numero;
-
-        // Prevenir edición manual solo si no se configuró antes
-        if (!numeroInput.dataset.configured) {
-            numeroInput.addEventListener('keydown', (e) => e.preventDefault());
-            numeroInput.addEventListener('paste', (e) => e.preventDefault());
-            numeroInput.dataset.configured = 'true';
-        }
+        mostrarNumero(data.numero);
     } catch (error) {
         console.error('Error al cargar siguiente número:', error);
     }
 }
 
+async function reservarNumero() {
+    if (reservaVigente()) return reservaNumero.numero;
+
+    const response = await fetch('/api/numeros/reservar', { method: 'POST' });
+    const data = await response.json();
+    if (!response.ok) throw new Error(data.message);
+    // Un minuto de margen para no enviar un número con la reserva recién vencida
+    reservaNumero = { numero: data.numero, vence: Date.now() + (data.minutos - 1) * 60000 };
+    if (!window.editandoNumero) mostrarNumero(data.numero);
+    return data.numero;
+}
+
 function incrementarNumero() {
     const numeroInput = document.getElementById('numero');
     const numeroActual = parseInt(numeroInput.value) || 0;
@@ -271,6 +300,12 @@ function formatearFechaCronograma(fecha) {
 
 // ===== FORMULARIO ATENCIÓN =====
 function setupFormHandlers() {
+    document.getElementById('form-atencion').addEventListener('input', () => {
+        if (!window.editandoNumero && !reservaVigente()) {
+            reservarNumero().catch(error => console.error('Error al reservar número:', error));
+        }
+    });
+
     document.getElementById('form-atencion').addEventListener('submit', async (e) => {
         e.preventDefault();
 
@@ -307,7 +342,8 @@ function setupFormHandlers() {
                     body: JSON.stringify(data)
                 });
             } else {
-                // Modo crear nuevo - usar POST
+                // Modo crear nuevo - usar POST con el número reservado
+                data.numero = await reservarNumero();
                 response = await fetch('/api/atenciones', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
@@ -334,6 +370,7 @@ function setupFormHandlers() {
                     cargarSiguienteNumero(); // Cargar siguiente número del servidor
                     cargarDashboard();
                 } else {
+                    reservaNumero = null; // La reserva se consumió al registrar
                     cargarSiguienteNumero(); // Cargar siguiente número del servidor
                 }
 
@@ -377,7 +414,7 @@ function setupFormHandlers() {
                     cerrarModalTurno();
                     cargarDashboard();
                 } else {
-                    mostrarNotificacion('Error al crear turno', 'error');
+                    mostrarNotificacion(result.message || 'Error al crear turno', 'error');
                 }
             })
             .catch(error => {
@@ -524,63 +561,95 @@ async function eliminarRegistro(numero) {
     }
 }
 
-async function buscarAtenciones() {
-    const filtros = {
-        numero: document.getElementById('search-numero').value,
-        tipo_atencion: document.getElementById('search-tipo').value,
-        especie: document.getElementById('search-especie').value,
-        dni: document.getElementById('search-dni').value,
-        barrio: document.getElementById('search-barrio').value,
-        fecha_desde: document.getElementById('search-fecha-desde').value,
-        fecha_hasta: document.getElementById('search-fecha-hasta').value
-    };
+// Estado de la paginación de búsqueda (cursor por número de registro)
+let busquedaParams = null;
+let busquedaCursor = null;
+
+function renderResultadoAtencion(r) {
+    return `
+        <div class="result-item">
+            <div class="result-header">
+                <span class="result-number">#${r.numero} - ${r.nombre_animal}</span>
+                <div>
+                    <span class="result-tipo ${r.tipo_atencion === 'castracion' ? 'tipo-castracion' : 'tipo-atencion-primaria'}">
+                        ${r.tipo_atencion === 'castracion' ? 'Castración' : 'Atención Primaria'}
+                    </span>
+                    <button class="btn-icon btn-edit" onclick="editarRegistro(${r.numero})" title="Editar" style="margin-left: 10px;">✎</button>
+                    <button class="btn-icon btn-delete" onclick="eliminarRegistro(${r.numero})" title="Eliminar">🗑</button>
+                </div>
+            </div>
+            <div class="result-details">
+                <strong>Fecha:</strong> ${formatearFecha(r.fecha)} | 
+                <strong>Especie:</strong> ${r.especie} ${r.sexo} | 
+                <strong>Edad:</strong> ${r.edad || 'No especificada'}
+                <br>
+                <strong>Tutor:</strong> ${r.tutor.nombre_apellido} (DNI: ${r.tutor.dni}) | 
+                <strong>Teléfono:</strong> ${r.tutor.telefono || 'No registrado'}
+                <br>
+                <strong>Dirección:</strong> ${r.tutor.direccion || 'No registrada'} | 
+                <strong>Barrio:</strong> ${r.tutor.barrio || 'No especificado'}
+                ${r.motivo ? `<br><strong>Motivo:</strong> ${r.motivo}` : ''}
+                ${r.diagnostico ? `<br><strong>Diagnóstico:</strong> ${r.diagnostico}` : ''}
+                ${r.tratamiento ? `<br><strong>Tratamiento:</strong> ${r.tratamiento}` : ''}
+                ${r.derivacion ? `<br><strong>Derivación:</strong> ${r.derivacion}` : ''}
+                ${r.observaciones ? `<br><strong>Observaciones:</strong> ${r.observaciones}` : ''}
+            </div>
+        </div>
+    `;
+}
 
-    const params = new URLSearchParams();
-    Object.entries(filtros).forEach(([key, value]) => {
-        if (value) params.append(key, value);
-    });
+async function buscarAtenciones(cargarMas = false) {
+    if (!cargarMas) {
+        const filtros = {
+            numero: document.getElementById('search-numero').value,
+            tipo_atencion: document.getElementById('search-tipo').value,
+            especie: document.getElementById('search-especie').value,
+            dni: document.getElementById('search-dni').value,
+            barrio: document.getElementById('search-barrio').value,
+            fecha_desde: document.getElementById('search-fecha-desde').value,
+            fecha_hasta: document.getElementById('search-fecha-hasta').value
+        };
+
+        busquedaParams = new URLSearchParams();
+        Object.entries(filtros).forEach(([key, value]) => {
+            if (value) busquedaParams.append(key, value);
+        });
+        busquedaCursor = null;
+    }
+
+    const params = new URLSearchParams(busquedaParams);
+    if (cargarMas && busquedaCursor) {
+        params.append('after_numero', busquedaCursor);
+    } else {
+        params.append('incluir_total', '1');
+    }
 
     try {
         const response = await fetch(`/api/atenciones?${params}`);
-        const resultados = await response.json();
+        const data = await response.json();
+        const resultados = data.atenciones;
 
         const container = document.getElementById('resultados-busqueda');
+        const botonMas = document.getElementById('btn-cargar-mas');
+        if (botonMas) botonMas.remove();
 
-        if (resultados.length === 0) {
+        if (!cargarMas && resultados.length === 0) {
             container.innerHTML = '<p style="text-align: center; color: #64748b; padding: 40px;">No se encontraron resultados</p>';
             return;
         }
 
-        container.innerHTML = resultados.map(r => `
-            <div class="result-item">
-                <div class="result-header">
-                    <span class="result-number">#${r.numero} - ${r.nombre_animal}</span>
-                    <div>
-                        <span class="result-tipo ${r.tipo_atencion === 'castracion' ? 'tipo-castracion' : 'tipo-atencion-primaria'}">
-                            ${r.tipo_atencion === 'castracion' ? 'Castración' : 'Atención Primaria'}
-                        </span>
-                        <button class="btn-icon btn-edit" onclick="editarRegistro(${r.numero})" title="Editar" style="margin-left: 10px;">✎</button>
-                        <button class="btn-icon btn-delete" onclick="eliminarRegistro(${r.numero})" title="Eliminar">🗑</button>
-                    </div>
-                </div>
-                <div class="result-details">
-                    <strong>Fecha:</strong> ${formatearFecha(r.fecha)} | 
-                    <strong>Especie:</strong> ${r.especie} ${r.sexo} | 
-                    <strong>Edad:</strong> ${r.edad || 'No especificada'}
-                    <br>
-                    <strong>Tutor:</strong> ${r.tutor.nombre_apellido} (DNI: ${r.tutor.dni}) | 
-                    <strong>Teléfono:</strong> ${r.tutor.telefono || 'No registrado'}
-                    <br>
-                    <strong>Dirección:</strong> ${r.tutor.direccion || 'No registrada'} | 
-                    <strong>Barrio:</strong> ${r.tutor.barrio || 'No especificado'}
-                    ${r.motivo ? `<br><strong>Motivo:</strong> ${r.motivo}` : ''}
-                    ${r.diagnostico ? `<br><strong>Diagnóstico:</strong> ${r.diagnostico}` : ''}
-                    ${r.tratamiento ? `<br><strong>Tratamiento:</strong> ${r.tratamiento}` : ''}
-                    ${r.derivacion ? `<br><strong>Derivación:</strong> ${r.derivacion}` : ''}
-                    ${r.observaciones ? `<br><strong>Observaciones:</strong> ${r.observaciones}` : ''}
-                </div>
-            </div>
-        `).join('');
+        const html = resultados.map(renderResultadoAtencion).join('');
+        if (cargarMas) {
+            container.insertAdjacentHTML('beforeend', html);
+        } else {
+            container.innerHTML = `<p style="color: #64748b; margin-bottom: 10px;">${data.total} resultado(s)</p>` + html;
+        }
+
+        busquedaCursor = data.next_cursor;
+        if (busquedaCursor) {
+            container.insertAdjacentHTML('beforeend',
+                '<button id="btn-cargar-mas" class="btn btn-secondary" onclick="buscarAtenciones(true)">Cargar más</button>');
+        }
 
     } catch (error) {
         mostrarNotificacion('Error en la búsqueda', 'error');
@@ -802,24 +871,35 @@ function mostrarNotificacion(mensaje, tipo = 'info') {
 }
 
 // ===== AUDITORÍA =====
-async function cargarAuditoria() {
+// datos_anteriores / datos_nuevos: objeto {campo: valor} o texto (entradas viejas)
+function formatearDatosAuditoria(datos) {
+    if (!datos || typeof datos !== 'object') return datos;
+    return Object.entries(datos)
+        .map(([campo, valor]) => `${campo}: ${valor === '' ? '(vacío)' : valor}`)
+        .join(' · ');
+}
+
+let auditoriaCursor = null;
+
+async function cargarAuditoria(cargarMas = false) {
+    const params = new URLSearchParams();
+    if (cargarMas && auditoriaCursor) params.append('after_id', auditoriaCursor);
+
     try {
-        const response = await fetch('/api/auditoria');
-        const logs = await response.json();
+        const response = await fetch(`/api/auditoria?${params}`);
+        const data = await response.json();
+        const logs = data.registros;
 
         const container = document.getElementById('tabla-auditoria');
+        const botonMas = document.getElementById('btn-auditoria-mas');
+        if (botonMas) botonMas.remove();
 
-        if (!logs || logs.length === 0) {
+        if (!cargarMas && (!logs || logs.length === 0)) {
             container.innerHTML = '<p class="info-text">No hay registros de auditoría.</p>';
             return;
         }
 
-        let html = '<table class="audit-table"><thead><tr>';
-        html += '<th>Fecha/Hora</th>';
-        html += '<th>Operación</th>';
-        html += '<th>Usuario</th>';
-        html += '<th>Detalles</th>';
-        html += '</tr></thead><tbody>';
+        let html = '';
 
         logs.forEach(log => {
             // Parsear fecha de forma robusta
@@ -852,16 +932,27 @@ async function cargarAuditoria() {
             html += `<td><span class="audit-badge ${badgeClass}">${tipoTexto}</span></td>`;
             html += `<td>${log.usuario}</td>`;
             html += `<td><div style="max-width: 400px; overflow: hidden; text-overflow: ellipsis;">${log.descripcion || ''}<br>`;
-            html += `<small style="color: #6b7280;">Anterior: ${log.datos_anteriores || 'N/A'}</small>`;
+            html += `<small style="color: #6b7280;">Anterior: ${formatearDatosAuditoria(log.datos_anteriores) || 'N/A'}</small>`;
             if (log.datos_nuevos) {
-                html += `<br><small style="color: #059669;">Nuevo: ${log.datos_nuevos}</small>`;
+                html += `<br><small style="color: #059669;">Nuevo: ${formatearDatosAuditoria(log.datos_nuevos)}</small>`;
             }
             html += '</div></td>';
             html += '</tr>';
         });
 
-        html += '</tbody></table>';
-        container.innerHTML = html;
+        if (cargarMas) {
+            container.querySelector('.audit-table tbody').insertAdjacentHTML('beforeend', html);
+        } else {
+            container.innerHTML = '<table class="audit-table"><thead><tr>' +
+                '<th>Fecha/Hora</th><th>Operación</th><th>Usuario</th><th>Detalles</th>' +
+                '</tr></thead><tbody>' + html + '</tbody></table>';
+        }
+
+        auditoriaCursor = data.next_cursor;
+        if (auditoriaCursor) {
+            container.insertAdjacentHTML('beforeend',
+                '<button id="btn-auditoria-mas" class="btn btn-secondary" onclick="cargarAuditoria(true)">Cargar más</button>');
+        }
     } catch (error) {
         mostrarNotificacion('Error al cargar historial', 'error');
     }
@@ -1,9 +1,11 @@
 """
 Script para subir todos los datos de la base de datos local a Render
 """
+import json
 import sqlite3
+import sys
+
 import requests
-import json
 
 # Configuración
 RENDER_URL = "https://mateca.onrender.com"  # Tu URL de Render
@@ -48,40 +50,26 @@ def login_render():
         print(f"❌ Error en login: {response.status_code}")
         return None
 
-def subir_atencion(session, datos):
-    """Sube una atención a Render"""
-    numero, fecha, tipo_atencion, nombre_animal, especie, sexo, edad, \
-    nombre_apellido, dni, direccion, barrio, telefono, \
-    motivo, diagnostico, tratamiento, derivacion, observaciones = datos
-    
-    atencion = {
-        "numero": numero,
-        "fecha": fecha,
-        "tipo_atencion": tipo_atencion,
-        "nombre_animal": nombre_animal,
-        "especie": especie,
-        "sexo": sexo,
-        "edad": edad or "",
-        "nombre_apellido": nombre_apellido,
-        "dni": dni,
-        "direccion": direccion or "",
-        "barrio": barrio or "",
-        "telefono": telefono or "",
-        "motivo": motivo or "",
-        "diagnostico": diagnostico or "",
-        "tratamiento": tratamiento or "",
-        "derivacion": derivacion or "",
-        "observaciones": observaciones or ""
-    }
-    
+CAMPOS = ["numero", "fecha", "tipo_atencion", "nombre_animal", "especie", "sexo", "edad",
+          "nombre_apellido", "dni", "direccion", "barrio", "telefono",
+          "motivo", "diagnostico", "tratamiento", "derivacion", "observaciones"]
+TAMANIO_ENVIO = 2000  # filas por request a /api/atenciones/bulk
+
+def subir_lote(session, lote):
+    """Sube un lote de atenciones como JSON Lines; devuelve el resultado de la carga"""
+    cuerpo = "\n".join(
+        json.dumps({campo: valor if valor is not None else "" for campo, valor in zip(CAMPOS, datos)})
+        for datos in lote
+    )
     response = session.post(
-        f"{RENDER_URL}/api/atenciones",
-        json=atencion
+        f"{RENDER_URL}/api/atenciones/bulk",
+        data=cuerpo.encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"}
     )
-    
-    return response.status_code == 200
+    response.raise_for_status()
+    return response.json()
 
-def main():
+def main(desde=0):
     print("=" * 60)
     print("SUBIDA DE DATOS A RENDER")
     print("=" * 60)
@@ -99,19 +87,25 @@ def main():
         print("❌ No se pudo conectar con Render")
         return
     
-    # Subir cada atención
-    print(f"\n📤 Subiendo {len(atenciones)} registros...")
+    # Subir por lotes (los números que ya existen en Render se informan y no se duplican)
+    print(f"\n📤 Subiendo {len(atenciones) - desde} registros...")
     exitosos = 0
     errores = 0
     
-    for i, atencion in enumerate(atenciones, 1):
-        numero = atencion[0]
-        if subir_atencion(session, atencion):
-            exitosos += 1
-            print(f"  ✅ [{i}/{len(atenciones)}] Registro #{numero} subido")
-        else:
-            errores += 1
-            print(f"  ❌ [{i}/{len(atenciones)}] Error en registro #{numero}")
+    for inicio in range(desde, len(atenciones), TAMANIO_ENVIO):
+        lote = atenciones[inicio:inicio + TAMANIO_ENVIO]
+        try:
+            resultado = subir_lote(session, lote)
+        except Exception as e:
+            print(f"  ❌ Error subiendo desde la fila {inicio}: {e}")
+            print(f"  ➡️  Para retomar: python subir_datos_render.py {inicio}")
+            break
+        
+        exitosos += resultado["insertadas"]
+        errores += resultado["total_errores"]
+        for error in resultado["errores"]:
+            print(f"  ❌ Registro #{error['numero']}: {error['error']}")
+        print(f"  ✅ [{inicio + len(lote)}/{len(atenciones)}] {resultado['insertadas']} registros subidos")
     
     print("\n" + "=" * 60)
     print(f"✅ Exitosos: {exitosos}")
@@ -122,4 +116,4 @@ def main():
     print(f"🌐 Verificá en: {RENDER_URL}")
 
 if __name__ == "__main__":
-    main()
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
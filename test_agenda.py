@@ -0,0 +1,68 @@
+# Pruebas de cupos y sobreturnos de la agenda (python -m pytest test_agenda.py)
+from datetime import date, timedelta
+
+import agenda
+
+# Un lunes futuro, para que dia_semana sea 0
+LUNES = (date.today() + timedelta(days=7 - date.today().weekday())).isoformat()
+
+
+def _turno(db, hora='09:00', tipo='Castración'):
+    return db.agregar_turno(LUNES, hora, 'Luna', 'Ana Pérez', '555-0001', tipo)
+
+
+def _ids_turnos(db):
+    with db.conexion() as conn:
+        return [fila[0] for fila in conn.execute('SELECT id FROM turnos ORDER BY id').fetchall()]
+
+
+def test_verificar_cupo_rechaza_sobre_la_capacidad(db):
+    db.guardar_cupo('Castración', 0, '09:00', 2)
+    assert _turno(db)[0]
+    assert _turno(db)[0]
+    exito, mensaje = _turno(db)
+    assert not exito and 'ya está completo' in mensaje
+    with db.conexion() as conn:
+        assert agenda.verificar_cupo(conn.cursor(), db.db_type, db.get_placeholder(),
+                                     LUNES, '09:00', 'Castración') is not None
+    # Otro tipo en el mismo horario tiene su propio cupo
+    assert _turno(db, tipo='Consulta')[0]
+
+
+def test_capacidad_cero_no_admite_turnos(db):
+    db.guardar_cupo('Castración', 0, '10:00', 0)
+    exito, mensaje = _turno(db, '10:00')
+    assert not exito and 'No hay turnos' in mensaje
+
+
+def test_agenda_vacia_admite_un_turno_por_horario_y_no_lista_disponibles(db):
+    assert db.turnos_disponibles(LUNES, LUNES) == []
+    assert _turno(db)[0]
+    assert _turno(db, '11:30')[0]
+    exito, _ = _turno(db)
+    assert not exito  # CAPACIDAD_SIN_CUPO = 1
+
+
+def test_disponibles_descuenta_los_turnos_no_cancelados(db):
+    db.guardar_cupo('Castración', 0, '09:00', 2)
+    _turno(db)
+    disponibles = db.turnos_disponibles(LUNES, LUNES, 'Castración')
+    assert [(d['hora'], d['capacidad'], d['libres']) for d in disponibles] == [('09:00', 2, 1)]
+
+
+def test_reactivar_turno_cancelado_verifica_el_cupo(db):
+    assert _turno(db)[0]
+    turno_id = _ids_turnos(db)[0]
+    assert db.actualizar_estado_turno(turno_id, 'cancelado')[0]
+    assert _turno(db)[0]  # el lugar liberado se vuelve a dar
+
+    exito, mensaje = db.actualizar_estado_turno(turno_id, 'pendiente')
+    assert not exito and 'ya está completo' in mensaje
+    with db.conexion() as conn:
+        assert conn.execute('SELECT estado FROM turnos WHERE id = ?', (turno_id,)).fetchone()[0] == 'cancelado'
+
+    # Con el otro turno cancelado, vuelve a entrar
+    assert db.actualizar_estado_turno(_ids_turnos(db)[1], 'cancelado')[0]
+    assert db.actualizar_estado_turno(turno_id, 'pendiente')[0]
+    # Pasar entre estados activos no vuelve a contar
+    assert db.actualizar_estado_turno(turno_id, 'completado')[0]
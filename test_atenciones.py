@@ -0,0 +1,57 @@
+# Pruebas de alta, edición y baja de atenciones con su auditoría (python -m pytest test_atenciones.py)
+import pytest
+
+
+DATOS = {'fecha': '2025-03-01', 'nombre_animal': 'Luna', 'especie': 'Felino', 'sexo': 'Hembra', 'edad': '2 años',
+         'nombre_apellido': 'Ana Pérez', 'dni': '30111222', 'direccion': 'Calle 1', 'barrio': 'Centro',
+         'telefono': '555-0001'}
+
+
+def _atender(db, numero):
+    return db.agregar_atencion(numero, tipo_atencion='castracion', **DATOS)
+
+
+def _animales(db, numero):
+    return [fila[4] for fila in db.buscar_atenciones({'numero': numero})]
+
+
+def _auditoria(db, operacion):
+    return db.obtener_auditoria(100, {'tabla': 'atenciones', 'tipo_operacion': operacion})
+
+
+def test_baja_registra_el_registro_completo_en_la_misma_transaccion(db):
+    assert _atender(db, 1)[0]
+    assert db.eliminar_atencion(1, usuario='prueba')[0]
+    entradas = _auditoria(db, 'DELETE')
+    assert len(entradas) == 1
+    assert entradas[0]['usuario'] == 'prueba'
+    assert _animales(db, 1) == []
+
+
+@pytest.mark.parametrize('operacion', ['DELETE', 'UPDATE'])
+def test_cambio_deshecho_no_deja_entrada_de_auditoria(db, monkeypatch, operacion):
+    assert _atender(db, 1)[0]
+    registrar = db.registrar_auditoria
+
+    def registrar_y_fallar(*args, **kwargs):
+        registrar(*args, **kwargs)
+        raise RuntimeError('falla después de auditar')
+
+    monkeypatch.setattr(db, 'registrar_auditoria', registrar_y_fallar)
+    if operacion == 'DELETE':
+        exito, _ = db.eliminar_atencion(1)
+    else:
+        exito, _ = db.editar_atencion(1, dict(DATOS, nombre_animal='Tom'))
+    assert not exito
+    monkeypatch.undo()
+
+    assert _auditoria(db, operacion) == []
+    assert _animales(db, 1) == ['Luna']
+
+
+def test_edicion_registra_solo_los_campos_que_cambiaron(db):
+    assert _atender(db, 1)[0]
+    assert db.editar_atencion(1, dict(DATOS, nombre_animal='Tom'))[0]
+    entradas = _auditoria(db, 'UPDATE')
+    assert [(e['datos_anteriores'], e['datos_nuevos']) for e in entradas] == [
+        ({'nombre_animal': 'Luna'}, {'nombre_animal': 'Tom'})]
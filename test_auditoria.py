@@ -11,9 +11,9 @@ if not logs:
     print("No hay registros de auditoría aún.")
 else:
     for log in logs:
-        print(f"[{log[1]}] {log[2]} en {log[3]} (ID: {log[4]})")
-        print(f"  Usuario: {log[5]}")
-        print(f"  Anterior: {log[6]}")
-        if log[7]:
-            print(f"  Nuevo: {log[7]}")
-        print(f"  {log[8]}\n")
+        print(f"[{log['fecha_hora']}] {log['tipo_operacion']} en {log['tabla']} (ID: {log['registro_id']})")
+        print(f"  Usuario: {log['usuario']}")
+        print(f"  Anterior: {log['datos_anteriores']}")
+        if log['datos_nuevos']:
+            print(f"  Nuevo: {log['datos_nuevos']}")
+        print(f"  {log['descripcion']}\n")
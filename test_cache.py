@@ -0,0 +1,63 @@
+# Pruebas de la caché de dashboard y estadísticas (python -m pytest test_cache.py)
+from datetime import date
+
+from cache import CacheTTL
+
+HOY = date.today().isoformat()
+
+
+def _atender(db, numero, tipo_atencion='castracion'):
+    return db.agregar_atencion(numero, HOY, tipo_atencion, 'Luna', 'Felino', 'Hembra', '2 años',
+                               'Ana Pérez', '30111222', 'Calle 1', 'Centro', '555-0001')
+
+
+def test_cache_vence_y_descarta_la_menos_usada(monkeypatch):
+    ahora = [100.0]
+    monkeypatch.setattr('cache.time.monotonic', lambda: ahora[0])
+    cache = CacheTTL(maximo=2, ttl=10)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    assert cache.obtener('a') == (True, 1)
+    cache.guardar('c', 3)  # descarta 'b', la menos usada
+    assert cache.obtener('b') == (False, None)
+    ahora[0] += 10
+    assert cache.obtener('a') == (False, None)
+
+
+def test_no_guarda_lo_calculado_antes_de_una_invalidacion():
+    cache = CacheTTL()
+    generacion = cache.generacion()
+    cache.invalidar()  # una escritura terminó mientras se calculaba el valor
+    cache.guardar('dashboard', 'viejo', generacion)
+    assert cache.obtener('dashboard') == (False, None)
+
+
+def test_escritura_invalida_dashboard_y_estadisticas(db):
+    db.cache.ttl = 3600
+    assert _atender(db, 1)[0]
+    assert db.obtener_dashboard_stats()['hoy'] == 1
+    assert db.obtener_estadisticas()['total'] == 1
+    aciertos = db.cache.estadisticas()['aciertos']
+    db.obtener_dashboard_stats()
+    db.obtener_estadisticas()
+    assert db.cache.estadisticas()['aciertos'] == aciertos + 2
+
+    assert _atender(db, 2, 'atencion_primaria')[0]
+    dashboard = db.obtener_dashboard_stats()
+    assert (dashboard['hoy'], dashboard['primaria_hoy']) == (2, 1)
+    assert [atencion['numero'] for atencion in dashboard['ultimas']] == [2, 1]
+    assert db.obtener_estadisticas()['total'] == 2
+
+    assert db.eliminar_atencion(2)[0]
+    assert db.obtener_dashboard_stats()['hoy'] == 1
+    assert db.obtener_estadisticas()['total'] == 1
+
+
+def test_turnos_invalidan_el_dashboard(db):
+    db.cache.ttl = 3600
+    assert db.obtener_dashboard_stats()['turnos_hoy'] == []
+    assert db.agregar_turno(HOY, '23:30', 'Luna', 'Ana Pérez', '555-0001', 'Control')[0]
+    turnos = db.obtener_dashboard_stats()['turnos_hoy']
+    assert [(turno['hora'], turno['estado']) for turno in turnos] == [('23:30', 'pendiente')]
+    assert db.actualizar_estado_turno(turnos[0]['id'], 'completado')[0]
+    assert db.obtener_dashboard_stats()['turnos_hoy'][0]['estado'] == 'completado'
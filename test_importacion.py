@@ -0,0 +1,54 @@
+# Pruebas de la importación masiva de atenciones (python -m pytest test_importacion.py)
+import importacion
+
+
+def _fila(numero, **cambios):
+    fila = {'numero': numero, 'fecha': '2025-03-01', 'tipo_atencion': 'castracion', 'nombre_animal': 'Luna',
+            'especie': 'Felino', 'sexo': 'Hembra', 'nombre_apellido': 'Ana Pérez', 'dni': '30111222',
+            'barrio': 'Centro'}
+    fila.update(cambios)
+    return fila
+
+
+def _numeros(db):
+    with db.conexion() as conn:
+        return [fila[0] for fila in conn.execute('SELECT numero FROM atenciones ORDER BY numero').fetchall()]
+
+
+def test_entero_acepta_enteros_y_rechaza_el_resto():
+    assert [importacion._entero(v) for v in ('12', 12, 12.0, ' 7 ')] == [12, 12, 12, 7]
+    assert [importacion._entero(v) for v in (True, False, 12.5, 'doce', None, float('inf'))] == [None] * 6
+
+
+def test_validar_rechaza_tipo_de_atencion_desconocido():
+    datos, error = importacion.validar(_fila(1, tipo_atencion=''))
+    assert error is None and datos['tipo_atencion'] == 'castracion'
+    datos, error = importacion.validar(_fila(1, tipo_atencion='Castración'))
+    assert datos is None and 'Tipo de atención inválido' in error
+
+
+def test_importar_informa_errores_por_fila_y_sigue(db):
+    filas = [_fila(1), _fila(True), _fila(3, tipo_atencion='vacunacion'), _fila(4, dni=''),
+             _fila(1), _fila(6)]
+    resultado = db.importar_atenciones(filas, tamanio_lote=4)
+
+    assert resultado['insertadas'] == 2 and resultado['completo']
+    assert [error['fila'] for error in resultado['errores']] == [1, 2, 3, 4]
+    assert _numeros(db) == [1, 6]
+    # Las filas rechazadas no llegan al resumen diario
+    assert db.obtener_estadisticas()['total'] == 2
+
+
+def test_importar_retoma_desde_el_offset(db):
+    filas = [_fila(numero) for numero in range(1, 11)]
+    primera = db.importar_atenciones(filas, limite=4, tamanio_lote=3)
+    assert not primera['completo'] and primera['siguiente_offset'] == 4
+    assert _numeros(db) == [1, 2, 3, 4]
+
+    resto = db.importar_atenciones(filas, desde=primera['siguiente_offset'], tamanio_lote=3)
+    assert resto['completo'] and resto['insertadas'] == 6
+    assert _numeros(db) == list(range(1, 11))
+
+    # Repetir la carga no duplica: los números existentes son errores de fila
+    repetida = db.importar_atenciones(filas)
+    assert repetida['insertadas'] == 0 and repetida['total_errores'] == 10
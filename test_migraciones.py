@@ -0,0 +1,113 @@
+# Pruebas de las migraciones sobre bases creadas por versiones anteriores (python -m pytest test_migraciones.py)
+import sqlite3
+
+from database import Database
+
+# Esquema que creaba init_db antes de las migraciones versionadas
+ESQUEMA_ORIGINAL = '''
+    CREATE TABLE tutores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre_apellido TEXT NOT NULL,
+        dni TEXT NOT NULL,
+        direccion TEXT,
+        barrio TEXT,
+        telefono TEXT,
+        UNIQUE(dni)
+    );
+    CREATE TABLE atenciones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero INTEGER UNIQUE NOT NULL,
+        fecha DATE NOT NULL,
+        tipo_atencion TEXT NOT NULL,
+        nombre_animal TEXT NOT NULL,
+        especie TEXT NOT NULL,
+        sexo TEXT NOT NULL,
+        edad TEXT,
+        tutor_id INTEGER NOT NULL,
+        motivo TEXT,
+        diagnostico TEXT,
+        tratamiento TEXT,
+        derivacion TEXT,
+        estado TEXT DEFAULT 'completado',
+        observaciones TEXT,
+        FOREIGN KEY (tutor_id) REFERENCES tutores(id)
+    );
+    CREATE TABLE turnos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha DATE NOT NULL,
+        hora TEXT NOT NULL,
+        nombre_animal TEXT NOT NULL,
+        tutor_nombre TEXT NOT NULL,
+        telefono TEXT,
+        tipo TEXT NOT NULL,
+        estado TEXT DEFAULT 'pendiente',
+        observaciones TEXT
+    );
+    CREATE TABLE auditoria (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        tipo_operacion TEXT NOT NULL,
+        tabla TEXT NOT NULL,
+        registro_id INTEGER,
+        usuario TEXT,
+        datos_anteriores TEXT,
+        datos_nuevos TEXT,
+        descripcion TEXT
+    );
+    CREATE TABLE barrios_mapa (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        latitud REAL NOT NULL,
+        longitud REAL NOT NULL,
+        color TEXT DEFAULT '#3498db',
+        fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_tutores_dni ON tutores(dni);
+    INSERT INTO tutores (id, nombre_apellido, dni, direccion, barrio, telefono)
+    VALUES (1, 'Ana Pérez', '30111222', 'Calle 1', 'Centro', '555-0001');
+    INSERT INTO atenciones (numero, fecha, tipo_atencion, nombre_animal, especie, sexo, edad, tutor_id)
+    VALUES (1, '2025-01-10', 'castracion', 'Luna', 'Felino', 'Hembra', '2 años', 1);
+'''
+
+
+def _base_original(tmp_path, esquema=ESQUEMA_ORIGINAL):
+    ruta = tmp_path / 'original.db'
+    conn = sqlite3.connect(ruta)
+    conn.executescript(esquema)
+    conn.close()
+    return Database(db_url=f'sqlite:///{ruta}')
+
+
+def _indices_unicos_tutores(db):
+    with db.conexion() as conn:
+        indices = conn.execute("PRAGMA index_list('tutores')").fetchall()
+    return [fila[1] for fila in indices if fila[2]]
+
+
+def test_migrar_quita_unique_de_tabla(tmp_path):
+    db = _base_original(tmp_path)
+    assert _indices_unicos_tutores(db) == []
+    with db.conexion() as conn:
+        indices = {fila[1] for fila in conn.execute("PRAGMA index_list('tutores')").fetchall()}
+    assert {'idx_tutores_dni', 'idx_tutores_identidad'} <= indices
+
+    # Mismo DNI con otros datos: nueva versión del tutor
+    exito, mensaje = db.agregar_atencion(2, '2025-02-01', 'castracion', 'Tom', 'Felino', 'Macho', '1 año',
+                                         'Ana Pérez', '30111222', 'Calle 9', 'Norte', '555-0001')
+    assert exito, mensaje
+    with db.conexion() as conn:
+        filas = conn.execute("SELECT id, barrio FROM tutores WHERE dni = '30111222' ORDER BY id").fetchall()
+    assert [tuple(fila) for fila in filas][0] == (1, 'Centro')
+    assert len(filas) == 2
+    assert len(db.buscar_atenciones({'barrio': 'Nort'})) == 1
+
+
+def test_migrar_quita_unique_de_columna_y_conserva_columnas(tmp_path):
+    esquema = ESQUEMA_ORIGINAL.replace('dni TEXT NOT NULL,', 'dni TEXT NOT NULL UNIQUE,', 1) \
+                              .replace(',\n        UNIQUE(dni)', ",\n        extra TEXT DEFAULT 'x'", 1)
+    db = _base_original(tmp_path, esquema)
+    assert _indices_unicos_tutores(db) == []
+    with db.conexion() as conn:
+        fila = conn.execute("SELECT nombre_apellido, extra FROM tutores WHERE id = 1").fetchone()
+    assert tuple(fila) == ('Ana Pérez', 'x')
+
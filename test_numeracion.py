@@ -0,0 +1,43 @@
+# Pruebas de la numeración y las reservas de números de atención (python -m pytest test_numeracion.py)
+
+
+def _atender(db, numero):
+    return db.agregar_atencion(numero, '2025-03-01', 'castracion', 'Luna', 'Felino', 'Hembra', '2 años',
+                               'Ana Pérez', '30111222', 'Calle 1', 'Centro', '555-0001')
+
+
+def _vencer(db, numero):
+    with db.conexion() as conn:
+        conn.execute("UPDATE numeros_reservados SET vence = '2000-01-01 00:00:00' WHERE numero = ?", (numero,))
+        conn.commit()
+
+
+def test_reservas_vigentes_no_se_repiten(db):
+    primero, _ = db.reservar_numero('ana')
+    segundo, _ = db.reservar_numero('beto')
+    assert (primero, segundo) == (1, 2)
+    assert db.obtener_siguiente_numero() == 3
+
+
+def test_reserva_vencida_se_vuelve_a_entregar(db):
+    primero, _ = db.reservar_numero('ana')
+    segundo, _ = db.reservar_numero('beto')
+    _vencer(db, primero)
+
+    # El número abandonado se entrega antes de pedir uno nuevo al contador
+    assert db.reservar_numero('carla')[0] == primero
+    assert db.reservar_numero('dani')[0] == segundo + 1
+    with db.conexion() as conn:
+        usuario = conn.execute('SELECT usuario FROM numeros_reservados WHERE numero = ?', (primero,)).fetchone()[0]
+    assert usuario == 'carla'
+
+
+def test_registrar_consume_la_reserva_y_adelanta_el_contador(db):
+    numero, _ = db.reservar_numero('ana')
+    assert _atender(db, numero)[0]
+    _vencer(db, numero)  # ya no está reservado: no se vuelve a entregar
+    assert db.reservar_numero('beto')[0] == numero + 1
+
+    # Un número cargado a mano más adelante adelanta el contador
+    assert _atender(db, 50)[0]
+    assert db.reservar_numero('carla')[0] == 51
@@ -0,0 +1,55 @@
+# Pruebas de la paginación por clave de /api/atenciones y /api/turnos (python -m pytest test_paginacion.py)
+import random
+
+
+def _paginas(cliente, url, parametro):
+    """Recorre todas las páginas siguiendo next_cursor; devuelve las respuestas"""
+    paginas, cursor = [], None
+    while True:
+        respuesta = cliente.get(url + (f'&{parametro}={cursor}' if cursor else '')).get_json()
+        paginas.append(respuesta)
+        cursor = respuesta['next_cursor']
+        if cursor is None:
+            return paginas
+
+
+def test_paginas_de_atenciones_sin_huecos_ni_repetidas(db, cliente):
+    numeros = random.Random(7).sample(range(1, 200), 23)
+    tipos = {numero: 'castracion' if numero % 3 else 'atencion_primaria' for numero in numeros}
+    # Todas el mismo día: el orden y el cursor son solo por número
+    resultado = db.importar_atenciones([
+        {'numero': numero, 'fecha': '2025-03-01', 'tipo_atencion': tipos[numero], 'nombre_animal': f'Animal {numero}',
+         'especie': 'Felino', 'sexo': 'Hembra', 'nombre_apellido': 'Ana Pérez', 'dni': '30111222'}
+        for numero in numeros
+    ])
+    assert resultado['insertadas'] == 23
+
+    paginas = _paginas(cliente, '/api/atenciones?limit=5', 'after_numero')
+    assert [len(p['atenciones']) for p in paginas] == [5, 5, 5, 5, 3]
+    assert [a['numero'] for p in paginas for a in p['atenciones']] == sorted(numeros, reverse=True)
+
+    paginas = _paginas(cliente, '/api/atenciones?limit=4&tipo_atencion=atencion_primaria', 'after_numero')
+    primaria = sorted((n for n in numeros if tipos[n] == 'atencion_primaria'), reverse=True)
+    assert [a['numero'] for p in paginas for a in p['atenciones']] == primaria
+
+
+def test_paginas_de_turnos_sin_huecos_ni_repetidas_con_fecha_y_hora_compartidas(db, cliente):
+    # Dos lunes, con varios turnos en la misma fecha y hora (desempate por id)
+    fechas = ('2030-01-07', '2030-01-14')
+    for hora in ('09:00', '09:30'):
+        db.guardar_cupo('Control', 0, hora, 10)
+    for indice in range(17):
+        exito, mensaje = db.agregar_turno(fechas[indice % 2], ('09:30', '09:00')[indice % 3 == 0],
+                                          f'Animal {indice}', 'Ana Pérez', '555-0001', 'Control')
+        assert exito, mensaje
+
+    with db.conexion() as conn:
+        esperados = [tuple(fila) for fila in conn.execute('SELECT fecha, hora, id FROM turnos ORDER BY fecha, hora, id')]
+    paginas = _paginas(cliente, f'/api/turnos?desde={fechas[0]}&hasta={fechas[1]}&limit=4', 'after')
+    assert [len(p['turnos']) for p in paginas] == [4, 4, 4, 4, 1]
+    assert [(t['fecha'], t['hora'], t['id']) for p in paginas for t in p['turnos']] == esperados
+
+    # Un cursor en medio de un grupo de la misma fecha y hora sigue desde el turno siguiente
+    fecha, hora, turno_id = esperados[5]
+    siguiente = cliente.get(f'/api/turnos?desde={fechas[0]}&after={fecha},{hora},{turno_id}&limit=3').get_json()
+    assert [(t['fecha'], t['hora'], t['id']) for t in siguiente['turnos']] == esperados[6:9]
@@ -0,0 +1,159 @@
+# Planes de las consultas calientes (python -m pytest test_planes.py)
+"""
+Verifica con EXPLAIN que las consultas del dashboard, las estadísticas por
+rango, las páginas de /api/atenciones, los turnos de un rango y las páginas
+de auditoría usen índices.
+
+Cada caso llama al método de Database real y registra las consultas que
+ejecuta; después se pide el plan de cada una con los mismos parámetros.
+Falla si alguna recorre una tabla completa (un filtro del tipo
+DATE(fecha) = ... en lugar de un rango sobre la columna, o un índice que
+falta) u ordena todo el resultado.
+
+- SQLite: siempre, sobre una base sintética (benchmark.generar_base).
+- PostgreSQL: con psycopg2 instalado y DATABASE_URL, sobre esa base (solo
+  se leen planes). Se desactiva enable_seqscan para que las tablas chicas
+  no escondan el problema: si aun así aparece un Seq Scan, el filtro no
+  puede usar ningún índice.
+"""
+import os
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+
+from database import Database
+
+REGISTROS = 2000
+
+HOY = date.today()
+HACE_UN_MES = (HOY - timedelta(days=30)).isoformat()
+EN_DOS_SEMANAS = (HOY + timedelta(days=14)).isoformat()
+
+# Caso -> (llamada, admite recorrer un índice en orden: ORDER BY ... LIMIT que corta en las primeras filas)
+CASOS = {
+    'dashboard': (lambda db: db.obtener_dashboard_stats(), True),
+    'estadisticas_rango': (lambda db: db.obtener_estadisticas(HACE_UN_MES, HOY.isoformat()), False),
+    'atenciones_pagina': (lambda db: db.buscar_atenciones({}, after_numero=REGISTROS // 2, limite=50), True),
+    'atenciones_tipo_pagina': (lambda db: db.buscar_atenciones({'tipo_atencion': 'castracion'},
+                                                               after_numero=REGISTROS // 2, limite=50), True),
+    'turnos_rango': (lambda db: db.buscar_turnos(HACE_UN_MES, EN_DOS_SEMANAS, limite=50), True),
+    'turnos_rango_pagina': (lambda db: db.buscar_turnos(HACE_UN_MES, EN_DOS_SEMANAS,
+                                                        after=(HOY.isoformat(), '09:00', 1), limite=50), True),
+    'turnos_por_dia': (lambda db: db.resumen_turnos(HACE_UN_MES, EN_DOS_SEMANAS), False),
+    'auditoria_pagina': (lambda db: db.obtener_auditoria(50, after_id=REGISTROS // 4), True),
+    'auditoria_registro': (lambda db: db.obtener_auditoria(50, {'tabla': 'atenciones', 'registro_id': 10}), True),
+}
+
+# Catálogo y tablas que no crecen con los datos (una fila por mes archivado)
+TABLAS_CHICAS = {'sqlite_master', 'auditoria_archivos'}
+
+
+class _Registro:
+    """Conexión o cursor que anota las consultas SELECT que ejecuta"""
+
+    def __init__(self, objeto, consultas):
+        self._objeto = objeto
+        self._consultas = consultas
+
+    def cursor(self, *args, **kwargs):
+        return _Registro(self._objeto.cursor(*args, **kwargs), self._consultas)
+
+    def execute(self, sql, params=()):
+        if sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self._consultas.append((sql, tuple(params)))
+        resultado = self._objeto.execute(sql, params)
+        return self if resultado is self._objeto else resultado
+
+    def __iter__(self):
+        return iter(self._objeto)
+
+    def __getattr__(self, nombre):
+        return getattr(self._objeto, nombre)
+
+
+def consultas_de(db, llamada):
+    """[(sql, params)] de las consultas que ejecuta `llamada(db)`; las con nombre, como plan directo"""
+    consultas = []
+    conexion = db.conexion
+
+    @contextmanager
+    def registrada():
+        with conexion() as conn:
+            yield _Registro(conn, consultas)
+
+    ejecutar = db.ejecutar
+
+    def ejecutar_registrada(cursor, nombre, params=()):
+        consultas.append((nombre, tuple(params)))
+        return ejecutar(cursor, nombre, params)
+
+    db.conexion, db.ejecutar = registrada, ejecutar_registrada
+    try:
+        llamada(db)
+    finally:
+        del db.conexion, db.ejecutar
+    return consultas
+
+
+def plan(db, cursor, sql, params):
+    """Plan de una consulta registrada, una línea por paso"""
+    if sql in db.consultas.sentencias:
+        return db.consultas.explicar(cursor, sql, params)
+    if db.db_type == 'postgresql':
+        cursor.execute(f'EXPLAIN {sql}', params)
+        return [fila[0] for fila in cursor.fetchall()]
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    return [fila[-1] for fila in cursor.fetchall()]
+
+
+def escaneos_completos(db_type, plan, recorrido_ordenado=False):
+    """Pasos del plan que recorren una tabla (o un índice) entera u ordenan todo el resultado"""
+    if db_type == 'postgresql':
+        return [paso for paso in plan
+                if 'Seq Scan' in paso and not any(f' on {tabla} ' in f'{paso} ' for tabla in TABLAS_CHICAS)]
+    tablas = {paso.split()[1] for paso in plan if paso.startswith(('SCAN ', 'SEARCH '))}
+    if tablas <= TABLAS_CHICAS:
+        return []
+    # Leer las filas de una CTE o subconsulta (CO-ROUTINE / MATERIALIZE) no es recorrer una
+    # tabla, ni tampoco recorrer una función como json_each (VIRTUAL TABLE) sobre un parámetro
+    derivadas = {paso.split()[-1] for paso in plan if paso.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+    return [paso for paso in plan
+            if (paso.startswith('SCAN ') and paso.split()[1] not in derivadas
+                and ' VIRTUAL TABLE ' not in paso
+                and not (recorrido_ordenado and ' USING ' in paso))
+            or paso == 'USE TEMP B-TREE FOR ORDER BY']
+
+
+@pytest.fixture(scope='module', params=['sqlite', 'postgresql'])
+def base(request, tmp_path_factory):
+    if request.param == 'sqlite':
+        from benchmark import generar_base
+        return generar_base(REGISTROS, db_url=f"sqlite:///{tmp_path_factory.mktemp('planes') / 'bench.db'}")
+    database_url = os.environ.get('DATABASE_URL', '')
+    if not database_url.startswith('postgres'):
+        pytest.skip('DATABASE_URL no apunta a PostgreSQL')
+    pytest.importorskip('psycopg2')
+    db = Database(db_url=database_url)
+    db.cache.ttl = 0
+    return db
+
+
+@pytest.mark.parametrize('caso', CASOS)
+def test_consulta_usa_indices(base, caso):
+    llamada, recorrido_ordenado = CASOS[caso]
+    consultas = consultas_de(base, llamada)
+    assert consultas, f'{caso} no ejecutó ninguna consulta'
+
+    with base.conexion() as conn:
+        cursor = conn.cursor()
+        if base.db_type == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        fallas = {}
+        for sql, params in consultas:
+            pasos = plan(base, cursor, sql, params)
+            completos = escaneos_completos(base.db_type, pasos, recorrido_ordenado)
+            if completos:
+                fallas[sql.strip().splitlines()[0]] = pasos
+        conn.rollback()
+    assert not fallas, f'{caso} recorre tablas completas: {fallas}'
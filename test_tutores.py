@@ -0,0 +1,69 @@
+# Pruebas de la depuración de versiones de tutores (python -m pytest test_tutores.py)
+import threading
+
+import tutores
+
+TUTOR = {'nombre_apellido': 'Ana Pérez', 'dni': '30111222', 'direccion': 'Calle 1', 'barrio': 'Centro',
+         'telefono': '555-0001'}
+
+
+def _version_huerfana(db):
+    """Crea una versión del tutor que ninguna atención usa; devuelve su id"""
+    with db.conexion() as conn:
+        tutor_id = tutores.obtener_tutor(conn.cursor(), db.db_type, db.get_placeholder(),
+                                         barrio_norm='centro', **TUTOR)
+        conn.commit()
+    return tutor_id
+
+
+def _atender(db, numero):
+    return db.agregar_atencion(numero, '2025-03-01', 'castracion', 'Luna', 'Felino', 'Hembra', '2 años',
+                               TUTOR['nombre_apellido'], TUTOR['dni'], TUTOR['direccion'], TUTOR['barrio'],
+                               TUTOR['telefono'])
+
+
+def test_depurar_borra_solo_versiones_sin_atenciones(db):
+    assert _atender(db, 1)[0]
+    with db.conexion() as conn:
+        usada = conn.execute('SELECT tutor_id FROM atenciones WHERE numero = 1').fetchone()[0]
+        # Otra versión del mismo tutor que ninguna atención usa
+        huerfana = tutores.obtener_tutor(conn.cursor(), db.db_type, db.get_placeholder(),
+                                         barrio_norm='centro', **dict(TUTOR, telefono='555-0002'))
+        conn.commit()
+
+    assert db.depurar_tutores(vacuum=False)['eliminadas'] == 1
+    with db.conexion() as conn:
+        ids = [fila[0] for fila in conn.execute('SELECT id FROM tutores').fetchall()]
+    assert ids == [usada]
+    archivada = db.obtener_auditoria(10, {'tabla': 'tutores', 'registro_id': huerfana})
+    assert [entrada['tipo_operacion'] for entrada in archivada] == ['DELETE']
+
+def test_alta_durante_la_depuracion_espera_y_crea_otra_version(db, monkeypatch):
+    huerfana = _version_huerfana(db)
+    elegido, seguir = threading.Event(), threading.Event()
+    insertar = tutores.insertar
+
+    def insertar_pausado(*args, **kwargs):
+        elegido.set()  # lote elegido, antes de borrarlo
+        seguir.wait(5)
+        return insertar(*args, **kwargs)
+
+    monkeypatch.setattr(tutores, 'insertar', insertar_pausado)
+    resultado = {}
+    depuracion = threading.Thread(target=lambda: resultado.update(db.depurar_tutores(vacuum=False)))
+    alta = threading.Thread(target=lambda: resultado.update(alta=_atender(db, 1)))
+    depuracion.start()
+    assert elegido.wait(5)
+    alta.start()
+    alta.join(0.3)
+    assert alta.is_alive()  # espera a que la depuración termine su lote
+    seguir.set()
+    depuracion.join(5)
+    alta.join(5)
+
+    assert resultado['eliminadas'] == 1
+    assert resultado['alta'][0], resultado['alta']
+    with db.conexion() as conn:
+        tutor_id = conn.execute('SELECT tutor_id FROM atenciones WHERE numero = 1').fetchone()[0]
+        assert conn.execute('SELECT COUNT(*) FROM tutores WHERE id = ?', (tutor_id,)).fetchone()[0] == 1
+    assert tutor_id != huerfana
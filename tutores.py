@@ -0,0 +1,310 @@
+"""
+Modelo versionado de tutores
+
+- tutor_identidades: identidad estable de cada tutor, una fila por DNI.
+- tutores: versiones inmutables de sus datos (nombre, dirección, barrio,
+  teléfono), con tutores.identidad_id indexado. Una atención apunta a la
+  versión vigente al momento de registrarla o editarla.
+
+Al escribir se reutiliza la versión idéntica si ya existe y solo se crea
+una nueva cuando cambia algún dato. Como las versiones no se modifican
+nunca, compartirlas entre atenciones no afecta otros registros (lo que
+antes obligaba a crear un tutor nuevo en cada alta y edición).
+
+compactar() deduplica los datos existentes: asigna identidades, une las
+versiones idénticas de cada identidad y reapunta las atenciones, por lotes.
+depurar_huerfanos() borra las versiones que ya ninguna atención usa (tras
+ediciones y bajas), archivándolas antes en auditoria.
+"""
+from auditoria import USUARIO_SISTEMA, entrada, insertar
+# Datos de cada versión, en el orden en que se insertan
+CAMPOS_VERSION = ('nombre_apellido', 'dni', 'direccion', 'barrio', 'telefono', 'barrio_norm')
+# Datos que distinguen una versión de otra de la misma identidad
+CAMPOS_CLAVE = ('nombre_apellido', 'direccion', 'barrio', 'telefono')
+
+TAMANIO_LOTE = 1000
+
+
+def crear_tablas_tutores(cursor, db_type, pk):
+    """Crea tutor_identidades y la columna indexada tutores.identidad_id"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS tutor_identidades (
+            id {pk},
+            dni TEXT NOT NULL UNIQUE,
+            fecha_alta TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    if db_type == 'postgresql':
+        cursor.execute('ALTER TABLE tutores ADD COLUMN IF NOT EXISTS identidad_id INTEGER REFERENCES tutor_identidades(id)')
+    else:
+        cursor.execute('PRAGMA table_info(tutores)')
+        if 'identidad_id' not in [columna[1] for columna in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE tutores ADD COLUMN identidad_id INTEGER REFERENCES tutor_identidades(id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tutores_identidad ON tutores(identidad_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_atenciones_tutor ON atenciones(tutor_id)')
+
+
+def asignar_identidades(cursor):
+    """Crea las identidades faltantes y completa tutores.identidad_id; devuelve cuántos"""
+    cursor.execute('''
+        INSERT INTO tutor_identidades (dni)
+        SELECT DISTINCT dni FROM tutores WHERE identidad_id IS NULL
+        ON CONFLICT (dni) DO NOTHING
+    ''')
+    cursor.execute('''
+        UPDATE tutores
+        SET identidad_id = (SELECT i.id FROM tutor_identidades i WHERE i.dni = tutores.dni)
+        WHERE identidad_id IS NULL
+    ''')
+    return cursor.rowcount
+
+
+def _clave(identidad_id, datos):
+    return (identidad_id,) + tuple(datos[c] or '' for c in CAMPOS_CLAVE)
+
+
+def obtener_tutores(cursor, db_type, placeholder, versiones):
+    """Devuelve el id de la versión de cada tutor, creando solo las que no existen.
+
+    `versiones` es una lista de diccionarios con CAMPOS_VERSION.
+    """
+    if not versiones:
+        return []
+    versiones = [{c: v.get(c) or '' for c in CAMPOS_VERSION} for v in versiones]
+    dnis = sorted({v['dni'] for v in versiones})
+    marcas = ', '.join([placeholder] * len(dnis))
+
+    # Identidades (una por DNI)
+    cursor.executemany(f'''
+        INSERT INTO tutor_identidades (dni) VALUES ({placeholder})
+        ON CONFLICT (dni) DO NOTHING
+    ''', [(dni,) for dni in dnis])
+    cursor.execute(f'SELECT dni, id FROM tutor_identidades WHERE dni IN ({marcas})', dnis)
+    identidades = dict(cursor.fetchall())
+
+    # Versiones existentes de esas identidades (búsqueda por índice). Se leen bloqueadas
+    # hasta el commit para que depurar_huerfanos no borre una que se va a reutilizar: en
+    # PostgreSQL con FOR KEY SHARE (si la depuración la tiene tomada, se espera y, si la
+    # borró, no aparece y se crea una nueva); en SQLite el INSERT de identidades de
+    # arriba ya tomó el bloqueo de escritura de la base.
+    ids_identidad = sorted(set(identidades.values()))
+    marcas = ', '.join([placeholder] * len(ids_identidad))
+    cursor.execute(f'''
+        SELECT id, identidad_id, {', '.join(CAMPOS_CLAVE)}
+        FROM tutores
+        WHERE identidad_id IN ({marcas})
+        ORDER BY id
+        {'FOR KEY SHARE' if db_type == 'postgresql' else ''}
+    ''', ids_identidad)
+    existentes = {}
+    for fila in cursor.fetchall():
+        existentes.setdefault(_clave(fila[1], dict(zip(CAMPOS_CLAVE, fila[2:]))), fila[0])
+
+    # Versiones nuevas (sin repetir dentro del mismo lote)
+    nuevas = {}
+    for datos in versiones:
+        identidad_id = identidades[datos['dni']]
+        clave = _clave(identidad_id, datos)
+        if clave not in existentes and clave not in nuevas:
+            nuevas[clave] = tuple(datos[c] for c in CAMPOS_VERSION) + (identidad_id,)
+
+    if nuevas:
+        columnas = ', '.join(CAMPOS_VERSION + ('identidad_id',))
+        if db_type == 'postgresql':
+            from psycopg2.extras import execute_values
+            ids = execute_values(cursor, f'INSERT INTO tutores ({columnas}) VALUES %s RETURNING id',
+                                 list(nuevas.values()), page_size=len(nuevas), fetch=True)
+            existentes.update(zip(nuevas, (fila[0] for fila in ids)))
+        else:
+            marcas = ', '.join([placeholder] * (len(CAMPOS_VERSION) + 1))
+            for clave, valores in nuevas.items():
+                cursor.execute(f'INSERT INTO tutores ({columnas}) VALUES ({marcas})', valores)
+                existentes[clave] = cursor.lastrowid
+
+    return [existentes[_clave(identidades[datos['dni']], datos)] for datos in versiones]
+
+
+def obtener_tutor(cursor, db_type, placeholder, **datos):
+    """Id de la versión del tutor con estos datos (la crea si no existe)"""
+    return obtener_tutores(cursor, db_type, placeholder, [datos])[0]
+
+
+def compactar(conn, placeholder, tamanio_lote=TAMANIO_LOTE, progreso=None):
+    """Une las versiones idénticas de cada identidad y reapunta las atenciones"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM tutores')
+    antes = cursor.fetchone()[0]
+
+    asignar_identidades(cursor)
+    # NULL y '' son el mismo dato: se normaliza para poder comparar versiones
+    for campo in CAMPOS_CLAVE:
+        cursor.execute(f'UPDATE tutores SET {campo} = \'\' WHERE {campo} IS NULL')
+    conn.commit()
+
+    # Cada versión repetida -> la más antigua con los mismos datos
+    columnas = ', '.join(CAMPOS_CLAVE)
+    cursor.execute(f'''
+        SELECT t.id, c.conservar
+        FROM tutores t
+        JOIN (
+            SELECT identidad_id, {columnas}, MIN(id) AS conservar
+            FROM tutores
+            GROUP BY identidad_id, {columnas}
+            HAVING COUNT(*) > 1
+        ) c ON c.identidad_id = t.identidad_id
+           AND {' AND '.join(f'c.{campo} = t.{campo}' for campo in CAMPOS_CLAVE)}
+        WHERE t.id <> c.conservar
+        ORDER BY t.id
+    ''')
+    duplicados = cursor.fetchall()
+
+    unidas = 0
+    for inicio in range(0, len(duplicados), tamanio_lote):
+        lote = duplicados[inicio:inicio + tamanio_lote]
+        cursor.executemany(f'UPDATE atenciones SET tutor_id = {placeholder} WHERE tutor_id = {placeholder}',
+                           [(conservar, duplicado) for duplicado, conservar in lote])
+        marcas = ', '.join([placeholder] * len(lote))
+        cursor.execute(f'DELETE FROM tutores WHERE id IN ({marcas})', [duplicado for duplicado, _ in lote])
+        conn.commit()
+        unidas += len(lote)
+        if progreso:
+            progreso(unidas, len(duplicados))
+
+    cursor.execute('SELECT COUNT(*) FROM tutor_identidades')
+    identidades = cursor.fetchone()[0]
+    return {
+        'tutores_antes': antes,
+        'tutores_despues': antes - unidas,
+        'versiones_unidas': unidas,
+        'identidades': identidades,
+    }
+
+
+def depurar_huerfanos(conn, db_type, placeholder, tamanio_lote=TAMANIO_LOTE, progreso=None):
+    """Archiva en auditoria y borra, por lotes, las versiones sin atenciones
+
+    Cada lote se elige y se borra en una sola transacción con las versiones
+    bloqueadas, para que un alta no reutilice una versión que se está borrando
+    (ver obtener_tutores): en PostgreSQL FOR UPDATE (SKIP LOCKED deja para la
+    próxima corrida las que un alta tiene tomadas), en SQLite el bloqueo de
+    escritura de la base desde antes de elegirlas.
+    """
+    cursor = conn.cursor()
+    columnas = ('id', 'identidad_id') + CAMPOS_VERSION
+    # Anti-join: versiones que ninguna atención referencia (usa idx_atenciones_tutor)
+    sin_atenciones = 'NOT EXISTS (SELECT 1 FROM atenciones a WHERE a.tutor_id = {}.id)'
+    bloqueo = 'FOR UPDATE OF t SKIP LOCKED' if db_type == 'postgresql' else ''
+
+    eliminadas = 0
+    lotes = 0
+    ultimo = 0
+    while True:
+        if db_type != 'postgresql':
+            # Toma el bloqueo de escritura aunque no actualice ninguna fila
+            cursor.execute('UPDATE tutores SET id = id WHERE 0')
+        cursor.execute(f'''
+            SELECT {', '.join(f't.{c}' for c in columnas)}
+            FROM tutores t
+            WHERE t.id > {placeholder} AND {sin_atenciones.format('t')}
+            ORDER BY t.id
+            LIMIT {int(tamanio_lote)}
+            {bloqueo}
+        ''', (ultimo,))
+        lote = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+        if not lote:
+            conn.rollback()
+            break
+
+        insertar(cursor, placeholder, [
+            entrada('DELETE', 'tutores', tutor['id'], USUARIO_SISTEMA, datos_anteriores=tutor,
+                    descripcion='Depuración de tutor sin atenciones')
+            for tutor in lote
+        ])
+        marcas = ', '.join([placeholder] * len(lote))
+        cursor.execute(f"DELETE FROM tutores WHERE id IN ({marcas}) AND {sin_atenciones.format('tutores')}",
+                       [tutor['id'] for tutor in lote])
+        if cursor.rowcount != len(lote):
+            # Una atención nueva reutilizó alguna versión del lote: se vuelve a armar
+            conn.rollback()
+            continue
+        conn.commit()
+
+        eliminadas += len(lote)
+        lotes += 1
+        ultimo = lote[-1]['id']
+        if progreso:
+            progreso(eliminadas)
+
+    return {'eliminadas': eliminadas, 'lotes': lotes}
+
+
+def liberar_espacio(conn, db_type):
+    """VACUUM y ANALYZE después de borrar; devuelve los bytes liberados (solo SQLite)"""
+    cursor = conn.cursor()
+    if db_type == 'postgresql':
+        # VACUUM no puede correr dentro de una transacción: se cierra la que dejó
+        # abierta la última consulta antes de pasar a autocommit
+        conn.commit()
+        autocommit = conn.autocommit
+        conn.autocommit = True
+        try:
+            cursor.execute('VACUUM (ANALYZE) tutores')
+        finally:
+            conn.autocommit = autocommit
+        return None
+
+    def tamanio():
+        cursor.execute('PRAGMA page_count')
+        paginas = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        return paginas * cursor.fetchone()[0]
+
+    antes = tamanio()
+    cursor.execute('VACUUM')
+    cursor.execute('ANALYZE tutores')
+    conn.commit()
+    return antes - tamanio()
+
+
+def historial(cursor, placeholder, dni):
+    """Versiones y atenciones de un tutor por DNI (None si no existe)"""
+    cursor.execute(f'SELECT id, dni, fecha_alta FROM tutor_identidades WHERE dni = {placeholder}', (dni,))
+    identidad = cursor.fetchone()
+    if not identidad:
+        return None
+
+    cursor.execute(f'''
+        SELECT t.id, {', '.join(f't.{c}' for c in CAMPOS_CLAVE)}, COUNT(a.id)
+        FROM tutores t
+        LEFT JOIN atenciones a ON a.tutor_id = t.id
+        WHERE t.identidad_id = {placeholder}
+        GROUP BY t.id, {', '.join(f't.{c}' for c in CAMPOS_CLAVE)}
+        ORDER BY t.id
+    ''', (identidad[0],))
+    versiones = [dict(zip(('id',) + CAMPOS_CLAVE + ('atenciones',), fila)) for fila in cursor.fetchall()]
+
+    cursor.execute(f'''
+        SELECT a.numero, a.fecha, a.tipo_atencion, a.nombre_animal, a.especie, a.sexo, a.tutor_id
+        FROM atenciones a
+        JOIN tutores t ON a.tutor_id = t.id
+        WHERE t.identidad_id = {placeholder}
+        ORDER BY a.fecha DESC, a.numero DESC
+    ''', (identidad[0],))
+    atenciones = [{
+        'numero': fila[0],
+        'fecha': str(fila[1]),
+        'tipo_atencion': fila[2],
+        'nombre_animal': fila[3],
+        'especie': fila[4],
+        'sexo': fila[5],
+        'version_tutor': fila[6],
+    } for fila in cursor.fetchall()]
+
+    return {
+        'identidad_id': identidad[0],
+        'dni': identidad[1],
+        'fecha_alta': str(identidad[2]),
+        'versiones': versiones,
+        'atenciones': atenciones,
+    }